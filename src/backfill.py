@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+from config import (
+    BACKFILL_LOOKBACK_MINUTES,
+    BACKFILL_STALE_TOLERANCE,
+    BACKFILL_MERGE_GAP,
+    BACKFILL_MAX_BATCH,
+)
+
+
+class BackfillPlanner:
+    """
+    Sembol başına eksik dakikaları planlar ve sadece onları REST'ten çeker.
+    - Birbirine yakın boşluklar tek istekte birleştirilir, çok uzun olanlar bölünür.
+    - Aynı sembol için eşzamanlı çağrılar tek bir uçuştaki (in-flight) isteği paylaşır.
+    """
+
+    def __init__(self, exchange, market_memory, log=print):
+        self.exchange = exchange
+        self.market_memory = market_memory
+        self.log = log
+        self._inflight = {}  # sembol -> asyncio.Task
+        self.requests_sent = 0
+        self.requests_coalesced = 0
+        self.candles_fetched = 0
+
+    def plan(self, stats, now, lookback=BACKFILL_LOOKBACK_MINUTES, merge_gap=BACKFILL_MERGE_GAP, max_batch=BACKFILL_MAX_BATCH):
+        """Eksik aralıkları REST isteklerine çevirir: [(ilk_dakika, son_dakika), ...]"""
+        requests = []
+        for start, end in stats.missing_ranges(lookback, now=now):
+            # Araya giren mevcut mum az ise iki istek yerine tek istek (Binance ağırlığı limit'e bağlı)
+            if requests and start - requests[-1][1] - 1 <= merge_gap:
+                requests[-1] = (requests[-1][0], end)
+            else:
+                requests.append((start, end))
+
+        batches = []
+        for start, end in requests:
+            while end - start + 1 > max_batch:
+                batches.append((start, start + max_batch - 1))
+                start += max_batch
+            batches.append((start, end))
+        return batches
+
+    def is_stale(self, stats, now, lookback=BACKFILL_LOOKBACK_MINUTES, tolerance=BACKFILL_STALE_TOLERANCE):
+        """Fiyat yok veya son `tolerance` dakikadan daha eski bir boşluk var mı?"""
+        if stats.current_price == 0:
+            return True
+        current_minute = int(now / 60)
+        return any(start < current_minute - tolerance for start, _ in stats.missing_ranges(lookback, now=now))
+
+    async def ensure(self, symbol, lookback=BACKFILL_LOOKBACK_MINUTES, tolerance=BACKFILL_STALE_TOLERANCE):
+        """
+        Sembolün son `lookback` dakikasını boşluksuz hale getirir.
+        Aynı sembol için zaten bir backfill sürüyorsa onun sonucunu bekler.
+        """
+        task = self._inflight.get(symbol)
+        if task is not None:
+            self.requests_coalesced += 1
+            return await asyncio.shield(task)
+
+        stats = self.market_memory[symbol]
+        if not self.is_stale(stats, time.time(), lookback, tolerance):
+            return True  # Veri zaten taze
+
+        task = asyncio.ensure_future(self._run(symbol, lookback, tolerance))
+        self._inflight[symbol] = task
+        task.add_done_callback(lambda _t: self._inflight.pop(symbol, None))
+        return await asyncio.shield(task)
+
+    async def _run(self, symbol, lookback, tolerance=BACKFILL_STALE_TOLERANCE):
+        stats = self.market_memory[symbol]
+        now = time.time()
+        batches = self.plan(stats, now, lookback)
+
+        missing = sum(end - start + 1 for start, end in stats.missing_ranges(lookback, now=now))
+        self.log(
+            f"⚠️ {symbol} Verisi Eksik (Kapsama: %{stats.coverage(lookback, now=now) * 100:.0f}, "
+            f"{missing} dk). {len(batches)} istekle sadece boşluklar çekiliyor...",
+            "warning",
+        )
+        self.requests_sent += len(batches)
+        results = await asyncio.gather(
+            *(self.exchange.fetch_klines(symbol, start, end) for start, end in batches)
+        )
+        rows = [row for res in results if res for row in res]
+        if rows:
+            self.candles_fetched += len(rows)
+            stats.merge_candles(rows)
+            # Son dakikalar REST'ten geldiyse websocket fiyatı da bayattır
+            latest = max(rows, key=lambda r: r[1])
+            if int(latest[1] / 60) >= stats.last_minute:
+                stats.current_price = latest[0]
+
+            # 1h rollup son 24 saati kapsıyorsa 24s ticker isteğine gerek yok
+            if not stats.has_local_24h:
+                chg_24h = await self.exchange.get_24h_change(symbol)
+                if chg_24h is not None:
+                    stats.set_24h_change(chg_24h)
+
+        elif self.is_stale(stats, time.time(), lookback, tolerance):
+            # REST başarısız/boş: Eldeki (örn. snapshot'tan gelen saatlerce eski) veri taze sayılmaz
+            self.log(f"❌ {symbol} Backfill Başarısız: Mum alınamadı, veri hâlâ bayat.", "error")
+            return False
+
+        return stats.current_price != 0 and len(stats) > 0
@@ -0,0 +1,117 @@
+"""
+Tekrar haber kontrolü benchmark'ı: Eski TF-IDF refit vs artımlı benzerlik indeksi.
+
+Kullanım:
+    python src/benchmarks/news_dedup_bench.py            # 10k haberlik sentetik korpus
+    python src/benchmarks/news_dedup_bench.py 20000 500  # korpus, sorgu sayısı
+
+- legacy-100: Mevcut davranış (Her mesajda son 100 haberle TfidfVectorizer.fit_transform)
+- legacy-full: Aynı yöntem tüm pencereyle (İndeksle eşdeğer kapsam; yavaş olduğu için az sorgu)
+- index: NearDuplicateIndex (Korpus önceden eklenmiş, sadece sorgu süresi)
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from news_index import NearDuplicateIndex, clean_text
+
+THRESHOLD = 0.75
+COINS = ["Bitcoin", "Ethereum", "Solana", "XRP", "Dogecoin", "Cardano", "Avalanche", "Chainlink",
+         "Polkadot", "Toncoin", "Arbitrum", "Optimism", "Aptos", "Sui", "Litecoin", "Uniswap"]
+ACTORS = ["BlackRock", "Binance", "Coinbase", "the SEC", "Grayscale", "Fidelity", "a whale wallet",
+          "MicroStrategy", "Kraken", "the Fed", "Tether", "OKX", "Bybit", "a hacker group"]
+EVENTS = [
+    "{a} files for a spot {c} ETF with a {n} million seed",
+    "{a} moves {n} million worth of {c} to an exchange",
+    "{c} network upgrade goes live after {n} days of testing",
+    "{a} announces {c} staking support for {n} countries",
+    "{c} jumps {p}% after {a} partnership announcement",
+    "{c} drops {p}% as {a} reports {n} million outflows",
+    "{a} lists {c} perpetual futures with up to {p}x leverage",
+    "{a} freezes {n} million in {c} linked to exploit",
+]
+SUFFIX = ["", " — link", " Details inside.", " (developing)", " Source: Bloomberg", " https://t.co/abc"]
+
+
+def make_message(rnd):
+    return rnd.choice(EVENTS).format(
+        a=rnd.choice(ACTORS), c=rnd.choice(COINS), n=rnd.randint(1, 999), p=rnd.randint(2, 40)
+    ) + rnd.choice(SUFFIX)
+
+
+def paraphrase(rnd, msg):
+    """Aynı haberin başka kanaldan hafif farklı hali."""
+    words = msg.split()
+    if rnd.random() < 0.5:
+        words.insert(0, rnd.choice(["BREAKING:", "JUST IN:", "🚨", "UPDATE:"]))
+    if rnd.random() < 0.5:
+        words = words[:-1]
+    return " ".join(words) + rnd.choice(SUFFIX)
+
+
+def legacy_is_duplicate(vectorizer, past_clean, new_text):
+    clean_new = clean_text(new_text)
+    tfidf = vectorizer.fit_transform(past_clean + [clean_new])
+    sims = cosine_similarity(tfidf[-1], tfidf[:-1])
+    max_sim = sims.max() if sims.size else 0.0
+    return max_sim >= THRESHOLD, max_sim
+
+
+def main():
+    n_corpus = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    rnd = random.Random(7)
+    now = time.time()
+    corpus = [make_message(rnd) for _ in range(n_corpus)]
+    queries = [
+        paraphrase(rnd, rnd.choice(corpus)) if i % 2 else make_message(rnd) for i in range(n_queries)
+    ]
+    corpus_clean = [clean_text(m) for m in corpus]
+    print(f"📦 Korpus: {n_corpus} haber | Sorgu: {n_queries} | Eşik: {THRESHOLD}\n")
+
+    # 1. İndeks
+    index = NearDuplicateIndex(max_docs=n_corpus)
+    start = time.perf_counter()
+    for i, c in enumerate(corpus_clean):
+        index.add(c, now - n_corpus + i)
+    add_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index_results = [index.query(clean_text(q), THRESHOLD, now=now) for q in queries]
+    index_s = time.perf_counter() - start
+
+    # 2. Mevcut yöntem (Son 100)
+    vectorizer = TfidfVectorizer(stop_words="english")
+    last_100 = corpus_clean[-100:]
+    start = time.perf_counter()
+    for q in queries:
+        legacy_is_duplicate(vectorizer, last_100, q)
+    legacy_100_s = time.perf_counter() - start
+
+    # 3. Aynı yöntem tüm pencereyle (Doğruluk referansı)
+    sample = queries[: max(1, n_queries // 20)]
+    start = time.perf_counter()
+    full_results = [legacy_is_duplicate(vectorizer, corpus_clean, q) for q in sample]
+    legacy_full_s = time.perf_counter() - start
+
+    agree = sum(a[0] == b[0] for a, b in zip(index_results, full_results))
+    # İndeks eşik altı skorları kesin hesaplamaz (Aday filtresi): Fark sadece tekrarlarda ölçülür
+    max_diff = max((abs(a[1] - b[1]) for a, b in zip(index_results, full_results) if b[0]), default=0.0)
+
+    print(f"{'Yöntem':<12} {'µs/sorgu':>12} {'Kapsam':>10}")
+    print(f"{'legacy-100':<12} {legacy_100_s / n_queries * 1e6:>12.0f} {100:>10}")
+    print(f"{'legacy-full':<12} {legacy_full_s / len(sample) * 1e6:>12.0f} {n_corpus:>10}")
+    print(f"{'index':<12} {index_s / n_queries * 1e6:>12.0f} {n_corpus:>10}")
+    print(f"\n➕ İndeks ekleme: {add_s / n_corpus * 1e6:.0f} µs/haber | {index.metrics()}")
+    print(
+        f"🎯 legacy-full ile karar uyumu: {agree}/{len(sample)} | Tekrarlarda en büyük skor farkı: {max_diff:.3f} "
+        f"| İndeks tekrar oranı: %{sum(r[0] for r in index_results) / n_queries * 100:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Websocket frame çözücü mikro benchmark'ı.
+
+Kullanım:
+    python src/benchmarks/stream_decoder_bench.py                    # Sentetik frame'ler
+    python src/benchmarks/stream_decoder_bench.py data/frames.jsonl  # Kayıtlı frame'ler
+
+Kayıt almak için botu STREAM_RECORD_FILE=frames.jsonl ile çalıştırın (Satır başına bir ham frame).
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stream_decoder import FrameDecoder
+
+BACKENDS = ("json", "orjson", "ujson")
+
+
+def synthetic_frames(n=20000, seed=42):
+    """Canlı akışa benzer karışım: Çoğunluk kline, arada bookTicker ve all-market dizileri."""
+    rnd = random.Random(seed)
+    symbols = [f"{s}USDT" for s in ("BTC", "ETH", "SOL", "BNB", "XRP", "DOGE", "ADA", "AVAX", "LINK", "DOT")]
+    now_ms = int(time.time() * 1000)
+    frames = []
+    for i in range(n):
+        sym = rnd.choice(symbols)
+        price = rnd.uniform(0.1, 60000)
+        r = rnd.random()
+        if r < 0.80:
+            ev = {
+                "e": "kline", "E": now_ms + i, "s": sym,
+                "k": {
+                    "t": now_ms - now_ms % 60000, "T": now_ms - now_ms % 60000 + 59999, "s": sym, "i": "1m",
+                    "f": 100, "L": 200, "o": f"{price:.4f}", "c": f"{price * 1.001:.4f}",
+                    "h": f"{price * 1.002:.4f}", "l": f"{price * 0.998:.4f}", "v": f"{rnd.uniform(1, 1e4):.3f}",
+                    "n": 100, "x": rnd.random() < 0.02, "q": f"{rnd.uniform(1e3, 1e7):.2f}",
+                    "V": "500", "Q": "0.500", "B": "0",
+                },
+            }
+        elif r < 0.95:
+            ev = {
+                "u": i, "s": sym, "b": f"{price:.4f}", "B": f"{rnd.uniform(1, 100):.3f}",
+                "a": f"{price * 1.0001:.4f}", "A": f"{rnd.uniform(1, 100):.3f}",
+            }
+        elif r < 0.98:
+            ev = [
+                {"e": "24hrMiniTicker", "E": now_ms + i, "s": s, "c": f"{price:.4f}", "o": f"{price * 0.97:.4f}",
+                 "h": f"{price * 1.05:.4f}", "l": f"{price * 0.95:.4f}", "v": "10000", "q": f"{rnd.uniform(1e6, 1e9):.2f}"}
+                for s in symbols
+            ]
+        else:
+            ev = [
+                {"e": "markPriceUpdate", "E": now_ms + i, "s": s, "p": f"{price:.4f}", "i": f"{price:.4f}",
+                 "P": f"{price:.4f}", "r": f"{rnd.uniform(-0.001, 0.001):.8f}", "T": now_ms + 3600000}
+                for s in symbols
+            ]
+        frames.append(json.dumps(ev, separators=(",", ":")))
+    return frames
+
+
+def load_frames(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def bench(decoder, frames, repeat=3):
+    """En iyi tekrarın (saniye, kayıt sayısı) değeri."""
+    best, records = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = 0
+        for raw in frames:
+            count += len(decoder.decode(raw))
+        best = min(best, time.perf_counter() - start)
+        records = count
+    return best, records
+
+
+def bench_loads(loads, frames, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for raw in frames:
+            loads(raw)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    frames = load_frames(sys.argv[1]) if len(sys.argv) > 1 else synthetic_frames()
+    print(f"📦 {len(frames)} frame ({sum(len(f) for f in frames) / len(frames):.0f} byte/frame ort.)\n")
+    print(f"{'Decoder':<8} {'Parse µs/frame':>15} {'Tipli µs/frame':>15} {'Frame/sn':>12} {'Kayıt':>8}")
+
+    for name in BACKENDS:
+        decoder = FrameDecoder(name)
+        if decoder.name != name:
+            print(f"{name:<8} (kurulu değil)")
+            continue
+        parse_s = bench_loads(decoder.loads, frames)
+        total_s, records = bench(decoder, frames)
+        n = len(frames)
+        print(
+            f"{name:<8} {parse_s / n * 1e6:>15.2f} {total_s / n * 1e6:>15.2f} "
+            f"{n / total_s:>12,.0f} {records:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
 from binance import AsyncClient
 from binance.enums import *
 import math
+import time
+
+def format_volume(volume_usdt):
+    """USDT hacmini prompt formatına çevirir (Milyar/Milyon)."""
+    if volume_usdt > 1_000_000_000:
+        return f"${volume_usdt / 1_000_000_000:.2f}B"
+    return f"${volume_usdt / 1_000_000:.2f}M"
+
 
 class BinanceExecutionEngine:
     def __init__(self, api_key, api_secret, testnet=False):
@@ -195,15 +203,35 @@ class BinanceExecutionEngine:
                     print(f"🚨 [API] {sym} Pozisyon Kapatıldı.")
         except Exception as e: print(f"❌ [KAPATMA HATA] {e}")
 
-    async def fetch_missing_data(self, symbol):
-        if not self.client: return None, 0.0
+    async def fetch_klines(self, symbol, start_minute, end_minute):
+        """
+        [start_minute, end_minute] (dakika, kapsayıcı) aralığındaki KAPANMIŞ 1m mumları çeker.
+        Dönüş: [(close, timestamp, open, high, low, volume), ...] veya None
+        """
+        if not self.client: return None
+        try:
+            limit = min(max(end_minute - start_minute + 1, 1), 1500)
+            klines = await self.client.futures_klines(
+                symbol=symbol.upper(), interval=KLINE_INTERVAL_1MINUTE,
+                startTime=start_minute * 60_000, endTime=end_minute * 60_000 + 59_999, limit=limit,
+            )
+            now_ms = time.time() * 1000
+            # Henüz oluşan mum (close time gelecekte) alınmaz
+            return [
+                (float(k[4]), int(k[0])/1000, float(k[1]), float(k[2]), float(k[3]), float(k[5]))
+                for k in klines if k[6] < now_ms
+            ]
+        except Exception as e:
+            print(f"⚠️ [KLINE HATA] {symbol}: {e}")
+            return None
+
+    async def get_24h_change(self, symbol):
+        if not self.client: return None
         try:
-            klines = await self.client.futures_klines(symbol=symbol.upper(), interval=KLINE_INTERVAL_1MINUTE, limit=60)
-            data = [(float(k[4]), int(k[0])/1000) for k in klines]
             ticker = await self.client.futures_ticker(symbol=symbol.upper())
-            return data, float(ticker['priceChangePercent'])
-        except: return None, 0.0
-    
+            return float(ticker['priceChangePercent'])
+        except: return None
+
     async def get_usdt_balance(self):
         """
         Binance Futures hesabındaki güncel USDT bakiyesini çeker.
@@ -247,11 +275,7 @@ class BinanceExecutionEngine:
             ticker_stats = await self.client.futures_ticker(symbol=symbol.upper())
             volume_usdt = float(ticker_stats.get('quoteVolume', 0))
             
-            # Formatla (Milyar/Milyon)
-            if volume_usdt > 1_000_000_000:
-                vol_str = f"${volume_usdt / 1_000_000_000:.2f}B"
-            else:
-                vol_str = f"${volume_usdt / 1_000_000:.2f}M"
+            vol_str = format_volume(volume_usdt)
 
             # 2. Fonlama Oranı (Funding Rate)
             # premiumIndex endpoint'i anlık fonlamayı verir
@@ -264,6 +288,22 @@ class BinanceExecutionEngine:
             print(f"⚠️ [METRİK HATA] {symbol}: {e}")
             return "Unknown", 0.0
         
+    async def get_book_levels(self, symbol, side, limit=50):
+        """
+        Piyasa emrinin yürüyeceği defter tarafı (LONG -> asks, SHORT -> bids).
+        Dönüş: [(fiyat, miktar), ...] en iyi fiyattan başlayarak, alınamazsa None.
+        """
+        if not self.client: return None
+
+        try:
+            depth = await self.client.futures_order_book(symbol=symbol.upper(), limit=limit)
+            levels = depth['asks' if side == 'LONG' else 'bids']
+            return [(float(price), float(qty)) for price, qty in levels] or None
+
+        except Exception as e:
+            print(f"⚠️ [DEPTH HATA] {e}")
+            return None
+
     async def get_order_book_imbalance(self, symbol, limit=100):
         """
         Tahtadaki Alıcı/Satıcı dengesizliğini ölçer.
@@ -201,7 +201,7 @@ class AgentBrain:
                         print(f"❌ [ERROR] LLM Request Failed: {e}")
                         return None
 
-    async def analyze_specific(self, news, symbol, price, changes, search_context="", coin_full_name="Unknown", market_cap_str="", rsi_val=0, btc_trend=0, volume_24h="", funding_rate=0):
+    async def analyze_specific(self, news, symbol, price, changes, search_context="", coin_full_name="Unknown", market_cap_str="", rsi_val=0, btc_trend=0, volume_24h="", funding_rate=0, indicator_summary="N/A", htf_summary="N/A", live_candle_summary="N/A"):
         # 1. Profile Info
         await self._wait_for_rate_limit()
         coin_category = await self.get_coin_profile(symbol)
@@ -224,6 +224,9 @@ class AgentBrain:
             change_10m=changes['10m'],
             change_1h=changes['1h'],
             change_24h=changes['24h'],
+            indicator_summary=indicator_summary,
+            htf_summary=htf_summary,
+            live_candle_summary=live_candle_summary,
             news=news,
             search_context=search_context
         )
@@ -297,7 +300,7 @@ class AgentBrain:
             print(f"Profile Error: {e}")
             return "Unknown"
 
-    async def analyze_specific_no_research(self, news, symbol, price, changes, coin_full_name="Unknown", market_cap_str="", rsi_val=0, btc_trend=0, volume_24h="", funding_rate=0):
+    async def analyze_specific_no_research(self, news, symbol, price, changes, coin_full_name="Unknown", market_cap_str="", rsi_val=0, btc_trend=0, volume_24h="", funding_rate=0, indicator_summary="N/A", htf_summary="N/A", live_candle_summary="N/A"):
         """İnternet araştırması yapmadan, sadece teknik verilerle karar verir."""
         await self._wait_for_rate_limit()
         # Kategori bilgisini cache'den veya statik listeden çek (Araştırma yapma!)
@@ -322,6 +325,9 @@ class AgentBrain:
             change_10m=changes['10m'],
             change_1h=changes['1h'],
             change_24h=changes['24h'],
+            indicator_summary=indicator_summary,
+            htf_summary=htf_summary,
+            live_candle_summary=live_candle_summary,
             news=news,
             search_context="RESEARCH DISABLED FOR BACKTESTING. DECIDE BASED ON NEWS AND TECH DATA ONLY."
         )
@@ -0,0 +1,31 @@
+import time
+
+
+class WallClock:
+    """Canlı mod: Sistem saati."""
+
+    def time(self):
+        return time.time()
+
+    def strftime(self, fmt="%H:%M:%S"):
+        return time.strftime(fmt, time.localtime(self.time()))
+
+
+class SimulatedClock(WallClock):
+    """
+    Backtest modu: Zaman sadece replay edilen mumlarla ilerler.
+    Aynı PaperExchange motoru (TP/SL, trailing, süre dolumu) tam CPU hızında çalışır.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def set(self, ts):
+        """Zamanı `ts` anına taşır (Replay bağımsız senaryolar arasında geri de sarabilir)."""
+        self.now = ts
+
+    def advance(self, seconds):
+        self.now += seconds
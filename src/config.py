@@ -42,6 +42,38 @@ else:
 BASE_URL = os.getenv('BASE_URL', "wss://stream.binance.com:9443/ws")
 WEBSOCKET_URL = BASE_URL
 
+# All-market streamler: Tüm pariteleri REST'siz taze tutar (Boş liste = kapalı).
+# "!markPrice@arr" (fonlama oranı) sadece futures akışında (wss://fstream.binance.com/ws) vardır.
+ALL_MARKET_STREAMS = [s for s in os.getenv('ALL_MARKET_STREAMS', "!miniTicker@arr").split(",") if s]
+
+# Stream Yönetimi (Binance limiti: Bağlantı başına 1024 stream, saniyede 5 mesaj)
+STREAM_MAX_PER_CONNECTION = 200  # Dolunca yeni bağlantı (shard) açılır
+STREAM_BATCH_WINDOW = 0.5        # SUBSCRIBE/UNSUBSCRIBE istekleri bu süre toplanıp tek mesajla gider
+STREAM_BATCH_SIZE = 100          # Tek mesajdaki en fazla stream
+STREAM_RECONNECT_DELAY = 5       # Kopan bağlantı için bekleme (saniye)
+STREAM_BACKFILL_HOLD = 300       # Analiz edilen coinin kline stream'i bu süre açık kalır
+STREAM_DECODER = os.getenv('STREAM_DECODER', "orjson")  # "orjson" / "ujson" kurulu değilse stdlib json
+STREAM_RECORD_FILE = os.getenv('STREAM_RECORD_FILE', "")  # Doluysa ham frame'ler benchmark için kaydedilir
+WATCHLIST_PAIRS = [s.strip().lower() for s in os.getenv('WATCHLIST_PAIRS', "").split(",") if s.strip()]
+
+# --- Market Data Configuration ---
+BACKFILL_LOOKBACK_MINUTES = 60   # Analiz öncesi boşluksuz olması gereken geçmiş
+BACKFILL_STALE_TOLERANCE = 3     # Son N dakikanın eksikliği bayat sayılmaz (WS kapanışı gecikebilir)
+BACKFILL_MERGE_GAP = 2           # Aradaki mevcut mum sayısı bundan azsa iki boşluk tek istekte çekilir
+BACKFILL_MAX_BATCH = 1500        # Binance futures_klines limit üst sınırı
+MARKET_SNAPSHOT_DIR = "market_snapshot"  # data/ altında, warm restart için memory-mapped diziler
+MARKET_SNAPSHOT_INTERVAL = 60    # Periyodik checkpoint (saniye)
+
+# --- Database Configuration ---
+DB_BATCH_SIZE = 256              # Yazıcı thread'inin tek commit'te topladığı en fazla iş
+NEWS_DEDUP_WINDOW_HOURS = 24     # Tekrar haber kontrolünün geriye baktığı süre
+NEWS_DEDUP_MAX_DOCS = 50_000     # Benzerlik indeksinde tutulan en fazla haber (Hafıza sınırı)
+NEWS_RETENTION_DAYS = 7          # Bundan eski haberler tablodan aylık arşiv dosyalarına taşınır
+NEWS_ARCHIVE_DIR = "news_archive"  # data/ altında, news-YYYY-MM.jsonl.gz (Backtest okuyabilir)
+NEWS_ARCHIVE_BATCH = 5000        # Tek yazıcı işinde taşınan en fazla haber (Diğer yazmalar araya girebilsin)
+NEWS_RETENTION_INTERVAL = 3600   # Arşivleme + incremental vacuum periyodu (saniye)
+DB_VACUUM_PAGES = 2000           # Tek turda dosyaya geri verilen en fazla boş sayfa
+
 # --- Target Configuration ---
 TARGET_CHANNELS = ['cointelegraph', 'wublockchainenglish', 'CryptoRankNews', 'TheBlockNewsLite', 'coindesk', 'arkhamintelligence', 'glassnode'] 
 
@@ -53,6 +85,14 @@ RSS_FEEDS = [
     "https://beincrypto.com/feed/"
 ]
 
+# Haber Kuyruğu (Telegram + RSS -> sınırlı worker havuzu)
+NEWS_WORKERS = 3                 # Aynı anda çalışan en fazla analiz hattı (LLM çağrısı)
+NEWS_QUEUE_MAX = 100             # Doluysa en düşük öncelikli haber atılır
+NEWS_MAX_AGE = 300               # Kuyrukta bundan uzun bekleyen haber analiz edilmez (saniye)
+NEWS_SOURCE_PRIORITY = {"MANUAL": 0, "TELEGRAM": 1, "RSS": 2}  # Küçük sayı önce işlenir
+NEWS_CHANNEL_PRIORITY = {}       # Kanal bazında öncelik (Kaynağı ezer), örn. {'wublockchainenglish': 0}
+PAIR_ANALYSIS_CONCURRENCY = 3    # Tek haberde aynı anda analiz edilen en fazla parite
+
 # --- Telegram Configuration ---
 API_ID = int(os.getenv('API_ID', 0))
 API_HASH = os.getenv('API_HASH')
@@ -63,6 +103,19 @@ STARTING_BALANCE = 1000
 LEVERAGE = 10 
 FIXED_TRADE_AMOUNT = 8
 
+# Kağıt İşlem Dolum Modeli (Binance USDT-M futures varsayılanları)
+PAPER_TAKER_FEE = 0.0005        # %0.05
+PAPER_MAKER_FEE = 0.0002        # %0.02 (TP limit emri)
+PAPER_SPREAD_BPS = 1.0          # Yarım spread (baz puan)
+PAPER_IMPACT_BPS = 10.0         # Emir PAPER_BOOK_DEPTH_USDT büyüklüğündeyse ek kayma
+PAPER_BOOK_DEPTH_USDT = 250_000 # Defter verisi yoksa varsayılan derinlik
+PAPER_FUNDING_RATE = 0.01       # Fonlama başına yüzde (Canlı oran yoksa)
+FUNDING_INTERVAL_HOURS = 8
+INTRABAR_PATH = "direction"     # "direction" / "ohlc" (O->H->L->C) / "olhc" (O->L->H->C)
+
+# Hafızada tutulan kapanmış işlem sayısı (Daha eskiler SQLite'tan sayfa sayfa okunur)
+TRADE_HISTORY_LIMIT = 200
+
 # --- Filter Constants ---
 IGNORE_KEYWORDS = [
     'daily', 'digest', 'recap', 'summary', 'analysis', 'price analysis', 
@@ -1,8 +1,10 @@
 from nicegui import ui
 import asyncio
 import time
+from itertools import islice
 import config  # Panic button için gerekli
 from services import update_system_balance
+from stream_manager import kline_stream, REASON_POSITION
 
 
 # --- YARDIMCI FONKSİYONLAR ---
@@ -81,18 +83,13 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                 pos = ctx.exchange.positions.get(symbol)
                 if not pos:
                     continue
-                pnl = pos.get("pnl", 0.0)
+                pnl = ctx.exchange.position_pnl(symbol)
                 reason = "MANUAL PANIC CLOSE 🚨"
                 log_msg, color = ctx.exchange.close_position(symbol, reason, pnl)
                 ctx.log_ui(log_msg, color)
                 if config.REAL_TRADING_ENABLED:
                     await ctx.real_exchange.close_position_market(symbol)
-                unsubscribe_msg = {
-                    "method": "UNSUBSCRIBE",
-                    "params": [f"{symbol.lower()}@kline_1m"],
-                    "id": int(time.time()),
-                }
-                await ctx.stream_command_queue.put(unsubscribe_msg)
+                ctx.streams.release(kline_stream(symbol), REASON_POSITION)
                 asyncio.create_task(update_system_balance(ctx, last_pnl=pnl))
             except Exception as e:
                 ctx.log_ui(f"⚠️ Kapatma Hatası ({symbol}): {e}", "error")
@@ -193,9 +190,38 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                     "text-lg font-bold text-white"
                 )
 
+                # Sayfalama: Her sayfanın başlangıç imleci (Keyset, OFFSET yok)
+                report_page = {"cursors": [None], "next": None}
+
+                def parse_day(value, end=False):
+                    if not value:
+                        return None
+                    ts = time.mktime(time.strptime(value, "%Y-%m-%d"))
+                    return ts + 86400 if end else ts
+
                 # Raporu Yenileme Butonu
-                async def refresh_report():
-                    full_story = ctx.memory.get_full_trade_story()
+                async def refresh_report(page=0):
+                    try:
+                        since = parse_day(report_since.value)
+                        until = parse_day(report_until.value, end=True)
+                    except ValueError:
+                        ui.notify("Tarih formatı: YYYY-AA-GG", type="warning")
+                        return
+                    if page == 0:
+                        report_page["cursors"] = [None]
+                    elif page > 0:
+                        report_page["cursors"].append(report_page["next"])
+                    else:
+                        report_page["cursors"].pop()
+                    full_story, report_page["next"] = ctx.memory.query_trade_story(
+                        symbol=report_symbol.value or None,
+                        actions=report_action.value if report_action.value != "HEPSİ" else ("LONG", "SHORT"),
+                        since=since,
+                        until=until,
+                        min_confidence=report_min_conf.value or None,
+                        max_confidence=report_max_conf.value or None,
+                        before_id=report_page["cursors"][-1],
+                    )
                     
                     # ROI ve Diğer Hesaplamaları Tabloya Gitmeden Önce Yapalım
                     for row in full_story:
@@ -219,12 +245,32 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                     
                     report_table.rows = full_story
                     report_table.update()
-                    ui.notify("Strateji Raporu Güncellendi.", type="info")
+                    report_page_label.set_text(f"Sayfa {len(report_page['cursors'])}")
+                    prev_btn.set_enabled(len(report_page["cursors"]) > 1)
+                    next_btn.set_enabled(report_page["next"] is not None)
+                    if page == 0:
+                        refresh_rollups()
+                        ui.notify("Strateji Raporu Güncellendi.", type="info")
 
                 ui.button(
-                    "RAPORU YENİLE", icon="refresh", on_click=refresh_report
+                    "RAPORU YENİLE", icon="refresh", on_click=lambda: refresh_report(0)
                 ).props("outline size=sm")
 
+            # Filtreler
+            with ui.row().classes("items-center w-full gap-2 mb-2"):
+                report_symbol = ui.input(placeholder="Coin (BTC)").props("dark dense").classes("w-28")
+                report_action = ui.select(["HEPSİ", "LONG", "SHORT"], value="HEPSİ").props("dark dense").classes("w-28")
+                report_min_conf = ui.number(placeholder="Min Güven", min=0, max=100).props("dark dense").classes("w-24")
+                report_max_conf = ui.number(placeholder="Max Güven", min=0, max=100).props("dark dense").classes("w-24")
+                report_since = ui.input(placeholder="Başlangıç (YYYY-AA-GG)").props("dark dense").classes("w-40")
+                report_until = ui.input(placeholder="Bitiş (YYYY-AA-GG)").props("dark dense").classes("w-40")
+                ui.space()
+                prev_btn = ui.button(icon="chevron_left", on_click=lambda: refresh_report(-1)).props("flat size=sm")
+                report_page_label = ui.label("Sayfa 1").classes("text-xs text-gray-400")
+                next_btn = ui.button(icon="chevron_right", on_click=lambda: refresh_report(1)).props("flat size=sm")
+                prev_btn.set_enabled(False)
+                next_btn.set_enabled(False)
+
             # Tablo Yapısı
             columns = [
                 {"name": "time", "label": "Giriş Saati", "field": "time", "sortable": True, "align": "left"},
@@ -240,7 +286,7 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
             ]
 
             # Tabloyu Oluştur (Veriler refresh butonuna basınca veya otomatik dolacak)
-            report_table = ui.table(columns=columns, rows=[], row_key="time").classes(
+            report_table = ui.table(columns=columns, rows=[], row_key="id").classes(
                 "w-full bg-gray-900 text-gray-300"
             )
 
@@ -256,6 +302,43 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
             """,
             )
 
+            # Performans Özetleri (trade_rollups: İşlem sayısından bağımsız, tek sorgu)
+            rollup_dimensions = {
+                "Coin": "symbol", "Gün": "day", "Güven": "confidence",
+                "Kaynak": "source", "Çıkış Sebebi": "close_reason",
+            }
+
+            def refresh_rollups():
+                rows = ctx.memory.get_rollups(rollup_dimensions[rollup_select.value])
+                for r in rows:
+                    r["win_rate"] = f"%{r['win_rate']:.1f}"
+                    for k in ("pnl", "avg_pnl", "std_pnl"):
+                        r[k] = f"{r[k]:.2f}"
+                    r["max_adverse"] = f"%{r['max_adverse']:.2f}"
+                    r["max_favorable"] = f"%{r['max_favorable']:.2f}"
+                rollup_table.rows = rows
+                rollup_table.update()
+
+            with ui.row().classes("items-center w-full gap-2 mt-6 mb-2"):
+                ui.label("🧮 PERFORMANS ÖZETİ").classes("text-md font-bold text-white")
+                rollup_select = ui.select(
+                    list(rollup_dimensions), value="Coin", on_change=lambda _: refresh_rollups()
+                ).props("dark dense").classes("w-40")
+
+            rollup_columns = [
+                {"name": "key", "label": "Anahtar", "field": "key", "sortable": True, "align": "left"},
+                {"name": "count", "label": "İşlem", "field": "count", "sortable": True, "align": "right"},
+                {"name": "win_rate", "label": "Win Rate", "field": "win_rate", "align": "right"},
+                {"name": "pnl", "label": "Toplam PnL ($)", "field": "pnl", "align": "right"},
+                {"name": "avg_pnl", "label": "Ort. PnL", "field": "avg_pnl", "align": "right"},
+                {"name": "std_pnl", "label": "Std PnL", "field": "std_pnl", "align": "right"},
+                {"name": "max_adverse", "label": "Max MAE", "field": "max_adverse", "align": "right"},
+                {"name": "max_favorable", "label": "Max MFE", "field": "max_favorable", "align": "right"},
+            ]
+            rollup_table = ui.table(columns=rollup_columns, rows=[], row_key="key").classes(
+                "w-full bg-gray-900 text-gray-300"
+            )
+
             # Başlangıçta bir kere çekelim
             # (Ama UI oluşurken async çağırmak bazen sorun olabilir, butonla yapmak daha güvenli)
             # Biz yine de boş bırakalım, kullanıcı butona bassın ya da timer ile dolabilir.
@@ -265,6 +348,9 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
             ui.label("📡 CANLI PİYASA VERİLERİ (MEMORY)").classes(
                 "text-lg font-bold mb-4 text-white"
             )
+            stream_stats_label = ui.label("").classes("text-xs font-mono text-gray-500 mb-2")
+            storage_stats_label = ui.label("").classes("text-xs font-mono text-gray-500 mb-2")
+            news_queue_label = ui.label("").classes("text-xs font-mono text-gray-500 mb-2")
             market_grid = ui.grid(columns=5).classes("w-full gap-3")
 
         # --- TAB 5: İŞLEM GEÇMİŞİ ---
@@ -272,8 +358,36 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
             ui.label("📜 KAPANMIŞ İŞLEMLER (ÖZET)").classes(
                 "text-lg font-bold mb-4 text-white"
             )
+            history_stats_label = ui.label("").classes("text-xs font-mono text-gray-400 mb-1")
+            confidence_stats_label = ui.label("").classes("text-xs font-mono text-gray-500 mb-2")
             history_container = ui.column().classes("w-full gap-2")
 
+            # Hafızada olmayan eski işlemler SQLite'tan istendikçe yüklenir (id imleci ile)
+            older_trades = []
+            older_state = {"anchor": None, "cursor": None, "done": False}
+
+            def load_older_trades():
+                if older_state["done"]:
+                    ui.notify("Daha eski işlem yok.", type="info")
+                    return
+                if older_state["anchor"] is None:
+                    # İlk sayfa: Ekrandaki en eski kaydın altından başla
+                    shown = [t['id'] for t in islice(reversed(ctx.exchange.history), 20) if 'id' in t]
+                    if not shown:
+                        ui.notify("İşlemler henüz kaydedilmedi, biraz sonra tekrar deneyin.", type="info")
+                        return
+                    older_state["anchor"] = older_state["cursor"] = min(shown)
+                page, older_state["cursor"] = ctx.memory.get_trades(before_id=older_state["cursor"], limit=50)
+                older_trades.extend(page)
+                if older_state["cursor"] is None:
+                    older_state["done"] = True
+                if not page:
+                    ui.notify("Daha eski işlem yok.", type="info")
+
+            ui.button("DAHA ESKİ İŞLEMLER", icon="expand_more", on_click=load_older_trades).props(
+                "flat size=sm"
+            ).classes("mt-2")
+
     # --- REFRESH LOOP ---
     def refresh_ui():
         try:
@@ -286,11 +400,8 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                 replace=f"text-xl font-mono font-bold {'text-positive' if exchange.total_pnl >= 0 else 'text-negative'}"
             )
 
-            hist = exchange.history
-            total_closed = len(hist)
-            wins = len([t for t in hist if t["pnl"] > 0])
-            wr = (wins / total_closed * 100) if total_closed > 0 else 0
-            win_label.set_text(f"%{wr:.1f} ({wins}/{total_closed})")
+            stats = exchange.stats
+            win_label.set_text(f"%{stats.win_rate:.1f} ({stats.wins}/{stats.count})")
             pos_count_label.set_text(str(len(exchange.positions)))
 
             # 2. POZİSYONLAR
@@ -302,7 +413,7 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                     )
 
             for sym, pos in exchange.positions.items():
-                pnl = pos["pnl"]
+                pnl = exchange.position_pnl(sym)
                 pnl_color = "text-positive" if pnl >= 0 else "text-negative"
                 border_color = "border-positive" if pnl >= 0 else "border-negative"
 
@@ -383,17 +494,40 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                         ui.label(d.get('news_snippet', 'N/A')).classes('col-span-3 text-gray-500 truncate italic').tooltip(d.get('news_snippet'))
 
             # 4. MARKET
+            if ctx.streams is not None and ctx.dispatcher is not None:
+                sm = ctx.streams.metrics()
+                dm = ctx.dispatcher.metrics()
+                stream_stats_label.set_text(
+                    f"WS: {sm['connections']} bağlantı | {sm['confirmed']}/{sm['streams']} stream | "
+                    f"Kuyruk: {dm['queue_depth']} (max {dm['max_depth']}) | "
+                    f"Birleştirilen tick: {dm['coalesced']}/{dm['received']} | "
+                    f"Son batch: {dm['last_batch_ms']:.1f}ms"
+                )
+            if ctx.news_queue is not None:
+                nq = ctx.news_queue.metrics()
+                news_queue_label.set_text(
+                    f"Haber Kuyruğu: {nq['queue_depth']} (max {nq['max_depth']}) | "
+                    f"Worker: {nq['busy_workers']}/{nq['workers']} | İşlenen: {nq['processed']} | "
+                    f"Bayat: {nq['dropped_stale']} | Taşan: {nq['dropped_full']} | "
+                    f"Bekleme: {nq['avg_wait_ms']:.0f}ms ort. (max {nq['max_wait_ms']:.0f}ms)"
+                )
+            st = ctx.storage_metrics
+            if st:
+                mb = lambda b: b / 1024 / 1024
+                tables = " | ".join(f"{name}: {t['rows']}" for name, t in st["tables"].items())
+                storage_stats_label.set_text(
+                    f"DB: {mb(st['db_bytes']):.1f}MB (boş {mb(st['free_bytes']):.1f}MB, WAL {mb(st['wal_bytes']):.1f}MB) | "
+                    f"{tables} | Arşiv: {st['archive_files']} dosya, {mb(st['archive_bytes']):.1f}MB"
+                )
             market_grid.clear()
             with market_grid:
-                active_coins = {
-                    k: v for k, v in ctx.market_memory.items() if v.current_price > 0
-                }
+                # Fiyat ve 1s değişim tüm semboller için tek vektörel çağrıda
+                active_coins = ctx.market_memory.snapshot(60)
                 if not active_coins:
                     ui.label("Veri toplanıyor...").classes(
                         "col-span-5 text-center text-gray-500"
                     )
-                for pair, buffer in active_coins.items():
-                    change_1h = buffer.get_change(60)
+                for pair, current_price, change_1h in active_coins:
                     bg_col = "bg-green-900/30" if change_1h >= 0 else "bg-red-900/30"
                     txt_col = "text-green-400" if change_1h >= 0 else "text-red-400"
                     with ui.card().classes(
@@ -402,12 +536,24 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                         ui.label(pair.upper().replace("USDT", "")).classes(
                             "font-bold text-xs text-gray-300"
                         )
-                        ui.label(f"{buffer.current_price:.4f}").classes(
+                        ui.label(f"{current_price:.4f}").classes(
                             "font-mono text-sm text-white"
                         )
                         ui.label(f"%{change_1h:.2f}").classes(f"text-xs {txt_col}")
 
             # 5. GEÇMİŞ İŞLEMLER
+            pf = stats.profit_factor
+            history_stats_label.set_text(
+                f"İşlem: {stats.count} | Win: %{stats.win_rate:.1f} | Beklenti: ${stats.expectancy:.2f} | "
+                f"PF: {'∞' if pf == float('inf') else f'{pf:.2f}'} | Max DD: ${stats.max_drawdown:.2f}"
+            )
+            confidence_stats_label.set_text(
+                "Güven: " + " | ".join(
+                    f"{bucket}: %{t.win_rate:.0f} ({t.count}) ${t.expectancy:.2f}"
+                    for bucket, t in sorted(stats.by_confidence.items())
+                )
+            )
+
             history_container.clear()
             with history_container:
                 if not exchange.history:
@@ -422,7 +568,13 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                         ui.label('SEBEP')
                         ui.label('YÖN')
                     
-                    for trade in reversed(exchange.history[-20:]):
+                    anchor = older_state["anchor"]
+                    if anchor is None:
+                        recent = list(islice(reversed(exchange.history), 20))
+                    else:
+                        # Eski sayfalar imlecin altından devam eder: Üstündeki her işlem gösterilir (Atlama olmaz)
+                        recent = [t for t in reversed(exchange.history) if t.get('id', anchor) >= anchor]
+                    for trade in recent + older_trades:
                         col = "text-green-400" if trade['pnl'] > 0 else "text-red-400"
                         with ui.row().classes('w-full grid grid-cols-6 text-xs py-1 border-b border-gray-800 items-center hover:bg-gray-800/50'):
                             ui.label(trade['time']).classes('text-gray-400')
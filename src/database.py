@@ -1,19 +1,65 @@
+import heapq
 import sqlite3
+import threading
 import time
 import json
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import re
+import math
+import os
+from itertools import islice
+
+from config import NEWS_RETENTION_DAYS, NEWS_ARCHIVE_DIR, NEWS_ARCHIVE_BATCH, DB_VACUUM_PAGES
+from db_writer import DBWriter, connect
+import news_archive
+from news_index import NearDuplicateIndex, clean_text
+from trade_stats import confidence_bucket, excursions
+
+LEGACY_KEY = "legacy"  # Özet tablosundan önceki, kırılım bilgisi kaydedilmemiş işlemler
+
 
 class MemoryManager:
-    def __init__(self, db_path="nexus_db.sqlite"):
+    """
+    Yazmalar tek bir yazıcı thread'ine (DBWriter) gider ve Future döner: Event loop commit beklemez.
+    Okumalar kalıcı ikinci bir bağlantıdan yapılır (WAL sayesinde yazıcıyla çakışmaz).
+    """
+
+    def __init__(self, db_path="nexus_db.sqlite", archive_dir=NEWS_ARCHIVE_DIR):
         self.db_path = db_path
-        self._init_db()
-        self.vectorizer = TfidfVectorizer(stop_words='english')
+        self.archive_dir = archive_dir
+        self._enable_incremental_vacuum(db_path)
+        self.writer = DBWriter(db_path)
+        self.writer.submit(self._init_db).result()  # Şema hazır olmadan okuma yapılmasın
+        self._read_conn = connect(db_path, check_same_thread=False)
+        self._read_conn.row_factory = sqlite3.Row  # Dict gibi erişmek için
+        self._read_lock = threading.Lock()
+        self.news_index = NearDuplicateIndex()
+        self._load_news_index()
+
+    def close(self):
+        """Bekleyen yazmaları commit edip bağlantıları kapatır (Kapanışta)."""
+        self.writer.close()
+        self._read_conn.close()
 
-    def _init_db(self):
-        """Veritabanı tablolarını oluşturur."""
-        conn = sqlite3.connect(self.db_path)
+    @staticmethod
+    def _enable_incremental_vacuum(db_path):
+        """
+        auto_vacuum=INCREMENTAL: Silinen sayfalar periyodik olarak dosyaya geri verilebilir.
+        Mevcut veritabanında mod ancak tam VACUUM ile değişir (Tek seferlik, açılışta).
+        """
+        conn = connect(db_path)
+        try:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                conn.execute('VACUUM')
+        finally:
+            conn.close()
+
+    def _query(self, sql, params=()):
+        with self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _init_db(conn):
+        """Veritabanı tablolarını oluşturur (Yazıcı thread'inde çalışır)."""
         cursor = conn.cursor()
         
         # 1. TABLO: HABERLER (Eskisi gibi)
@@ -62,105 +108,255 @@ class MemoryManager:
                 FOREIGN KEY(decision_id) REFERENCES decisions(id)
             )
         ''')
-        
-        conn.commit()
-        conn.close()
 
-    # --- ESKİ HABER FONKSİYONLARI (Aynen Korundu) ---
+        # 4. RAPOR İNDEKSLERİ
+        # decisions.timestamp sadece saat tutar: Tarih filtresi için epoch sütunu (Eski satırlarda NULL)
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(decisions)')}
+        if 'created_at' not in columns:
+            cursor.execute('ALTER TABLE decisions ADD COLUMN created_at REAL')
+        if 'source' not in columns:
+            cursor.execute('ALTER TABLE decisions ADD COLUMN source TEXT')  # Haber kaynağı
+        trade_columns = {row[1] for row in cursor.execute('PRAGMA table_info(trades)')}
+        if 'trough_price' not in trade_columns:
+            cursor.execute('ALTER TABLE trades ADD COLUMN trough_price REAL')
+        if 'closed_date' not in trade_columns:
+            # trades.timestamp sadece saat tutar: Kapanış günü (Özetlerin 'day' kırılımı, eski satırlarda NULL)
+            cursor.execute('ALTER TABLE trades ADD COLUMN closed_date TEXT')
+        # SQLite her indekse rowid'i (= id) ekler: (action, id) ve (symbol, action, id) sıralı taranır
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_decisions_action ON decisions (action)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_decisions_symbol_action ON decisions (symbol, action)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_decisions_created_at ON decisions (created_at)')
+        # Kapsayan indeks: JOIN, trades tablosuna hiç dokunmadan indeksten okunur
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_trades_decision
+            ON trades (decision_id, entry_price, exit_price, pnl, reason, peak_price)
+        ''')
+
+        # 5. TABLO: PERFORMANS ÖZETLERİ (Her işlem kapanışında aynı transaction'da güncellenir)
+        # dimension: symbol / day / confidence / source / close_reason
+        # max_adverse / max_favorable: Girişe göre en büyük aleyhte / lehte hareket (%)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS trade_rollups (
+                dimension TEXT,
+                key TEXT,
+                count INTEGER,
+                wins INTEGER,
+                pnl_sum REAL,
+                pnl_sq_sum REAL,
+                max_adverse REAL,
+                max_favorable REAL,
+                PRIMARY KEY (dimension, key)
+            )
+        ''')
+        if cursor.execute('SELECT 1 FROM trade_rollups LIMIT 1').fetchone() is None:
+            # İlk kurulum: Mevcut işlemlerden bir kez doldur. Gün, canlı yoldaki gibi kapanış günüdür;
+            # bilgisi kaydedilmemiş eski satırlar '?' yerine açıkça LEGACY_KEY altında toplanır
+            rows = cursor.execute('''
+                SELECT t.symbol, t.side, t.entry_price, t.pnl, t.reason, t.peak_price, t.trough_price,
+                       t.closed_date, d.confidence, d.source
+                FROM trades t
+                LEFT JOIN decisions d ON d.id = t.decision_id
+                ORDER BY t.id
+            ''').fetchall()
+            for symbol, side, entry, pnl, reason, peak, trough, day, confidence, source in rows:
+                record = {'symbol': symbol, 'side': side, 'entry': entry, 'pnl': pnl, 'reason': reason,
+                          'peak': peak, 'trough': trough, 'date': day}
+                MemoryManager._upsert_rollups(conn, record, confidence, source, missing=LEGACY_KEY)
+
+    # --- HABER TEKRAR KONTROLÜ ---
     def clean_text(self, text):
-        text = text.lower()
-        text = re.sub(r'http\S+', '', text)
-        text = re.sub(r'[^\w\s]', '', text)
-        return text
+        return clean_text(text)
+
+    def _load_news_index(self):
+        """Açılışta son pencerenin haberlerini benzerlik indeksine yükler."""
+        since = time.time() - self.news_index.window
+        rows = self._query('SELECT content, timestamp FROM news WHERE timestamp > ? ORDER BY id', (since,))
+        for content, ts in rows:
+            self.news_index.add(clean_text(content), ts)
 
     def is_duplicate(self, new_text, threshold=0.75):
-        clean_new = self.clean_text(new_text)
+        clean_new = clean_text(new_text)
         if not clean_new.strip(): return True, 1.0
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        limit_time = time.time() - (24 * 60 * 60)
-        cursor.execute('SELECT content FROM news WHERE timestamp > ? ORDER BY id DESC LIMIT 100', (limit_time,))
-        rows = cursor.fetchall()
-        conn.close()
+        is_dup, max_sim = self.news_index.query(clean_new, threshold)
+        if is_dup:
+            print(f"🛑 [BENZERLİK] Tespit edildi: {max_sim:.2f}")
+        return is_dup, max_sim
 
-        if not rows: return False, 0.0
+    def add_news(self, source, content):
+        """Haberi indekse ve yazma kuyruğuna ekler. Dönüş: Future (Beklemek gerekmez)."""
+        now = time.time()
+        self.news_index.add(clean_text(content), now)
+        return self.writer.execute(
+            'INSERT INTO news (source, content, timestamp) VALUES (?, ?, ?)',
+            (source, content, now),
+        )
 
-        past_news = [self.clean_text(row[0]) for row in rows]
-        try:
-            corpus = past_news + [clean_new]
-            tfidf_matrix = self.vectorizer.fit_transform(corpus)
-            similarities = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1])
-            max_sim = similarities.flatten().max() if similarities.size > 0 else 0.0
-            
-            if max_sim >= threshold:
-                print(f"🛑 [BENZERLİK] Tespit edildi: {max_sim:.2f}")
-                return True, max_sim
-            return False, max_sim
-        except:
-            return False, 0.0
+    # --- HABER SAKLAMA (RETENTION) ---
+    def archive_old_news(self, retention_days=NEWS_RETENTION_DAYS, batch=NEWS_ARCHIVE_BATCH):
+        """
+        `retention_days`'ten eski en fazla `batch` haberi aylık arşive taşır.
+        Dönüş: Future -> taşınan haber sayısı (batch'ten azsa iş bitmiştir).
+        """
+        cutoff = time.time() - retention_days * 86400
+        return self.writer.submit(self._archive_news_batch, self.archive_dir, cutoff, batch)
 
-    def add_news(self, source, content):
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('INSERT INTO news (source, content, timestamp) VALUES (?, ?, ?)', 
-                          (source, content, time.time()))
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"❌ DB Yazma Hatası: {e}")
+    @staticmethod
+    def _archive_news_batch(conn, archive_dir, cutoff, batch):
+        # idx_news_timestamp: Filtre ve sıralama indeksten (Tablo taranmaz)
+        rows = conn.execute(
+            'SELECT id, source, content, timestamp FROM news WHERE timestamp < ? ORDER BY timestamp LIMIT ?',
+            (cutoff, batch),
+        ).fetchall()
+        if not rows:
+            return 0
+        news_archive.append(archive_dir, rows)  # Önce diske, sonra tablodan sil
+        conn.executemany('DELETE FROM news WHERE id = ?', [(r[0],) for r in rows])
+        return len(rows)
+
+    def vacuum(self, pages=DB_VACUUM_PAGES):
+        """Boş sayfaların en fazla `pages` tanesini dosyaya geri verir. Future -> kalan boş sayfa"""
+        return self.writer.submit_isolated(self._incremental_vacuum, pages)
+
+    @staticmethod
+    def _incremental_vacuum(conn, pages):
+        # execute() satır döndürmeyen pragma'yı tek adım çalıştırır (Sadece bir sayfa boşalır);
+        # executescript sonuna kadar çalıştırır. Açık transaction'ı commit ettiği için iş transaction dışında.
+        conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+        return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    def iter_archived_news(self, since=None, until=None):
+        """Arşivlenmiş haberler (Backtest). Tablodaki son NEWS_RETENTION_DAYS gün dahil değildir."""
+        return news_archive.iter_news(self.archive_dir, since, until)
+
+    def storage_metrics(self):
+        """Veritabanı, tablo ve arşiv boyutları (Periyodik çağrılır; COUNT tabloları tarar)."""
+        with self._read_lock:
+            pragma = lambda name: self._read_conn.execute(f'PRAGMA {name}').fetchone()[0]
+            page_size = pragma('page_size')
+            metrics = {
+                "db_bytes": pragma('page_count') * page_size,
+                "free_bytes": pragma('freelist_count') * page_size,
+                "tables": {},
+            }
+            for table in ("news", "decisions", "trades", "trade_rollups"):
+                rows = self._read_conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                metrics["tables"][table] = {"rows": rows}
+            try:
+                # dbstat derleme seçeneği varsa tablo başına gerçek byte
+                for name, size in self._read_conn.execute(
+                    'SELECT name, SUM(pgsize) FROM dbstat GROUP BY name'
+                ):
+                    if name in metrics["tables"]:
+                        metrics["tables"][name]["bytes"] = size
+            except sqlite3.Error:
+                pass
+        wal = self.db_path + "-wal"
+        metrics["wal_bytes"] = os.path.getsize(wal) if os.path.exists(wal) else 0
+        metrics["archive_files"], metrics["archive_bytes"] = news_archive.archive_size(self.archive_dir)
+        return metrics
 
     # --- YENİ: KARAR VE TRADE KAYIT FONKSİYONLARI ---
 
     def log_decision(self, record):
         """
-        AI Kararını DB'ye kaydeder ve ID'sini döner.
+        AI Kararını yazma kuyruğuna ekler.
         record: dict
+        Dönüş: Future -> karar ID'si (Async tarafta: await asyncio.wrap_future(...))
         """
-        decision_id = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO decisions (timestamp, symbol, action, confidence, reason, price, news_snippet, validity, tp_pct, sl_pct, raw_data)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                record['time'], record['symbol'], record['action'], record['confidence'], 
-                record['reason'], record['price'], record['news_snippet'], record['validity'], record['tp_pct'], record['sl_pct'], json.dumps(record)
-            ))
-            decision_id = cursor.lastrowid # Bu ID'yi Trade açarken kullanacağız
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"❌ DB Decision Log Hatası: {e}")
-        return decision_id
+        return self.writer.execute('''
+            INSERT INTO decisions (timestamp, symbol, action, confidence, reason, price, news_snippet, validity, tp_pct, sl_pct, raw_data, created_at, source)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            record['time'], record['symbol'], record['action'], record['confidence'], 
+            record['reason'], record['price'], record['news_snippet'], record['validity'], record['tp_pct'], record['sl_pct'], json.dumps(record),
+            time.time(), record.get('source'),
+        ))
 
     def log_trade(self, record, decision_id=None):
         """
-        Kapanan işlemi DB'ye kaydeder.
+        Kapanan işlemi yazma kuyruğuna ekler. Dönüş: Future -> trade ID'si
         """
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO trades (decision_id, timestamp, symbol, side, entry_price, exit_price, pnl, reason, peak_price)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                    decision_id, 
-                    record.get('time'), 
-                    record.get('symbol'), 
-                    record.get('side'),
-                    record.get('entry'), 
-                    record.get('exit'), 
-                    record.get('pnl'), 
-                    record.get('reason'), 
-                    record.get('peak', 0) # <--- Tutarlılık sağlandı
-                ))
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            print(f"❌ DB Trade Log Hatası: {e}")
+        future = self.writer.submit(self._insert_trade, dict(record), decision_id)
+
+        def remember_id(f):
+            # Hafızadaki kayıt DB id'sini öğrenir (Eski işlemler sayfası bu imleçten devam eder)
+            if f.exception() is None:
+                record['id'] = f.result()
+
+        future.add_done_callback(remember_id)
+        return future
+
+    @staticmethod
+    def _insert_trade(conn, record, decision_id):
+        """İşlem satırı + performans özetleri (Yazıcı thread'inde, tek transaction)."""
+        trade_id = conn.execute('''
+            INSERT INTO trades (decision_id, timestamp, symbol, side, entry_price, exit_price, pnl, reason, peak_price, trough_price, closed_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+                decision_id, 
+                record.get('time'), 
+                record.get('symbol'), 
+                record.get('side'),
+                record.get('entry'), 
+                record.get('exit'), 
+                record.get('pnl'), 
+                record.get('reason'), 
+                record.get('peak', 0), # <--- Tutarlılık sağlandı
+                record.get('trough'),
+                record.get('date'),
+            )).lastrowid
+        decision = conn.execute(
+            'SELECT confidence, source FROM decisions WHERE id = ?', (decision_id,)
+        ).fetchone() if decision_id is not None else None
+        confidence, source = decision or (None, None)
+        MemoryManager._upsert_rollups(conn, record, confidence, source)
+        return trade_id
+
+    @staticmethod
+    def _upsert_rollups(conn, record, confidence, source, missing='?'):
+        """missing: Eksik alanların anahtarı (Canlı: '?', ilk doldurmada eski satırlar: LEGACY_KEY)."""
+        pnl = record.get('pnl') or 0.0
+        mae, mfe = excursions(record.get('side'), record.get('entry'), record.get('peak'), record.get('trough'))
+        values = (1 if pnl > 0 else 0, pnl, pnl * pnl, mae, mfe)
+        keys = (
+            ('symbol', record.get('symbol') or missing),
+            ('day', record.get('date') or missing),
+            ('confidence', confidence_bucket(confidence) if confidence is not None else missing),
+            ('source', source or missing),
+            ('close_reason', record.get('reason') or missing),
+        )
+        conn.executemany('''
+            INSERT INTO trade_rollups (dimension, key, count, wins, pnl_sum, pnl_sq_sum, max_adverse, max_favorable)
+            VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+            ON CONFLICT (dimension, key) DO UPDATE SET
+                count = count + 1,
+                wins = wins + excluded.wins,
+                pnl_sum = pnl_sum + excluded.pnl_sum,
+                pnl_sq_sum = pnl_sq_sum + excluded.pnl_sq_sum,
+                max_adverse = MAX(max_adverse, excluded.max_adverse),
+                max_favorable = MAX(max_favorable, excluded.max_favorable)
+        ''', [(dimension, key) + values for dimension, key in keys])
+
+    def get_rollups(self, dimension):
+        """
+        Bir kırılımın özetleri (Satır sayısı kırılım anahtarı kadar; işlem sayısından bağımsız).
+        dimension: symbol / day / confidence / source / close_reason
+        """
+        rows = self._query(
+            'SELECT * FROM trade_rollups WHERE dimension = ? ORDER BY key', (dimension,)
+        )
+        result = []
+        for r in rows:
+            n = r['count']
+            mean = r['pnl_sum'] / n
+            variance = max(0.0, r['pnl_sq_sum'] / n - mean * mean)
+            result.append({
+                'key': r['key'], 'count': n, 'wins': r['wins'], 'win_rate': r['wins'] / n * 100,
+                'pnl': r['pnl_sum'], 'avg_pnl': mean, 'std_pnl': math.sqrt(variance),
+                'max_adverse': r['max_adverse'], 'max_favorable': r['max_favorable'],
+            })
+        return result
 
     # --- YENİ: YÜKLEME VE RAPORLAMA ---
 
@@ -168,13 +364,8 @@ class MemoryManager:
         """
         Program açılışında son 100 kararı ve işlemi hafızaya yükler.
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row # Dict gibi erişmek için
-        cursor = conn.cursor()
-        
         # 1. Kararları Yükle
-        cursor.execute('SELECT * FROM decisions ORDER BY id DESC LIMIT 100')
-        decisions = cursor.fetchall()
+        decisions = self._query('SELECT * FROM decisions ORDER BY id DESC LIMIT 100')
         for d in reversed(decisions): # Eskiden yeniye ekle (Deque yapısı için)
             rec = {
                 "time": d['timestamp'], "symbol": d['symbol'], "action": d['action'],
@@ -184,37 +375,125 @@ class MemoryManager:
             ctx.ai_decisions.append(rec)
 
         # 2. İşlemleri Yükle
-        cursor.execute('SELECT * FROM trades ORDER BY id DESC LIMIT 50')
-        trades = cursor.fetchall()
+        trades = self._query('SELECT * FROM trades ORDER BY id DESC LIMIT 50')
         for t in reversed(trades):
             rec = {
-                'time': t['timestamp'], 'symbol': t['symbol'], 'side': t['side'],
+                'id': t['id'], 'time': t['timestamp'], 'symbol': t['symbol'], 'side': t['side'],
                 'pnl': t['pnl'], 'reason': t['reason'], 'entry': t['entry_price'],
                 'exit': t['exit_price']
             }
             ctx.exchange.history.append(rec)
-            
-        conn.close()
-        print(f"♻️ Hafıza Tazelendi: {len(decisions)} Karar, {len(trades)} İşlem yüklendi.")
 
-    def get_full_trade_story(self):
-        """Hangi Karar -> Hangi İşleme -> Hangi Sonuca yol açtı? (Genişletilmiş)"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # peak_price, entry_price ve exit_price verilerini de çekiyoruz
-        query = '''
+        # 3. İstatistikleri Tohumla (Tüm geçmiş tek geçişte; sonrası kapanışlarda artımlı)
+        with self._read_lock:
+            cursor = self._read_conn.execute('''
+                SELECT t.symbol, t.pnl, d.confidence
+                FROM trades t
+                LEFT JOIN decisions d ON d.id = t.decision_id
+                ORDER BY t.id
+            ''')
+            for t in cursor:
+                ctx.exchange.stats.add(t['pnl'] or 0.0, t['symbol'], t['confidence'])
+
+        print(f"♻️ Hafıza Tazelendi: {len(decisions)} Karar, {len(trades)} İşlem yüklendi ({ctx.exchange.stats.count} işlem istatistikte).")
+
+    def get_trades(self, before_id=None, limit=50):
+        """
+        Kapanmış işlemleri yeniden eskiye sayfa sayfa döner (Hafızadaki sınırlı geçmişin ötesi için).
+        before_id: Önceki sayfanın imleci (Keyset: Yeni kapanan işlemler sayfaları kaydırmaz)
+        Dönüş: (kayıtlar, sonraki_imleç), kayıtlar exchange.history ile aynı formatta. Son sayfada imleç None.
+        """
+        if before_id is None:
+            rows = self._query('SELECT * FROM trades ORDER BY id DESC LIMIT ?', (limit,))
+        else:
+            rows = self._query(
+                'SELECT * FROM trades WHERE id < ? ORDER BY id DESC LIMIT ?', (before_id, limit)
+            )
+        trades = [
+            {
+                'id': t['id'], 'time': t['timestamp'], 'symbol': t['symbol'], 'side': t['side'],
+                'pnl': t['pnl'], 'reason': t['reason'], 'entry': t['entry_price'],
+                'exit': t['exit_price'], 'peak': t['peak_price'] or 0.0,
+            }
+            for t in rows
+        ]
+        next_cursor = trades[-1]['id'] if len(trades) == limit else None
+        return trades, next_cursor
+
+    def query_trade_story(
+        self,
+        symbol=None,
+        actions=("LONG", "SHORT"),
+        since=None,
+        until=None,
+        min_confidence=None,
+        max_confidence=None,
+        before_id=None,
+        limit=100,
+    ):
+        """
+        Karar -> İşlem -> Sonuç sorgusu (Filtreli, keyset sayfalama).
+        symbol: "BTC" / "btcusdt" | actions: Tek yön veya liste | since/until: Epoch (created_at)
+        before_id: Önceki sayfanın imleci (OFFSET yok: Her sayfa indeksten sabit sürede okunur)
+        Dönüş: (satırlar, sonraki_imleç). Son sayfada imleç None.
+
+        Birden fazla yön için `action IN (...)` tüm eşleşmeleri sıralatır (Temp B-tree).
+        Bunun yerine her yön (action, id) indeksinden ayrı okunur ve id sırasıyla birleştirilir.
+        """
+        where, params = [], []
+        if symbol:
+            where.append('d.symbol = ?')
+            params.append(symbol.upper().replace("USDT", ""))
+        # Tarih aralığı id aralığına çevrilir (id ve created_at aynı sırada artar):
+        # Tarama aralığın sonunda durur, eski kayıtlara inmez
+        for bound, op, id_op in ((since, '>=', '>='), (until, '<', '<')):
+            if bound is None:
+                continue
+            where.append(f'd.created_at {op} ?')
+            params.append(bound)
+            first = self._query(
+                'SELECT id FROM decisions WHERE created_at >= ? ORDER BY created_at LIMIT 1', (bound,)
+            )
+            if first:
+                where.append(f'd.id {id_op} ?')
+                params.append(first[0]['id'])
+            elif id_op == '>=':
+                return [], None  # Aralıkta hiç kayıt yok
+        if min_confidence is not None:
+            where.append('d.confidence >= ?')
+            params.append(min_confidence)
+        if max_confidence is not None:
+            where.append('d.confidence <= ?')
+            params.append(max_confidence)
+        if before_id is not None:
+            where.append('d.id < ?')
+            params.append(before_id)
+
+        if isinstance(actions, str):
+            actions = [actions]
+        if actions:
+            where.append('d.action = ?')
+
+        query = f'''
             SELECT 
-                d.timestamp as time, d.symbol, d.action, d.confidence, d.reason as ai_reason,
+                d.id, d.timestamp as time, d.created_at, d.symbol, d.action, d.confidence, d.reason as ai_reason,
                 t.entry_price, t.exit_price, t.pnl, t.reason as close_reason, t.peak_price
             FROM decisions d
             LEFT JOIN trades t ON t.decision_id = d.id
-            WHERE d.action IN ('LONG', 'SHORT')
+            {'WHERE ' + ' AND '.join(where) if where else ''}
             ORDER BY d.id DESC
-            LIMIT 100
+            LIMIT ?
         '''
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
\ No newline at end of file
+        if actions:
+            pages = [self._query(query, (*params, action, limit)) for action in actions]
+            merged = heapq.merge(*pages, key=lambda row: -row['id'])
+            rows = [dict(row) for row in islice(merged, limit)]
+        else:
+            rows = [dict(row) for row in self._query(query, (*params, limit))]
+        next_cursor = rows[-1]['id'] if len(rows) == limit else None
+        return rows, next_cursor
+
+    def get_full_trade_story(self):
+        """Hangi Karar -> Hangi İşleme -> Hangi Sonuca yol açtı? (Son 100 işlem kararı)"""
+        rows, _ = self.query_trade_story(limit=100)
+        return rows
@@ -0,0 +1,170 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from config import DB_BATCH_SIZE
+
+_STOP = object()
+
+
+def connect(db_path, **kwargs):
+    """WAL modunda bağlantı: Okuyucular yazıcıyı, yazıcı okuyucuları bloklamaz."""
+    conn = sqlite3.connect(db_path, **kwargs)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # WAL'da commit başına fsync yok, checkpoint'te var
+    return conn
+
+
+class DBWriter:
+    """
+    SQLite yazmalarının tek sahibi (Ayrı thread, kalıcı tek bağlantı).
+    Event loop sadece kuyruğa iş bırakır ve bir Future alır; thread kuyrukta biriken
+    işleri tek transaction'da çalıştırıp birlikte commit eder (Group commit).
+    Future'lar commit sonrası sonuçlanır (Örn. INSERT'in satır id'si).
+    """
+
+    def __init__(self, db_path, batch_size=DB_BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+
+        # Metrikler
+        self.writes = 0
+        self.commits = 0
+        self.errors = 0
+        self.max_batch = 0
+        self.last_commit_ms = 0.0
+
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        """fn(conn, *args) yazıcı thread'inde çalışır. Dönüş: concurrent.futures.Future"""
+        future = Future()
+        self._queue.put((fn, args, future, False))
+        return future
+
+    def submit_isolated(self, fn, *args):
+        """
+        submit gibi, ama iş transaction dışında çalışır: Önce biriken batch commit edilir.
+        executescript gibi açık transaction'ı kendisi commit eden işler için (Örn. incremental_vacuum).
+        """
+        future = Future()
+        self._queue.put((fn, args, future, True))
+        return future
+
+    def execute(self, sql, params=()):
+        """Tek ifade. Future -> lastrowid"""
+        return self.submit(_execute, sql, params)
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def close(self, timeout=5.0):
+        """Kuyruktakileri yazıp bağlantıyı kapatır."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        conn = connect(self.db_path)
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            if item[3]:
+                self._run_isolated(conn, item)
+                continue
+            # Biz commit ederken biriken her şeyi aynı transaction'a al
+            batch = [item]
+            isolated = None
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    running = False
+                    break
+                if item[3]:
+                    isolated = item  # Sıra korunur: Öncekiler commit edildikten sonra çalışır
+                    break
+                batch.append(item)
+            self._write_batch(conn, batch)
+            if isolated is not None:
+                self._run_isolated(conn, isolated)
+        conn.close()
+
+    def _run_isolated(self, conn, item):
+        fn, args, future, _ = item
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = fn(conn, *args)
+            if conn.in_transaction:
+                conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            self.errors += 1
+            print(f"❌ DB Yazma Hatası ({fn.__name__}): {e}")
+            future.set_exception(e)
+            return
+        self.writes += 1
+        self.commits += 1
+        future.set_result(result)
+
+    def _write_batch(self, conn, batch):
+        start = time.perf_counter()
+        results = []
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        for fn, args, future, _ in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            # Her iş kendi savepoint'inde: Hata veren işin yarım yazmaları geri alınır, batch devam eder
+            conn.execute("SAVEPOINT job")
+            try:
+                results.append((future, fn(conn, *args), None))
+                conn.execute("RELEASE job")
+            except Exception as e:
+                conn.execute("ROLLBACK TO job")
+                conn.execute("RELEASE job")
+                self.errors += 1
+                print(f"❌ DB Yazma Hatası ({fn.__name__}): {e}")
+                results.append((future, None, e))
+
+        try:
+            conn.commit()
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ DB Commit Hatası ({len(results)} iş): {e}")
+            conn.rollback()
+            results = [(future, None, err or e) for future, _, err in results]
+
+        self.writes += len(results)
+        self.commits += 1
+        self.max_batch = max(self.max_batch, len(batch))
+        self.last_commit_ms = (time.perf_counter() - start) * 1000
+        for future, result, err in results:
+            if err is None:
+                future.set_result(result)
+            else:
+                future.set_exception(err)
+
+    def metrics(self):
+        return {
+            "queue_depth": self.depth,
+            "writes": self.writes,
+            "commits": self.commits,
+            "errors": self.errors,
+            "max_batch": self.max_batch,
+            "last_commit_ms": self.last_commit_ms,
+        }
+
+
+def _execute(conn, sql, params):
+    return conn.execute(sql, params).lastrowid
@@ -1,14 +1,107 @@
-import time 
+import heapq
+from collections import deque
+
+import numpy as np
+
+from clock import WallClock
+from config import TRADE_HISTORY_LIMIT
+from fill_model import FillModel
+from position_book import PositionBook, PositionsView, CLOSE_REASONS, TAKE_PROFIT, KEEP
+from trade_stats import TradeStats
+
+NO_EVENT = (None, None, None, 0.0, 0.0, None)
+
 
 class PaperExchange:
-    def __init__(self, balance):
+    def __init__(self, balance, clock=None, fill_model=None):
         self.balance = balance
-        self.positions = {} 
+        # Canlıda sistem saati, backtest'te SimulatedClock (Aynı motor iki modda da çalışır)
+        self.clock = clock or WallClock()
+        # Komisyon, kayma ve fonlama (PnL'ler bunlar düşülmüş, net değerlerdir)
+        self.fill_model = fill_model or FillModel()
+        # Sayısal durum (giriş, miktar, TP/SL, peak, süre, tetik bandı) SoA defterde;
+        # sayısal olmayanlar (margin, kaldıraç, karar id...) sembol başına meta sözlüğünde.
+        # Fiyat bandın içindeyse hiçbir durum değişmez (TP, SL, trailing basamağı yok).
+        self.book = PositionBook()
+        self._meta = {}
+        self.positions = PositionsView(self.book, self._meta)  # Eski dict arayüzü (Dashboard)
         self.total_pnl = 0.0
-        self.history = []
+        # Son işlemler (Sınırlı); toplu istatistikler kapanışta artımlı güncellenir
+        self.history = deque(maxlen=TRADE_HISTORY_LIMIT)
+        self.stats = TradeStats()
+        self.fast_checks = 0
+        self.full_checks = 0
+        # Süre dolumu min-heap'i: (expiry_time, sembol). Kapanan pozisyonların kayıtları tembel silinir.
+        self._expiries = []
+        self.on_expiry_change = None  # En yakın süre değişince çağrılır (Monitor'ü uyandırır)
+
+    # --- SÜRE ZAMANLAYICISI ---
+    def _schedule_expiry(self, symbol, expiry_time):
+        is_earliest = not self._expiries or expiry_time < self._expiries[0][0]
+        heapq.heappush(self._expiries, (expiry_time, symbol))
+        if is_earliest and self.on_expiry_change is not None:
+            self.on_expiry_change()
+
+    def _is_live_expiry(self, entry):
+        slot = self.book.slots.get(entry[1])
+        return slot is not None and self.book.expiry[slot] == entry[0]
 
+    def next_expiry(self):
+        """En yakın geçerli süre dolumu (Açık pozisyon yoksa None)."""
+        heap = self._expiries
+        while heap and not self._is_live_expiry(heap[0]):
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_expired(self, now=None):
+        """
+        Süresi dolmuş açık pozisyonların sembolleri.
+        Tetik bantları kapatılır: Sonraki check_positions tam kontrol yapıp TIME LIMIT ile kapatır.
+        """
+        now = self.clock.time() if now is None else now
+        expired = []
+        heap = self._expiries
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            if self._is_live_expiry(entry):
+                self.book.invalidate(self.book.slots[entry[1]])
+                expired.append(entry[1])
+        return expired
+
+    @staticmethod
+    def unrealized_pnl(pos, price=None):
+        price = pos['current_price'] if price is None else price
+        if pos['side'] == 'LONG':
+            return (price - pos['entry']) * pos['qty']
+        return (pos['entry'] - price) * pos['qty']
+
+    def position_pnl(self, symbol):
+        """
+        Dashboard için anlık net PnL: Şimdi piyasa emriyle kapatılsa (Komisyon, kayma, fonlama dahil).
+        Tick başına değil, sorulunca hesaplanır.
+        """
+        pos = self.positions.get(symbol.lower())
+        return self._settle(pos, pos['current_price'])[0] if pos else 0.0
+
+    def _settle(self, pos, price, maker=False):
+        """(net_pnl, dolum_fiyatı, çıkış_komisyonu, fonlama) — TP limit emri maker, diğerleri market."""
+        fm = self.fill_model
+        side = pos['side']
+        fill = fm.exit_price(side, price, pos['qty'] * price, maker=maker)
+        gross = self.unrealized_pnl(pos, fill)
+        exit_fee = fm.fee(pos['qty'] * fill, maker=maker)
+        funding = fm.funding_cost(
+            side, pos['qty'] * pos['entry'], pos.get('funding_rate', fm.funding_rate),
+            pos['start_time'], self.clock.time(),
+        )
+        return gross - pos.get('fees', 0.0) - exit_fee - funding, fill, exit_fee, funding
 
-    def open_position(self, symbol, side, price, tp_pct, sl_pct, amount_usdt, leverage, validity, app_state, decision_id):
+    def open_position(self, symbol, side, price, tp_pct, sl_pct, amount_usdt, leverage, validity, app_state, decision_id, funding_rate=None, book=None, confidence=None):
+        """
+        price: Sinyal fiyatı. Giriş, FillModel ile kaymış fiyattan ve taker komisyonuyla yapılır.
+        funding_rate: Canlı fonlama oranı (%), yoksa FillModel varsayılanı. book: Opsiyonel defter seviyeleri.
+        confidence: AI güven skoru (İstatistiklerde güven dilimi kırılımı için).
+        """
         if not app_state.is_running:
             return "Bot duraklatıldı.", "warning"
 
@@ -23,7 +116,10 @@ class PaperExchange:
             return "Yetersiz Bakiye!", "error"
 
         margin = amount_usdt
-        qty = (amount_usdt * leverage) / price
+        notional = amount_usdt * leverage
+        price = self.fill_model.entry_price(side, price, notional, book)
+        qty = notional / price
+        now = self.clock.time()
         
         # Hedef Fiyatlar
         if side == 'LONG':
@@ -33,101 +129,94 @@ class PaperExchange:
             tp = price * (1 - tp_pct/100)
             sl = price * (1 + sl_pct/100)
 
-        self.positions[symbol] = {
-            'entry': price,
-            'current_price': price, # Başlangıçta aynı
-            'highest_price': price, # Peak takibi için
-            'lowest_price': price,  # Peak takibi için
-            'side': side,
+        expiry_time = now + validity * 60
+        self.book.add(symbol, side, price, qty, tp, sl, expiry_time)
+        self._meta[symbol] = {
             'margin': margin,
-            'qty': qty,
             'lev': leverage,
-            'tp': tp,
-            'sl': sl,
-            'pnl': 0.0,             # Başlangıçta 0
-            'start_time': time.time(),
+            'start_time': now,
             'validity': validity,
-            'expiry_time': time.time() + validity * 60,
-            'decision_id': decision_id
+            'decision_id': decision_id,
+            'confidence': confidence,
+            'fees': self.fill_model.fee(notional),  # Giriş komisyonu (Kapanışta PnL'den düşülür)
+            'funding_rate': self.fill_model.funding_rate if funding_rate is None else funding_rate,
         }
+        self._schedule_expiry(symbol, expiry_time)
         
         self.balance -= margin
         return f"🔵 POZİSYON AÇILDI: {symbol.upper()} {side} | Giriş: {price} | TP: {tp_pct} | SL: {sl_pct} | VM: {validity}", "info"
     
-    def check_positions(self, symbol, current_price):
-        if symbol not in self.positions:
-            return None, None, None, 0.0, 0.0, None
+    def check_positions(self, symbol, current_price, high=None, low=None):
+        """
+        high/low: Son tick'ten bu yana görülen fiyat aralığı (Oluşan mumdan).
+        Verilirse iki tick arasında TP/SL'e değen fitiller de yakalanır.
+        Aralık tetik bandının içindeyse sadece fiyat/peak güncellenir (PnL sorulunca hesaplanır).
+        """
+        book = self.book
+        slot = book.slots.get(symbol)
+        if slot is None:
+            return NO_EVENT
 
-        pos = self.positions[symbol]
-        side = pos['side']
-        entry = pos['entry']
-        
-        # --- 1. REKOR TAKİBİ (PEAK PRICE) ---
-        peak_price = entry
-        if side == 'LONG':
-            current_high = pos.get('highest_price', entry)
-            if current_price > current_high:
-                pos['highest_price'] = current_price
-            peak_price = pos['highest_price']
-        else:
-            current_low = pos.get('lowest_price', entry)
-            if pos.get('lowest_price', 0) == 0 or current_price < current_low:
-                pos['lowest_price'] = current_price
-            peak_price = pos['lowest_price']
+        high = current_price if high is None or high < current_price else high
+        low = current_price if low is None or low > current_price else low
+        book.price[slot] = current_price
 
-        # --- 2. PNL HESAPLAMA ---
-        if side == 'LONG':
-            pnl = (current_price - entry) * pos['qty']
-        else:
-            pnl = (entry - current_price) * pos['qty']
-            
-        pos['pnl'] = pnl # UI görsün diye kaydet
+        # --- 0. HIZLI YOL (Tetik bandı içinde, süresi dolmamış) ---
+        # Süre dolumunu asıl zamanlayıcı heap'i (position_monitor_loop) yakalar; tick yolu yine de
+        # süresi geçmiş pozisyonu tam değerlendirmeye gönderir (Bekçi görevi durmuş olsa bile kapanır)
+        now = self.clock.time()
+        if now < book.expiry[slot] and book.in_band(slot, high, low):
+            book.track_peak(slot, high, low)
+            self.fast_checks += 1
+            return NO_EVENT
 
-        # --- 3. TRAILING STOP ---
-        roi = 0.0
-        if side == 'LONG':
-            roi = (current_price - entry) / entry * 100
-            if roi > 0.8 and pos['sl'] < entry: pos['sl'] = entry * 1.0015 
-            if roi > 1.5:
-                new_sl = entry * 1.01 
-                if pos['sl'] < new_sl: pos['sl'] = new_sl
-        elif side == 'SHORT':
-            roi = (entry - current_price) / entry * 100
-            if roi > 0.8 and pos['sl'] > entry: pos['sl'] = entry * 0.9985
-            if roi > 1.5:
-                new_sl = entry * 0.99
-                if pos['sl'] > new_sl: pos['sl'] = new_sl
+        # --- 1. TAM DEĞERLENDİRME (Peak, trailing stop, TP/SL, süre) ---
+        self.full_checks += 1
+        reason, exit_price = book.evaluate(
+            np.array([slot]), current_price, high, low, now
+        )
+        if reason[0] == KEEP:
+            return NO_EVENT
+        return self._close_triggered(symbol, int(reason[0]), float(exit_price[0]))
 
-        # --- 4. ÇIKIŞ NEDENLERİ (TIME LIMIT DAHİL) ---
-        close_reason = None
-        
-        # TP/SL Kontrolü
-        if side == 'LONG':
-            if current_price >= pos['tp']: close_reason = "TAKE PROFIT 💰"
-            elif current_price <= pos['sl']: close_reason = "STOP LOSS 🛑"
-        else:
-            if current_price <= pos['tp']: close_reason = "TAKE PROFIT 💰"
-            elif current_price >= pos['sl']: close_reason = "STOP LOSS 🛑"
+    def check_all(self, prices, highs=None, lows=None):
+        """
+        Tüm açık pozisyonları tek vektörel geçişte kontrol eder (Backtest / çoklu strateji).
+        prices/highs/lows: Slot sırasıyla hizalı diziler (book.gather ile) veya {sembol: fiyat}.
+        Dönüş: Kapanan her pozisyon için check_positions ile aynı tuple.
+        """
+        if isinstance(prices, dict):
+            prices = self.book.gather(prices)
+            highs = self.book.gather(highs) if isinstance(highs, dict) else highs
+            lows = self.book.gather(lows) if isinstance(lows, dict) else lows
+        events = self.book.check_all(prices, highs, lows, self.clock.time())
+        self.full_checks += len(events)
+        return [self._close_triggered(symbol, reason, exit_price) for symbol, reason, exit_price in events]
 
-        # SÜRE KONTROLÜ (SENİN İSTEDİĞİN EXPIRY MANTIĞI)
-        # Eğer expiry_time anahtarı yoksa hata vermesin diye .get kullanıyoruz
-        if time.time() > pos.get('expiry_time', time.time() + 999999):
-            close_reason = "TIME LIMIT ⏳"
+    def _close_triggered(self, symbol, reason_code, exit_price):
+        """Tetiklenen çıkışı dolum modeliyle netleştirir ve pozisyonu kapatır."""
+        pos = self.positions[symbol]
+        close_reason = CLOSE_REASONS[reason_code]
+        entry = pos['entry']
+        peak_price = pos['highest_price'] if pos['side'] == 'LONG' else pos['lowest_price']
 
-        if close_reason:
-            # Pozisyonu Kapatmadan önce log verilerini hazırla
+        # Fitilden kapandıysa PnL tetiklenen seviyeden hesaplanır.
+        # TP limit emri (maker, kaymasız); SL ve süre dolumu piyasa emri (taker, kaymalı).
+        pnl, exit_price, exit_fee, funding = self._settle(pos, exit_price, maker=reason_code == TAKE_PROFIT)
+        pos['current_price'] = exit_price
+        pos['exit_fee'], pos['funding'] = exit_fee, funding
 
-            decision_id = pos.get('decision_id') # <--- ID'Yİ ÇEK
+        # Pozisyonu Kapatmadan önce log verilerini hazırla
 
-            log_msg = f"🏁 KAPANDI: {symbol.upper()} ({close_reason}) | PnL: {pnl:.2f} USDT | Enter: {entry} | Close: {current_price} | Peak Seen: {peak_price}"
-            color = "success" if pnl > 0 else "error"
-            
-            # Kapatma işlemini çağır (Geçmişe kaydeder ve siler)
-            self.close_position(symbol, close_reason, pnl)
-            
-            return log_msg, color, symbol, pnl, peak_price, decision_id
+        decision_id = pos.get('decision_id') # <--- ID'Yİ ÇEK
 
-        return None, None, None, 0.0, 0.0, None
+        log_msg = f"🏁 KAPANDI: {symbol.upper()} ({close_reason}) | PnL: {pnl:.2f} USDT | Enter: {entry} | Close: {exit_price} | Peak Seen: {peak_price}"
+        color = "success" if pnl > 0 else "error"
+        
+        # Kapatma işlemini çağır (Geçmişe kaydeder ve siler)
+        self.close_position(symbol, close_reason, pnl)
+        
+        return log_msg, color, symbol, pnl, peak_price, decision_id
     
     def close_position(self, symbol, reason, pnl):
         # --- DÜZELTME: ZORUNLU KÜÇÜK HARF ---
@@ -138,6 +227,9 @@ class PaperExchange:
             return "Hata: Pozisyon bulunamadı", "error"
         
         pos = self.positions[symbol]
+        if 'exit_fee' not in pos:
+            # Manuel kapanış (Panic vb.): Maliyet dökümü için piyasa çıkışı varsayılır
+            _, _, pos['exit_fee'], pos['funding'] = self._settle(pos, pos['current_price'])
         
         # Bakiyeyi güncelle
         self.balance += pos['margin'] + pnl
@@ -147,147 +239,27 @@ class PaperExchange:
 
         if pos['side'] == 'LONG': peak_price = pos.get('highest_price', pos['entry'])
         elif pos['side'] == 'SHORT': peak_price = pos.get('lowest_price', pos['entry'])
+        trough_price = pos['lowest_price'] if pos['side'] == 'LONG' else pos['highest_price']
         # GEÇMİŞ KAYDI (Burası sende vardı ama PnL 0 geliyordu, artık düzelecek)
         record = {
-            'time': time.strftime("%H:%M:%S"),
+            'time': self.clock.strftime("%H:%M:%S"),
+            'date': self.clock.strftime("%Y-%m-%d"),
             'symbol': symbol.upper(),
             'side': pos['side'],
             'entry': pos['entry'],
             'exit': pos.get('current_price', 0),
             'pnl': pnl,
             'peak': peak_price, # <--- BURASI EKLENDİ
-            'reason': reason
+            'trough': trough_price,  # En kötü görülen fiyat (MAE)
+            'reason': reason,
+            'fees': pos.get('fees', 0.0) + pos['exit_fee'],
+            'funding': pos['funding'],
         }
         self.history.append(record)
+        self.stats.add(pnl, symbol, pos.get('confidence'))
         
-        del self.positions[symbol]
+        self.book.remove(symbol)
+        del self._meta[symbol]
         
         color = "success" if pnl > 0 else "error"
         return f"🏁 KAPANDI: {symbol.upper()} ({reason}) | PnL: {pnl:.2f} USDT", color
-    
-    def open_position_test(self, symbol, side, price, tp_pct, sl_pct, amount_usdt, leverage, validity, app_state, decision_id, now_ts):
-        """Sistem saati yerine dışarıdan gelen now_ts (timestamp) ile işlem açar."""
-        if not app_state.is_running:
-            return "Bot duraklatıldı.", "warning"
-
-        symbol = symbol.lower()
-        if symbol in self.positions:
-            return f"{symbol.upper()} zaten açık!", "warning"
-
-        margin = amount_usdt
-        qty = (amount_usdt * leverage) / price
-        
-        if side == 'LONG':
-            tp = price * (1 + tp_pct/100)
-            sl = price * (1 - sl_pct/100)
-        else:
-            tp = price * (1 - tp_pct/100)
-            sl = price * (1 + sl_pct/100)
-
-        self.positions[symbol] = {
-            'entry': price,
-            'current_price': price,
-            'highest_price': price,
-            'lowest_price': price,
-            'side': side,
-            'margin': margin,
-            'qty': qty,
-            'lev': leverage,
-            'tp': tp,
-            'sl': sl,
-            'pnl': 0.0,
-            'start_time': now_ts,
-            'validity': validity,
-            'expiry_time': now_ts + (validity * 60), # Saniyeye çevrildi
-            'decision_id': decision_id
-        }
-        
-        self.balance -= margin
-        return f"🧪 [TEST] POZİSYON AÇILDI: {symbol.upper()} {side} | Giriş: {price}", "info"
-
-    def check_positions_test(self, symbol, current_price, now_ts):
-        """Sistem saati yerine dışarıdan gelen now_ts ile kontrol yapar."""
-        symbol = symbol.lower()
-        if symbol not in self.positions:
-            return None, None, None, 0.0, 0.0, None
-
-        pos = self.positions[symbol]
-        side = pos['side']
-        entry = pos['entry']
-        
-        # Peak Price Takibi
-        if side == 'LONG':
-            if current_price > pos.get('highest_price', entry):
-                pos['highest_price'] = current_price
-            peak_price = pos['highest_price']
-            pnl = (current_price - entry) * pos['qty']
-        else:
-            if current_price < pos.get('lowest_price', entry):
-                pos['lowest_price'] = current_price
-            peak_price = pos['lowest_price']
-            pnl = (entry - current_price) * pos['qty']
-                
-        pos['pnl'] = pnl
-
-        # --- 3. TRAILING STOP ---
-        roi = 0.0
-        if side == 'LONG':
-            roi = (current_price - entry) / entry * 100
-            if roi > 0.8 and pos['sl'] < entry: pos['sl'] = entry * 1.0015 
-            if roi > 1.5:
-                new_sl = entry * 1.01 
-                if pos['sl'] < new_sl: pos['sl'] = new_sl
-        elif side == 'SHORT':
-            roi = (entry - current_price) / entry * 100
-            if roi > 0.8 and pos['sl'] > entry: pos['sl'] = entry * 0.9985
-            if roi > 1.5:
-                new_sl = entry * 0.99
-                if pos['sl'] > new_sl: pos['sl'] = new_sl
-
-        close_reason = None
-        # TP/SL Kontrolü
-        if side == 'LONG':
-            if current_price >= pos['tp']: close_reason = "TAKE PROFIT 💰"
-            elif current_price <= pos['sl']: close_reason = "STOP LOSS 🛑"
-        else:
-            if current_price <= pos['tp']: close_reason = "TAKE PROFIT 💰"
-            elif current_price >= pos['sl']: close_reason = "STOP LOSS 🛑"
-
-        # Süre Kontrolü (Simülasyon Zamanı ile)
-        if now_ts > pos.get('expiry_time', 0):
-            close_reason = "TIME LIMIT ⏳"
-
-        if close_reason:
-            decision_id = pos.get('decision_id')
-            log_msg, color = self.close_position_test(symbol, close_reason, pnl, now_ts)
-            return log_msg, color, symbol, pnl, peak_price, decision_id
-
-        return None, None, None, 0.0, 0.0, None
-
-    def close_position_test(self, symbol, reason, pnl, now_ts):
-        """Geçmişe kayıt atarken simülasyon saatini kullanır."""
-        symbol = symbol.lower()
-        if symbol not in self.positions: 
-            return "Hata: Pozisyon bulunamadı", "error"
-        
-        pos = self.positions[symbol]
-        self.balance += pos['margin'] + pnl
-        self.total_pnl += pnl
-        
-        # Simülasyon saatini formatla
-        readable_time = time.strftime("%H:%M:%S", time.gmtime(now_ts))
-        
-        record = {
-            'time': readable_time,
-            'symbol': symbol.upper(),
-            'side': pos['side'],
-            'entry': pos['entry'],
-            'exit': pos.get('current_price', 0),
-            'pnl': pnl,
-            'peak': pos.get('highest_price') if pos['side'] == 'LONG' else pos.get('lowest_price'),
-            'reason': reason
-        }
-        self.history.append(record)
-        del self.positions[symbol]
-        
-        return f"🏁 [TEST] KAPANDI: {symbol.upper()} | PnL: {pnl:.2f} USDT", "success"
\ No newline at end of file
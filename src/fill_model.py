@@ -0,0 +1,111 @@
+from config import (
+    PAPER_TAKER_FEE,
+    PAPER_MAKER_FEE,
+    PAPER_SPREAD_BPS,
+    PAPER_IMPACT_BPS,
+    PAPER_BOOK_DEPTH_USDT,
+    PAPER_FUNDING_RATE,
+    FUNDING_INTERVAL_HOURS,
+    INTRABAR_PATH,
+)
+
+
+class FillModel:
+    """
+    Kağıt işlemler için gerçekçi dolum modeli (Deterministik, rastgelelik yok).
+    - Mum içi fiyat yolu: O->H->L->C veya O->L->H->C (Varsayılan: Mumun yönüne göre)
+    - Taker/Maker komisyonu
+    - Emir defteri derinliğine göre kayma (Defter verilirse seviye seviye yürünür)
+    - Fonlama (funding) tahakkuku: Pozisyon süresince geçilen her fonlama anında
+    """
+
+    def __init__(
+        self,
+        taker_fee=PAPER_TAKER_FEE,
+        maker_fee=PAPER_MAKER_FEE,
+        spread_bps=PAPER_SPREAD_BPS,
+        impact_bps=PAPER_IMPACT_BPS,
+        book_depth_usdt=PAPER_BOOK_DEPTH_USDT,
+        funding_rate=PAPER_FUNDING_RATE,
+        funding_interval_hours=FUNDING_INTERVAL_HOURS,
+        intrabar_path=INTRABAR_PATH,
+    ):
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.spread_bps = spread_bps
+        self.impact_bps = impact_bps
+        self.book_depth_usdt = book_depth_usdt
+        self.funding_rate = funding_rate  # Yüzde, fonlama başına
+        self.funding_interval = funding_interval_hours * 3600
+        self.intrabar_path = intrabar_path
+
+    # --- MUM İÇİ YOL ---
+    def bar_path(self, open_price, high, low, close):
+        """
+        Replay için mumun içindeki fiyat sırası.
+        "direction": Yükselen mum önce dibi görmüş (O->L->H->C), düşen mum önce tepeyi (O->H->L->C).
+        """
+        mode = self.intrabar_path
+        if mode == "ohlc" or (mode == "direction" and close < open_price):
+            return (open_price, high, low, close)
+        return (open_price, low, high, close)
+
+    # --- KAYMA ---
+    @staticmethod
+    def walk_book(levels, notional):
+        """
+        Defter seviyelerinde [(fiyat, miktar), ...] (en iyi fiyattan başlayarak) `notional` USDT'lik
+        piyasa emrinin ortalama dolum fiyatı. Derinlik yetmezse kalan kısım son seviyeden dolar.
+        """
+        remaining = notional
+        cost = qty = 0.0
+        price = levels[0][0]
+        for price, level_qty in levels:
+            take = min(remaining, price * level_qty)
+            cost += take
+            qty += take / price
+            remaining -= take
+            if remaining <= 0:
+                break
+        if remaining > 0:
+            cost += remaining
+            qty += remaining / price
+        return cost / qty
+
+    def slippage_bps(self, notional, depth_usdt=None):
+        """Yarım spread + emir büyüklüğüyle doğrusal artan etki (baz puan)."""
+        depth = depth_usdt or self.book_depth_usdt
+        return self.spread_bps + self.impact_bps * notional / depth
+
+    def market_fill(self, buy, price, notional, book=None, depth_usdt=None):
+        """Piyasa emrinin dolum fiyatı (Alışta yukarı, satışta aşağı kayar)."""
+        if book:
+            return self.walk_book(book, notional)
+        slip = self.slippage_bps(notional, depth_usdt) / 10_000
+        return price * (1 + slip) if buy else price * (1 - slip)
+
+    def entry_price(self, side, price, notional, book=None):
+        return self.market_fill(side == "LONG", price, notional, book)
+
+    def exit_price(self, side, price, notional, maker=False, book=None):
+        """Limit (maker) çıkış tetik fiyatından kaymasız dolar; market çıkış kayar."""
+        if maker:
+            return price
+        return self.market_fill(side == "SHORT", price, notional, book)
+
+    # --- KOMİSYON & FONLAMA ---
+    def fee(self, notional, maker=False):
+        return notional * (self.maker_fee if maker else self.taker_fee)
+
+    def funding_events(self, start_ts, end_ts):
+        """(start, end] aralığında geçilen fonlama anı sayısı (Binance: 00/08/16 UTC)."""
+        interval = self.funding_interval
+        return max(0, int(end_ts // interval) - int(start_ts // interval))
+
+    def funding_cost(self, side, notional, rate_pct, start_ts, end_ts):
+        """Ödenen fonlama (Pozitif oranda LONG öder, SHORT alır). Negatif değer = gelir."""
+        n = self.funding_events(start_ts, end_ts)
+        if n == 0:
+            return 0.0
+        paid = notional * rate_pct / 100 * n
+        return paid if side == "LONG" else -paid
@@ -0,0 +1,146 @@
+import math
+from collections import deque
+
+
+class IndicatorEngine:
+    """
+    Kapanan her mumda O(1) güncellenen teknik göstergeler.
+    Okumalar düz attribute erişimidir (rsi, ema[9], atr, bb_width, vwap).
+    """
+
+    def __init__(self, rsi_period=14, ema_periods=(9, 21, 50), atr_period=14, bb_period=20, bb_mult=2.0):
+        self.rsi_period = rsi_period
+        self.ema_periods = tuple(ema_periods)
+        self.atr_period = atr_period
+        self.bb_period = bb_period
+        self.bb_mult = bb_mult
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.prev_close = None
+
+        # RSI (Wilder): İlk `period` farkla basit ortalama, sonra Wilder yumuşatma
+        self.rsi = 50.0  # Veri yoksa nötr
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+
+        # EMA: İlk kapanışla tohumlanır
+        self.ema = {p: None for p in self.ema_periods}
+
+        # ATR (Wilder)
+        self.atr = 0.0
+        self._tr_seed = 0.0
+
+        # Bollinger: Kayan toplam ve kareler toplamı
+        self._bb_window = deque(maxlen=self.bb_period)
+        self._bb_sum = 0.0
+        self._bb_sq_sum = 0.0
+        self.bb_width = 0.0  # (Üst - Alt) / Orta * 100
+
+        # Session VWAP (UTC gün başında sıfırlanır)
+        self._session = None
+        self._pv_sum = 0.0
+        self._vol_sum = 0.0
+        self.vwap = 0.0
+
+    def update(self, minute_ts, open_price, high, low, close, volume):
+        prev = self.prev_close
+        self.count += 1
+
+        # --- RSI ---
+        if prev is not None:
+            delta = close - prev
+            gain = delta if delta > 0 else 0.0
+            loss = -delta if delta < 0 else 0.0
+            n = self.count - 1  # Şu ana kadarki fark sayısı
+            p = self.rsi_period
+            if n <= p:
+                self._avg_gain += gain / p
+                self._avg_loss += loss / p
+            else:
+                self._avg_gain = (self._avg_gain * (p - 1) + gain) / p
+                self._avg_loss = (self._avg_loss * (p - 1) + loss) / p
+            if n >= p:
+                if self._avg_loss == 0:
+                    self.rsi = 100.0
+                else:
+                    rs = self._avg_gain / self._avg_loss
+                    self.rsi = 100 - (100 / (1 + rs))
+
+        # --- EMA ---
+        for p, value in self.ema.items():
+            if value is None:
+                self.ema[p] = close
+            else:
+                alpha = 2 / (p + 1)
+                self.ema[p] = value + alpha * (close - value)
+
+        # --- ATR ---
+        if prev is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - prev), abs(low - prev))
+        p = self.atr_period
+        if self.count <= p:
+            self._tr_seed += tr
+            self.atr = self._tr_seed / self.count
+        else:
+            self.atr = (self.atr * (p - 1) + tr) / p
+
+        # --- BOLLINGER WIDTH ---
+        if len(self._bb_window) == self.bb_period:
+            old = self._bb_window[0]
+            self._bb_sum -= old
+            self._bb_sq_sum -= old * old
+        self._bb_window.append(close)
+        self._bb_sum += close
+        self._bb_sq_sum += close * close
+        n = len(self._bb_window)
+        mean = self._bb_sum / n
+        var = max(self._bb_sq_sum / n - mean * mean, 0.0)
+        self.bb_width = (2 * self.bb_mult * math.sqrt(var) / mean * 100) if mean else 0.0
+
+        # --- SESSION VWAP ---
+        session = minute_ts // 1440
+        if session != self._session:
+            self._session = session
+            self._pv_sum = 0.0
+            self._vol_sum = 0.0
+        typical = (high + low + close) / 3
+        self._pv_sum += typical * volume
+        self._vol_sum += volume
+        self.vwap = self._pv_sum / self._vol_sum if self._vol_sum > 0 else typical
+
+        self.prev_close = close
+
+    @property
+    def is_warm(self):
+        """RSI ve ATR için yeterli mum görüldü mü?"""
+        return self.count > max(self.rsi_period, self.atr_period)
+
+    def snapshot(self, price=0.0):
+        """Prompt ve loglar için anlık değerler (dict)."""
+        ref = price or self.prev_close or 0.0
+        return {
+            "rsi": self.rsi,
+            **{f"ema_{p}": (v or 0.0) for p, v in self.ema.items()},
+            "atr": self.atr,
+            "atr_pct": (self.atr / ref * 100) if ref else 0.0,
+            "bb_width": self.bb_width,
+            "vwap": self.vwap,
+            "vwap_dist_pct": ((ref - self.vwap) / self.vwap * 100) if self.vwap else 0.0,
+        }
+
+    def summary(self, price=0.0):
+        """ANALYZE_SPECIFIC_PROMPT için tek satırlık özet."""
+        if self.count == 0:
+            return "N/A"
+        s = self.snapshot(price)
+        emas = " / ".join(f"{s[f'ema_{p}']:.6g}" for p in self.ema_periods)
+        periods = "/".join(str(p) for p in self.ema_periods)
+        return (
+            f"EMA {periods}: {emas} | ATR({self.atr_period}): {s['atr_pct']:.2f}% | "
+            f"BB Width({self.bb_period}): {s['bb_width']:.2f}% | "
+            f"VWAP: {s['vwap']:.6g} (Price {s['vwap_dist_pct']:+.2f}%)"
+        )
@@ -1,5 +1,5 @@
 import asyncio
-from collections import defaultdict, deque  # <--- 'deque' EKLENDİ
+from collections import deque
 import time
 import os
 from nicegui import ui, app
@@ -25,10 +25,16 @@ from config import (
     STARTING_BALANCE,
     LEVERAGE,
     FIXED_TRADE_AMOUNT,
+    MARKET_SNAPSHOT_DIR,
 )
 from exchange import PaperExchange
+from clock import WallClock
 from brain import AgentBrain
-from price_buffer import PriceBuffer
+from market_memory import MarketMemory
+from backfill import BackfillPlanner
+from stream_manager import StreamManager
+from tick_dispatcher import TickDispatcher
+from news_queue import NewsQueue
 from binance_client import BinanceExecutionEngine
 from data_collector import TrainingDataCollector
 from dataset_manager import DatasetManager
@@ -53,7 +59,8 @@ class BotContext:
 
 class SharedState:
     def __init__(self):
-        self.is_running = True
+        self.is_running = True         # Dashboard duraklatma anahtarı (Sadece işlemeyi durdurur)
+        self.is_shutting_down = False  # Uygulama kapanıyor (Arka plan görevlerinin ömrü)
 
 if __name__ == "__main__":
     # --- GLOBAL STATE CONTAINER ---
@@ -62,8 +69,9 @@ if __name__ == "__main__":
     # --- INITIALIZATION ---
     # 1. Objects
     ctx.app_state = SharedState()
-    ctx.market_memory = defaultdict(PriceBuffer)
-    ctx.exchange = PaperExchange(STARTING_BALANCE)
+    ctx.market_memory = MarketMemory()
+    ctx.clock = WallClock()
+    ctx.exchange = PaperExchange(STARTING_BALANCE, clock=ctx.clock)
     ctx.brain = AgentBrain(
         use_groqcloud=USE_GROQCLOUD,
         api_key=GROQCLOUD_API_KEY,
@@ -76,8 +84,11 @@ if __name__ == "__main__":
     ctx.telegram_client = TelegramClient(
         SESSION_PATH, API_ID, API_HASH, use_ipv6=False, timeout=10
     )
-    ctx.stream_command_queue = None
+    ctx.streams = None
+    ctx.dispatcher = None
+    ctx.news_queue = None
     ctx.memory = MemoryManager()
+    ctx.storage_metrics = {}
 
 
     # 2. Logger Wrapper
@@ -106,12 +117,32 @@ if __name__ == "__main__":
 
 
     ctx.log_ui = log_ui_wrapper
+    ctx.backfill = BackfillPlanner(ctx.real_exchange, ctx.market_memory, log=ctx.log_ui)
 
 
     # --- STARTUP TASKS ---
     async def start_tasks():
         ctx.memory.load_recent_history(ctx)
-        ctx.stream_command_queue = asyncio.Queue()
+
+        # Warm restart: Son snapshot'ı yükle (Kapalı kalınan süre ilk analizde backfill edilir)
+        try:
+            loaded = ctx.market_memory.load_snapshot(MARKET_SNAPSHOT_DIR)
+            if loaded:
+                ctx.log_ui(f"🧊 Market Snapshot Yüklendi: {loaded} sembol", "success")
+        except Exception as e:
+            ctx.log_ui(f"⚠️ Market Snapshot Yüklenemedi: {e}", "warning")
+
+        # Alıcı sadece çözer ve slotlara bırakır; işleme dispatcher görevinde
+        ctx.dispatcher = TickDispatcher(
+            handler=lambda records: services.handle_stream_message(ctx, records),
+            log=ctx.log_ui,
+        )
+        ctx.streams = StreamManager(on_message=ctx.dispatcher.put, log=ctx.log_ui)
+        # Telegram/RSS haberleri sınırlı worker havuzunda işlenir (Manuel giriş doğrudan çalışır)
+        ctx.news_queue = NewsQueue(
+            handler=lambda msg, source: services.process_news(msg, source, ctx),
+            log=ctx.log_ui,
+        )
         # 1. API Connection & Sync
         if REAL_TRADING_ENABLED:
             await ctx.real_exchange.connect()
@@ -137,10 +168,21 @@ if __name__ == "__main__":
 
         # 2. Launch Loops
         # asyncio.create_task(services.rss_loop(ctx)) # RSS Loopü devre dışı bırakıldı
+        # Ömür uygulamanın ömrü: Duraklatma kontrolü process_news'te (Worker'lar ölmez)
+        asyncio.create_task(ctx.news_queue.run(lambda: not ctx.app_state.is_shutting_down))
         asyncio.create_task(services.websocket_loop(ctx))
         asyncio.create_task(services.collector_loop(ctx))
         asyncio.create_task(services.telegram_loop(ctx))
         asyncio.create_task(services.position_monitor_loop(ctx))
+        asyncio.create_task(services.snapshot_loop(ctx))
+        asyncio.create_task(services.news_retention_loop(ctx))
+
+    def save_market_snapshot():
+        try:
+            saved = ctx.market_memory.save_snapshot(MARKET_SNAPSHOT_DIR)
+            print(f"🧊 Market Snapshot Kaydedildi: {saved} sembol")
+        except Exception as e:
+            print(f"⚠️ Market Snapshot Kaydedilemedi: {e}")
 
 
     # --- UI ENTRY POINT ---
@@ -158,4 +200,10 @@ if __name__ == "__main__":
 
 
     app.on_startup(start_tasks)
+    def stop_tasks():
+        ctx.app_state.is_shutting_down = True
+
+    app.on_shutdown(stop_tasks)
+    app.on_shutdown(save_market_snapshot)
+    app.on_shutdown(ctx.memory.close)
     ui.run(title="Crypto AI", host="0.0.0.0", dark=True, port=8080, reload=False)
\ No newline at end of file
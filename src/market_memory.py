@@ -0,0 +1,241 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from price_buffer import PriceBuffer, ColumnStore, DEFAULT_CAPACITY, ROLLUP_FRAMES, CLOSE, HEAD, SIZE, PRICE
+
+# Snapshot'a yazılan ColumnStore kolonları
+SNAPSHOT_ARRAYS = ("ts", "ohlcv", "meta", "live")
+
+# Periyodik (thread) ve kapanıştaki yazma aynı anda çalışırsa birbirinin dosyalarını silebilir
+_snapshot_lock = threading.Lock()
+_last_saved_at = 0.0
+
+
+class MarketMemory:
+    """
+    Tüm sembollerin mumlarını tek bir (sembol x dakika) matriste tutar.
+    Sözlük gibi davranır (memory['btcusdt'] -> PriceBuffer, yoksa oluşturur),
+    evren çapındaki sorgular (1s değişim, top movers) tek vektörel çağrıdır.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, initial_rows=128):
+        self.capacity = capacity
+        self.store = ColumnStore(initial_rows, capacity)
+        self._index = {}    # sembol -> satır
+        self._symbols = []  # satır -> sembol
+        self._buffers = {}  # sembol -> PriceBuffer (satır view'ı)
+
+    # --- SÖZLÜK ARAYÜZÜ (defaultdict(PriceBuffer) uyumluluğu) ---
+    def __getitem__(self, symbol):
+        buf = self._buffers.get(symbol)
+        if buf is None:
+            buf = self._add(symbol)
+        return buf
+
+    def __contains__(self, symbol):
+        return symbol in self._buffers
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def __iter__(self):
+        return iter(self._symbols)
+
+    def get(self, symbol, default=None):
+        return self._buffers.get(symbol, default)
+
+    def keys(self):
+        return list(self._symbols)
+
+    def items(self):
+        return [(s, self._buffers[s]) for s in self._symbols]
+
+    def values(self):
+        return [self._buffers[s] for s in self._symbols]
+
+    def row_of(self, symbol):
+        return self._index.get(symbol)
+
+    def _add(self, symbol):
+        row = len(self._symbols)
+        if row >= self.store.rows:
+            # Kapasite doldu: Matrisi büyüt ve tüm view'ları yeniden bağla
+            self.store.grow(self.store.rows * 2)
+            for r, s in enumerate(self._symbols):
+                self._buffers[s].bind(self.store, r)
+        buf = PriceBuffer(self.capacity, store=self.store, row=row)
+        self._index[symbol] = row
+        self._symbols.append(symbol)
+        self._buffers[symbol] = buf
+        return buf
+
+    # --- VEKTÖREL SORGULAR ---
+    def _rows(self):
+        n = len(self._symbols)
+        return n, self.store.meta[:n], self.store.live[:n, PRICE]
+
+    def prices(self):
+        """Tüm sembollerin anlık fiyatları (satır sırasıyla)."""
+        n, _, price = self._rows()
+        return price.copy()
+
+    def changes(self, minutes, now=None):
+        """
+        Tüm semboller için `minutes` dakikalık yüzde değişim (PriceBuffer.get_change ile aynı kural):
+        Her satırda `referans - minutes` anındaki (veya önceki son) mum bulunur.
+        """
+        n, meta, price = self._rows()
+        if n == 0:
+            return np.zeros(0)
+        cap = self.capacity
+        rows = np.arange(n)
+        head = meta[:, HEAD]
+        size = meta[:, SIZE]
+
+        ref = self.store.ts[rows, head] + 1 if now is None else np.full(n, int(now / 60))
+        target = ref - minutes
+
+        # Halkanın birincil yarısında pencereye ait hücreler (yaş < size)
+        age = (head[:, None] - cap - np.arange(cap)[None, :]) % cap
+        in_window = age < size[:, None]
+        newer = (in_window & (self.store.ts[:n, :cap] > target[:, None])).sum(axis=1)
+        # Hedeften yeni mumların hemen öncesi; hepsi yeniyse en eski mum
+        back = np.minimum(newer, np.maximum(size - 1, 0))
+        old = self.store.ohlcv[rows, CLOSE, head - back]
+
+        valid = (size > 0) & (price != 0) & (old != 0)
+        out = np.zeros(n)
+        np.divide((price - old) * 100, old, out=out, where=valid)
+        return out
+
+    def current_prices(self):
+        """{sembol: fiyat} (Sadece fiyatı olanlar)."""
+        n, _, price = self._rows()
+        active = np.flatnonzero(price > 0)
+        return {self._symbols[i]: float(price[i]) for i in active}
+
+    def snapshot(self, minutes=60):
+        """Dashboard için [(sembol, fiyat, değişim%), ...] (Sadece fiyatı olanlar)."""
+        n, _, price = self._rows()
+        chg = self.changes(minutes)
+        active = np.flatnonzero(price > 0)
+        return [(self._symbols[i], float(price[i]), float(chg[i])) for i in active]
+
+    def top_movers(self, minutes=60, limit=10):
+        """Mutlak değişime göre en çok hareket eden semboller: [(sembol, değişim%), ...]"""
+        chg = self.changes(minutes)
+        if chg.size == 0:
+            return []
+        limit = min(limit, chg.size)
+        mag = np.abs(chg)
+        top = np.argpartition(-mag, limit - 1)[:limit]
+        top = top[np.argsort(-mag[top])]
+        return [(self._symbols[i], float(chg[i])) for i in top]
+
+    # --- WARM RESTART (Memory-mapped snapshot) ---
+    def export_snapshot(self):
+        """
+        Diske yazılacak dizilerin kopyası (Event loop üzerinde hızlıca alınır,
+        yazma işi write_snapshot ile thread'de yapılabilir).
+        """
+        n = len(self._symbols)
+        arrays = {name: getattr(self.store, name)[:n].copy() for name in SNAPSHOT_ARRAYS}
+        buffers = [self._buffers[s] for s in self._symbols]
+        for minutes in ROLLUP_FRAMES:
+            bars = [b.rollups[minutes].bars for b in buffers if minutes in b.rollups]
+            if not bars or len(bars) != n:
+                continue
+            arrays[f"r{minutes}_ts"] = np.stack([b.timestamps_raw() for b in bars])
+            arrays[f"r{minutes}_ohlcv"] = np.stack([b.ohlcv_raw() for b in bars])
+            arrays[f"r{minutes}_meta"] = np.stack([b.meta_raw() for b in bars])
+        meta = {
+            "symbols": list(self._symbols),
+            "capacity": self.capacity,
+            "rollups": {str(m): c for m, c in ROLLUP_FRAMES.items()},
+            "saved_at": time.time(),
+        }
+        return meta, arrays
+
+    @staticmethod
+    def write_snapshot(path, meta, arrays):
+        """
+        Dizileri .npy (memory-map edilebilir) olarak yazar. Önce geçici dosyalara yazılır,
+        meta.json en son değiştirilir -> yarıda kalan yazma eski snapshot'ı bozmaz.
+        Yazmalar kilitle sıralanır (Thread'deki periyodik yazma + kapanıştaki senkron yazma).
+        """
+        global _last_saved_at
+        with _snapshot_lock:
+            # Sıralı çalışır; daha yeni bir snapshot zaten yazıldıysa eskisi onu ezmez
+            if meta["saved_at"] < _last_saved_at:
+                return
+            os.makedirs(path, exist_ok=True)
+            meta = dict(meta, files={})
+            stamp = int(meta["saved_at"] * 1000)
+            for name, arr in arrays.items():
+                fname = f"{name}.{stamp}.npy"
+                mm = np.lib.format.open_memmap(os.path.join(path, fname), mode="w+", dtype=arr.dtype, shape=arr.shape)
+                mm[...] = arr
+                mm.flush()
+                del mm
+                meta["files"][name] = fname
+
+            tmp = os.path.join(path, "meta.json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp, os.path.join(path, "meta.json"))
+            _last_saved_at = meta["saved_at"]
+
+            # Eski snapshot dosyalarını temizle
+            keep = set(meta["files"].values())
+            for fname in os.listdir(path):
+                if fname.endswith(".npy") and fname not in keep:
+                    try:
+                        os.remove(os.path.join(path, fname))
+                    except OSError:
+                        pass
+
+    def save_snapshot(self, path):
+        meta, arrays = self.export_snapshot()
+        self.write_snapshot(path, meta, arrays)
+        return len(meta["symbols"])
+
+    def load_snapshot(self, path):
+        """
+        Snapshot'ı memory-map ile açıp hafızaya kopyalar. Göstergeler pencereden yeniden hesaplanır.
+        Kapanmadan bu yana oluşan boşluk, ilk analizde BackfillPlanner tarafından tamamlanır.
+        Dönüş: Yüklenen sembol sayısı.
+        """
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return 0
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("capacity") != self.capacity:
+            return 0
+
+        files = meta.get("files", {})
+        arrays = {name: np.load(os.path.join(path, fname), mmap_mode="r") for name, fname in files.items()}
+
+        for i, symbol in enumerate(meta["symbols"]):
+            buf = self[symbol]
+            row = self._index[symbol]
+            for name in SNAPSHOT_ARRAYS:
+                src = arrays[name][i]
+                dst = getattr(self.store, name)[row]
+                # Eski snapshot'ta daha az live kolonu olabilir
+                dst[..., :src.shape[-1]] = src
+            buf.replay_indicators()
+
+            for minutes, rollup in buf.rollups.items():
+                key = f"r{minutes}_ts"
+                if key not in arrays or meta["rollups"].get(str(minutes)) != rollup.bars.capacity:
+                    continue
+                rollup.bars.restore_raw(arrays[key][i], arrays[f"r{minutes}_ohlcv"][i], arrays[f"r{minutes}_meta"][i])
+                # Aynı dakikaların tekrar eklenmesini önle (Oluşan bar kaybolur)
+                rollup.last_minute = buf.last_minute
+
+        return len(meta["symbols"])
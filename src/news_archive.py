@@ -0,0 +1,63 @@
+import glob
+import gzip
+import json
+import os
+import time
+
+
+def month_key(ts):
+    """Haberin arşiv bölümü (UTC ay): "2025-01"."""
+    return time.strftime("%Y-%m", time.gmtime(ts))
+
+
+def archive_path(archive_dir, month):
+    return os.path.join(archive_dir, f"news-{month}.jsonl.gz")
+
+
+def append(archive_dir, rows):
+    """
+    (id, source, content, timestamp) satırlarını aylık gzip dosyalarına ekler.
+    Her ekleme ayrı bir gzip üyesidir (Dosyanın tamamı yeniden yazılmaz, gzip.open hepsini okur).
+    Dosya fsync edilmeden dönülmez: Satırlar ancak bundan sonra tablodan silinir.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    by_month = {}
+    for news_id, source, content, ts in rows:
+        line = json.dumps({"id": news_id, "source": source, "content": content, "timestamp": ts}, ensure_ascii=False)
+        by_month.setdefault(month_key(ts), []).append(line)
+    for month, lines in by_month.items():
+        with open(archive_path(archive_dir, month), "ab") as f:
+            f.write(gzip.compress(("\n".join(lines) + "\n").encode("utf-8")))
+            f.flush()
+            os.fsync(f.fileno())
+    return len(rows)
+
+
+def iter_news(archive_dir, since=None, until=None):
+    """
+    Arşivlenmiş haberler (Backtest için), ay sırasıyla. since/until: Epoch, [since, until).
+    Yarıda kalan bir arşivleme aynı haberi iki kez yazmış olabilir: id ile tekilleştirilir.
+    """
+    first = month_key(since) if since is not None else None
+    last = month_key(until) if until is not None else None
+    seen = set()
+    for path in sorted(glob.glob(os.path.join(archive_dir, "news-*.jsonl.gz"))):
+        month = os.path.basename(path)[5:12]
+        if (first and month < first) or (last and month > last):
+            continue
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                ts = rec["timestamp"]
+                if (since is not None and ts < since) or (until is not None and ts >= until):
+                    continue
+                if rec["id"] in seen:
+                    continue
+                seen.add(rec["id"])
+                yield rec
+
+
+def archive_size(archive_dir):
+    """(dosya sayısı, toplam byte)"""
+    files = glob.glob(os.path.join(archive_dir, "news-*.jsonl.gz"))
+    return len(files), sum(os.path.getsize(p) for p in files)
@@ -0,0 +1,152 @@
+import hashlib
+import math
+import re
+import time
+from collections import Counter, deque
+
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from config import NEWS_DEDUP_WINDOW_HOURS, NEWS_DEDUP_MAX_DOCS
+
+_URL = re.compile(r'http\S+')
+_PUNCT = re.compile(r'[^\w\s]')
+_TOKEN = re.compile(r'(?u)\b\w\w+\b')  # TfidfVectorizer varsayılanı
+
+
+def clean_text(text):
+    text = text.lower()
+    text = _URL.sub('', text)
+    return _PUNCT.sub('', text)
+
+
+def tokenize(clean):
+    return [t for t in _TOKEN.findall(clean) if t not in ENGLISH_STOP_WORDS]
+
+
+def fingerprint(clean):
+    """Boşlukları normalize edilmiş metnin özeti (Birebir tekrar için)."""
+    return hashlib.blake2b(" ".join(clean.split()).encode(), digest_size=16).digest()
+
+
+class NearDuplicateIndex:
+    """
+    Son 24 saatin haberleri için artımlı benzerlik indeksi (Her mesajda TF-IDF yeniden fit edilmez).
+    - Birebir tekrar: Normalize metin özeti ile O(1).
+    - Yakın tekrar: TF-IDF kosinüs (sklearn smooth idf formülü), ters indeks üzerinden sadece
+      ortak kelimesi olan haberlerle. Belge frekansları pencereyle birlikte artımlı tutulur;
+      belgenin ağırlıkları eklendiği andaki idf ile dondurulur.
+    - Pencereden çıkan haberler (zaman veya adet sınırı) indeksten silinir.
+    """
+
+    def __init__(self, window_hours=NEWS_DEDUP_WINDOW_HOURS, max_docs=NEWS_DEDUP_MAX_DOCS):
+        self.window = window_hours * 3600
+        self.max_docs = max_docs
+        self._docs = deque()   # (timestamp, doc_id, özet, {kelime: ağırlık}) eskiden yeniye
+        self._postings = {}    # kelime -> {doc_id: ağırlık}
+        self._df = Counter()   # kelime -> penceredeki belge sayısı
+        self._exact = Counter()  # özet -> adet
+        self._next_id = 0
+
+        # Metrikler
+        self.queries = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.last_candidates = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _weights(self, tf, query):
+        """L2 normalize TF-IDF ağırlıkları. Sorgu henüz pencerede değil: Korpusa kendisi eklenmiş sayılır."""
+        extra = 1 if query else 0
+        n = len(self._docs) + extra
+        weights = {t: c * (math.log((1 + n) / (1 + self._df[t] + extra)) + 1) for t, c in tf.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {t: w / norm for t, w in weights.items()}
+
+    # --- PENCERE ---
+    def evict(self, now=None):
+        limit = (time.time() if now is None else now) - self.window
+        docs = self._docs
+        while docs and docs[0][0] < limit:
+            self._drop(docs.popleft())
+
+    def _drop(self, doc):
+        _, doc_id, digest, weights = doc
+        for t in weights:
+            posting = self._postings[t]
+            del posting[doc_id]
+            if not posting:
+                del self._postings[t]
+            self._df[t] -= 1
+            if self._df[t] == 0:
+                del self._df[t]
+        self._exact[digest] -= 1
+        if self._exact[digest] == 0:
+            del self._exact[digest]
+
+    def add(self, clean, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        self.evict(timestamp)
+        tf = Counter(tokenize(clean))
+        self._df.update(tf.keys())
+        doc = (timestamp, self._next_id, fingerprint(clean), {})
+        self._docs.append(doc)  # n, kendisi dahil hesaplansın
+        if tf:
+            doc[3].update(self._weights(tf, query=False))
+        for t, w in doc[3].items():
+            self._postings.setdefault(t, {})[self._next_id] = w
+        self._exact[doc[2]] += 1
+        self._next_id += 1
+        while len(self._docs) > self.max_docs:
+            self._drop(self._docs.popleft())
+
+    # --- SORGU ---
+    def query(self, clean, threshold=0.75, now=None):
+        """
+        Dönüş: (tekrar_mı, en_yüksek_benzerlik).
+        Benzerlik eşiği geçen her haber için kesindir; eşik altındaysa aday haberlerin en yükseğidir.
+        """
+        self.queries += 1
+        self.evict(now)
+        if fingerprint(clean) in self._exact:
+            self.exact_hits += 1
+            return True, 1.0
+
+        tf = Counter(tokenize(clean))
+        if not tf or not self._docs:
+            return False, 0.0
+
+        # Aday üretimi (prefix filtreleme): Vektörler birim uzunlukta olduğundan, sorgunun sadece
+        # kalan kelimelerini paylaşan bir haberin benzerliği o kelimelerin normunu geçemez.
+        # Ağırlığı en yüksek (en nadir) kelimelerden, kalan norm eşiğin altına inene kadar aday toplanır.
+        weights = sorted(self._weights(tf, query=True).items(), key=lambda kv: -kv[1])
+        postings = [self._postings.get(t, {}) for t, _ in weights]
+        remaining = 1.0  # Kalan kelimelerin norm karesi
+        candidates = set()
+        for (t, w), posting in zip(weights, postings):
+            if remaining < threshold * threshold:
+                break
+            candidates.update(posting)
+            remaining -= w * w
+
+        max_sim = 0.0
+        for doc_id in candidates:
+            sim = sum(w * posting.get(doc_id, 0.0) for (_, w), posting in zip(weights, postings))
+            if sim > max_sim:
+                max_sim = sim
+        self.last_candidates = len(candidates)
+        if max_sim >= threshold:
+            self.near_hits += 1
+            return True, max_sim
+        return False, max_sim
+
+    def metrics(self):
+        return {
+            "docs": len(self._docs),
+            "vocabulary": len(self._postings),
+            "queries": self.queries,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "last_candidates": self.last_candidates,
+        }
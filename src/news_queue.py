@@ -0,0 +1,140 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from config import (
+    NEWS_WORKERS,
+    NEWS_QUEUE_MAX,
+    NEWS_MAX_AGE,
+    NEWS_SOURCE_PRIORITY,
+    NEWS_CHANNEL_PRIORITY,
+)
+
+DEFAULT_PRIORITY = 5
+IDLE_CHECK_INTERVAL = 1.0  # Boşken kapanış kontrolü (saniye)
+
+
+class NewsQueue:
+    """
+    Haber girişi ile analiz hattını ayırır (Telegram handler ve RSS sadece put() çağırır).
+    - Sabit sayıda worker: Aynı anda en fazla `workers` LLM hattı çalışır, patlamada sınırsız görev açılmaz.
+    - Öncelik: Kanal > kaynak (Küçük sayı önce). Aynı öncelikte geliş sırası korunur.
+    - Sınırlı kuyruk: Doluysa en düşük öncelikli (eşitse en eski) haber atılır.
+    - Bayatlık: Kuyrukta `max_age` saniyeden fazla bekleyen haber pahalı aşamalardan önce atılır.
+      Yaş kuyruğa giriş anından ölçülür: RSS'in yayın zamanı kuyruk gecikmesini değil yayın gecikmesini
+      gösterir (Son 1 saatin haberleri zaten RSSMonitor'da süzülüyor).
+    """
+
+    def __init__(
+        self,
+        handler,
+        workers=NEWS_WORKERS,
+        maxsize=NEWS_QUEUE_MAX,
+        max_age=NEWS_MAX_AGE,
+        log=print,
+    ):
+        self.handler = handler  # async fn(msg, source)
+        self.workers = workers
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.log = log
+        self._heap = []  # (öncelik, sıra, alınma, mesaj, kaynak)
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+
+        # Metrikler
+        self.received = 0
+        self.processed = 0
+        self.dropped_stale = 0
+        self.dropped_full = 0
+        self.errors = 0
+        self.busy = 0
+        self.max_depth = 0
+        self.last_wait_ms = 0.0
+        self.avg_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    @property
+    def depth(self):
+        return len(self._heap)
+
+    @staticmethod
+    def priority_of(source, channel=None):
+        if channel and channel.lower() in NEWS_CHANNEL_PRIORITY:
+            return NEWS_CHANNEL_PRIORITY[channel.lower()]
+        return NEWS_SOURCE_PRIORITY.get(source, DEFAULT_PRIORITY)
+
+    def put(self, msg, source, channel=None):
+        """Bloklamaz. Dönüş: Kuyruğa alındı mı (Dolu kuyrukta daha önemsizse alınmaz)."""
+        now = time.time()
+        self.received += 1
+        item = (self.priority_of(source, channel), next(self._seq), now, msg, source)
+        heap = self._heap
+        if len(heap) >= self.maxsize:
+            # En önemsiz: En büyük öncelik numarası, eşitse en eski (Küçük sıra)
+            worst = max(range(len(heap)), key=lambda i: (heap[i][0], -heap[i][1]))
+            if (item[0], -item[1]) >= (heap[worst][0], -heap[worst][1]):
+                self.dropped_full += 1
+                return False
+            heap[worst] = heap[-1]
+            heap.pop()
+            heapq.heapify(heap)
+            self.dropped_full += 1
+        heapq.heappush(heap, item)
+        self.max_depth = max(self.max_depth, len(heap))
+        self._ready.set()
+        return True
+
+    async def run(self, is_alive=lambda: True):
+        """Worker'lar `is_alive()` False olana (uygulama kapanana) kadar çalışır; duraklatma handler'ın işidir."""
+        await asyncio.gather(*(self._worker(is_alive) for _ in range(self.workers)))
+
+    async def _worker(self, is_alive):
+        while is_alive():
+            if not self._heap:
+                self._ready.clear()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), IDLE_CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, received_at, msg, source = heapq.heappop(self._heap)
+            now = time.time()
+            if now - received_at > self.max_age:
+                self.dropped_stale += 1
+                continue
+
+            wait_ms = (now - received_at) * 1000
+            self.last_wait_ms = wait_ms
+            self.avg_wait_ms = wait_ms if self.processed == 0 else 0.9 * self.avg_wait_ms + 0.1 * wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+            self.busy += 1
+            try:
+                await self.handler(msg, source)
+            except Exception as e:
+                self.errors += 1
+                self.log(f"⚠️ Haber İşleme Hatası ({source}): {e}", "warning")
+            finally:
+                self.busy -= 1
+                self.processed += 1
+
+    def metrics(self, now=None):
+        now = now or time.time()
+        oldest = min((item[2] for item in self._heap), default=None)
+        return {
+            "queue_depth": self.depth,
+            "max_depth": self.max_depth,
+            "busy_workers": self.busy,
+            "workers": self.workers,
+            "received": self.received,
+            "processed": self.processed,
+            "dropped_stale": self.dropped_stale,
+            "dropped_full": self.dropped_full,
+            "errors": self.errors,
+            "last_wait_ms": self.last_wait_ms,
+            "avg_wait_ms": self.avg_wait_ms,
+            "max_wait_ms": self.max_wait_ms,
+            "oldest_wait_s": (now - oldest) if oldest is not None else 0.0,
+        }
@@ -0,0 +1,291 @@
+from collections.abc import Mapping, MutableMapping
+
+import numpy as np
+
+# Trailing stop basamakları: (ROI eşiği %, yeni SL'in girişe uzaklığı)
+TRAIL_BREAKEVEN_ROI, TRAIL_BREAKEVEN_SL = 0.8, 0.0015  # Başa baş + komisyon
+TRAIL_LOCK_ROI, TRAIL_LOCK_SL = 1.5, 0.01              # %1 kârı kilitle
+
+# Tetik bandı sınırları kayan nokta yuvarlamasına karşı içeri çekilir (Tam kontrol bir tık erken çalışır)
+TRIGGER_EPS = 1e-9
+
+# Kapanış kodları
+KEEP, TAKE_PROFIT, STOP_LOSS, TIME_LIMIT = 0, 1, 2, 3
+CLOSE_REASONS = {
+    TAKE_PROFIT: "TAKE PROFIT 💰",
+    STOP_LOSS: "STOP LOSS 🛑",
+    TIME_LIMIT: "TIME LIMIT ⏳",
+}
+
+LONG, SHORT = 1, -1
+NUMERIC_FIELDS = ("entry", "qty", "tp", "sl", "peak", "trough", "price", "expiry", "lower", "upper")
+
+
+class PositionBook:
+    """
+    Açık pozisyonlar için structure-of-arrays defter (Pozisyon başına bir slot).
+    Fiyat vektörü üzerinde tek çağrıda (check_all) yüzlerce pozisyon değerlendirilir:
+    Önce tetik bandı maskesi, sonra sadece bandı aşan slotlar için tam kural seti.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        for name in NUMERIC_FIELDS:
+            setattr(self, name, np.zeros(capacity))
+        self.side = np.zeros(capacity, dtype=np.int8)  # LONG=1, SHORT=-1
+        self.active = np.zeros(capacity, dtype=bool)
+        self.slots = {}                  # sembol -> slot
+        self.symbols = [None] * capacity  # slot -> sembol
+        self._free = []
+        self.size = 0  # Kullanılmış en yüksek slot + 1 (Vektörel işlemler [:size] üzerinde)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, symbol):
+        return symbol in self.slots
+
+    def _grow(self):
+        new_cap = self.capacity * 2
+        for name in NUMERIC_FIELDS + ("side", "active"):
+            old = getattr(self, name)
+            arr = np.zeros(new_cap, dtype=old.dtype)
+            arr[:self.capacity] = old
+            setattr(self, name, arr)
+        self.symbols.extend([None] * (new_cap - self.capacity))
+        self.capacity = new_cap
+
+    def add(self, symbol, side, entry, qty, tp, sl, expiry):
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self.size == self.capacity:
+                self._grow()
+            slot = self.size
+            self.size += 1
+        self.side[slot] = LONG if side == "LONG" else SHORT
+        self.entry[slot] = self.price[slot] = self.peak[slot] = self.trough[slot] = entry
+        self.qty[slot] = qty
+        self.tp[slot] = tp
+        self.sl[slot] = sl
+        self.expiry[slot] = expiry
+        self.active[slot] = True
+        self.slots[symbol] = slot
+        self.symbols[slot] = symbol
+        self.rebuild_bands(np.array([slot]))
+        return slot
+
+    def remove(self, symbol):
+        slot = self.slots.pop(symbol)
+        self.active[slot] = False
+        self.side[slot] = 0
+        self.symbols[slot] = None
+        self._free.append(slot)
+        return slot
+
+    def invalidate(self, slot):
+        """Bandı kapatır: Bir sonraki kontrol tam değerlendirme yapar (Örn. süre dolumu)."""
+        self.lower[slot] = np.inf
+
+    # --- TETİK BANDI ---
+    def rebuild_bands(self, slots):
+        """Slotların bir sonraki durum değiştiren fiyat eşikleri (SL, TP, sıradaki trailing basamağı)."""
+        entry, sl, tp = self.entry[slots], self.sl[slots], self.tp[slots]
+        is_long = self.side[slots] == LONG
+        up, down = 1 - TRIGGER_EPS, 1 + TRIGGER_EPS
+
+        # LONG: Alt = SL, üst = min(TP, uygulanmamış basamaklar)
+        long_upper = tp.copy()
+        be = sl < entry
+        long_upper[be] = np.minimum(long_upper[be], entry[be] * (1 + TRAIL_BREAKEVEN_ROI / 100))
+        lk = sl < entry * (1 + TRAIL_LOCK_SL)
+        long_upper[lk] = np.minimum(long_upper[lk], entry[lk] * (1 + TRAIL_LOCK_ROI / 100))
+
+        # SHORT: Üst = SL, alt = max(TP, uygulanmamış basamaklar)
+        short_lower = tp.copy()
+        be = sl > entry
+        short_lower[be] = np.maximum(short_lower[be], entry[be] * (1 - TRAIL_BREAKEVEN_ROI / 100))
+        lk = sl > entry * (1 - TRAIL_LOCK_SL)
+        short_lower[lk] = np.maximum(short_lower[lk], entry[lk] * (1 - TRAIL_LOCK_ROI / 100))
+
+        self.lower[slots] = np.where(is_long, sl, short_lower) * down
+        self.upper[slots] = np.where(is_long, long_upper, sl) * up
+
+    def in_band(self, slot, high, low):
+        return self.lower[slot] < low and high < self.upper[slot]
+
+    def track_peak(self, slot, high, low):
+        """Lehte (peak) ve aleyhte (trough) en uç fiyatlar."""
+        if self.side[slot] == LONG:
+            if high > self.peak[slot]:
+                self.peak[slot] = high
+            if low < self.trough[slot]:
+                self.trough[slot] = low
+        else:
+            if low < self.peak[slot]:
+                self.peak[slot] = low
+            if high > self.trough[slot]:
+                self.trough[slot] = high
+
+    # --- TAM DEĞERLENDİRME ---
+    def evaluate(self, slots, price, high, low, now):
+        """
+        Kural seti (vektörel): Peak takibi, trailing stop, TP/SL (önce anlık fiyat, sonra fitil;
+        ikisine de değdiyse SL), süre dolumu. Kalan slotların SL/bantları güncellenir.
+        Dönüş: (kapanış_kodu, çıkış_fiyatı) dizileri.
+        """
+        entry, tp = self.entry[slots], self.tp[slots]
+        is_long = self.side[slots] == LONG
+        self.price[slots] = price
+
+        # 1. Peak / Trough
+        self.peak[slots] = np.where(
+            is_long, np.maximum(self.peak[slots], high), np.minimum(self.peak[slots], low)
+        )
+        self.trough[slots] = np.where(
+            is_long, np.minimum(self.trough[slots], low), np.maximum(self.trough[slots], high)
+        )
+
+        # 2. Trailing stop (Fitil kontrolü güncelleme öncesi SL ile yapılır)
+        sl_before = self.sl[slots]
+        roi = np.where(is_long, price - entry, entry - price) / entry * 100
+        sl = sl_before.copy()
+        be_sl = np.where(is_long, entry * (1 + TRAIL_BREAKEVEN_SL), entry * (1 - TRAIL_BREAKEVEN_SL))
+        be = (roi > TRAIL_BREAKEVEN_ROI) & np.where(is_long, sl < entry, sl > entry)
+        sl[be] = be_sl[be]
+        lock_sl = np.where(is_long, entry * (1 + TRAIL_LOCK_SL), entry * (1 - TRAIL_LOCK_SL))
+        lk = (roi > TRAIL_LOCK_ROI) & np.where(is_long, sl < lock_sl, sl > lock_sl)
+        sl[lk] = lock_sl[lk]
+        self.sl[slots] = sl
+
+        # 3. Çıkışlar (Öncelik sırasıyla)
+        tp_now = np.where(is_long, price >= tp, price <= tp)
+        sl_now = np.where(is_long, price <= sl, price >= sl)
+        sl_wick = np.where(is_long, low <= sl_before, high >= sl_before)
+        tp_wick = np.where(is_long, high >= tp, low <= tp)
+        reason = np.select([tp_now, sl_now, sl_wick, tp_wick], [TAKE_PROFIT, STOP_LOSS, STOP_LOSS, TAKE_PROFIT], KEEP)
+        exit_price = np.select([tp_now, sl_now, sl_wick, tp_wick], [price, price, sl_before, tp], price)
+
+        # 4. Süre dolumu her şeyi ezer
+        expired = now >= self.expiry[slots]
+        reason[expired] = TIME_LIMIT
+        exit_price = np.where(expired, price, exit_price)
+
+        keep = reason == KEEP
+        if keep.any():
+            self.rebuild_bands(slots[keep])
+        return reason, exit_price
+
+    def check_all(self, prices, highs=None, lows=None, now=0.0):
+        """
+        Slot sırasıyla hizalı fiyat vektörü (gather ile) üzerinde tüm pozisyonları kontrol eder.
+        Fiyatı 0 olan slotlar atlanır. Dönüş: [(sembol, kapanış_kodu, çıkış_fiyatı), ...]
+        """
+        n = self.size
+        if n == 0:
+            return []
+        prices = np.asarray(prices, dtype=float)[:n]
+        highs = prices if highs is None else np.maximum(np.asarray(highs, dtype=float)[:n], prices)
+        lows = prices if lows is None else np.minimum(np.asarray(lows, dtype=float)[:n], prices)
+
+        valid = self.active[:n] & (prices > 0)
+        self.price[:n][valid] = prices[valid]
+        in_band = (self.lower[:n] < lows) & (highs < self.upper[:n]) & (now < self.expiry[:n])
+
+        # Bant içindekiler: Sadece peak/trough
+        quiet = valid & in_band
+        is_long = self.side[:n] == LONG
+        peak, trough = self.peak[:n], self.trough[:n]
+        np.maximum(peak, highs, out=peak, where=quiet & is_long)
+        np.minimum(peak, lows, out=peak, where=quiet & ~is_long)
+        np.minimum(trough, lows, out=trough, where=quiet & is_long)
+        np.maximum(trough, highs, out=trough, where=quiet & ~is_long)
+
+        slots = np.flatnonzero(valid & ~in_band)
+        if slots.size == 0:
+            return []
+        reason, exit_price = self.evaluate(slots, prices[slots], highs[slots], lows[slots], now)
+        closing = np.flatnonzero(reason != KEEP)
+        return [(self.symbols[slots[i]], int(reason[i]), float(exit_price[i])) for i in closing]
+
+    def gather(self, prices_by_symbol):
+        """{sembol: fiyat} sözlüğünden slot sırasıyla fiyat vektörü (Eksikler 0)."""
+        out = np.zeros(self.size)
+        for symbol, slot in self.slots.items():
+            out[slot] = prices_by_symbol.get(symbol, 0.0)
+        return out
+
+
+class PositionView(MutableMapping):
+    """
+    Tek pozisyonun eski dict arayüzü (Dashboard ve loglar için uyumluluk katmanı).
+    Sayısal alanlar defter dizilerinden okunur/yazılır, diğerleri meta sözlüğündedir.
+    """
+
+    _ARRAY_KEYS = {
+        "entry": "entry", "qty": "qty", "tp": "tp", "sl": "sl",
+        "current_price": "price", "expiry_time": "expiry",
+    }
+
+    def __init__(self, book, slot, meta):
+        self._book = book
+        self._slot = slot
+        self._meta = meta
+
+    def _peak_key(self):
+        return "highest_price" if self._book.side[self._slot] == LONG else "lowest_price"
+
+    def __getitem__(self, key):
+        field = self._ARRAY_KEYS.get(key)
+        if field is not None:
+            return float(getattr(self._book, field)[self._slot])
+        if key == "side":
+            return "LONG" if self._book.side[self._slot] == LONG else "SHORT"
+        if key in ("highest_price", "lowest_price"):
+            # Pozisyon yönündeki uç peak, ters yöndeki trough (En kötü görülen fiyat)
+            field = "peak" if key == self._peak_key() else "trough"
+            return float(getattr(self._book, field)[self._slot])
+        return self._meta[key]
+
+    def __setitem__(self, key, value):
+        field = self._ARRAY_KEYS.get(key)
+        if field is None and key in ("highest_price", "lowest_price"):
+            field = "peak" if key == self._peak_key() else "trough"
+        if field is not None:
+            getattr(self._book, field)[self._slot] = value
+            if key in ("tp", "sl"):
+                self._book.rebuild_bands(np.array([self._slot]))
+        else:
+            self._meta[key] = value
+
+    def __delitem__(self, key):
+        del self._meta[key]
+
+    def __iter__(self):
+        yield from self._ARRAY_KEYS
+        yield from ("side", "highest_price", "lowest_price")
+        yield from self._meta
+
+    def __len__(self):
+        return len(self._ARRAY_KEYS) + 3 + len(self._meta)
+
+
+class PositionsView(Mapping):
+    """exchange.positions: {sembol: PositionView} gibi davranır (Okuma odaklı)."""
+
+    def __init__(self, book, meta):
+        self._book = book
+        self._meta = meta  # sembol -> meta dict
+
+    def __getitem__(self, symbol):
+        slot = self._book.slots[symbol]
+        return PositionView(self._book, slot, self._meta[symbol])
+
+    def __contains__(self, symbol):
+        return symbol in self._book.slots
+
+    def __iter__(self):
+        return iter(list(self._book.slots))
+
+    def __len__(self):
+        return len(self._book.slots)
@@ -1,78 +1,575 @@
-from collections import deque
+import time
+
+import numpy as np
+
+from indicators import IndicatorEngine
+
+# Sütun sırası (OHLCV matrisi satırları)
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+# meta kolonları: Son yazılan mumun (ayna) indeksi, dolu mum sayısı
+HEAD, SIZE = range(2)
+# live kolonları: Anlık fiyat, 24s değişim, 24s USDT hacim, fonlama oranı (%),
+# son all-market ticker / markPrice güncellemesinin zamanı (saniye)
+PRICE, CHANGE_24H, VOLUME_24H, FUNDING_RATE, TICKER_TS, FUNDING_TS = range(6)
+LIVE_COLUMNS = 6
+
+# All-market stream verisi bu kadar saniyeden eskiyse REST'e düşülür
+TICKER_MAX_AGE = 10
+# Bu süre içinde kline geldiyse ticker mum üretmez (Kline daha hassas)
+KLINE_PRIORITY_WINDOW = 120
+
+DEFAULT_CAPACITY = 60
+
+# Üst zaman dilimleri: {dakika: tutulacak bar sayısı}
+ROLLUP_FRAMES = {5: 48, 15: 32, 60: 48, 240: 42}
+ROLLUP_LABELS = {5: "5m", 15: "15m", 60: "1h", 240: "4h"}
+
+
+class ColumnStore:
+    """
+    Sembol x dakika kolon deposu. Her satır bir PriceBuffer'a aittir;
+    MarketMemory tüm evreni tek matris üzerinden vektörel sorgular.
+    """
+
+    def __init__(self, rows, capacity=DEFAULT_CAPACITY):
+        self.rows = rows
+        self.capacity = capacity
+        self.ts = np.zeros((rows, 2 * capacity), dtype=np.int64)          # Dakika (timestamp / 60)
+        self.ohlcv = np.zeros((rows, 5, 2 * capacity), dtype=np.float64)
+        self.meta = np.zeros((rows, 2), dtype=np.int64)
+        self.meta[:, HEAD] = capacity - 1
+        self.live = np.zeros((rows, LIVE_COLUMNS), dtype=np.float64)
+
+    def grow(self, rows):
+        """Satır sayısını artırır (Mevcut veriler kopyalanır, view'lar yeniden bağlanmalı)."""
+        old = self.rows
+        for name in ("ts", "ohlcv", "meta", "live"):
+            arr = getattr(self, name)
+            new = np.zeros((rows,) + arr.shape[1:], dtype=arr.dtype)
+            new[:old] = arr
+            setattr(self, name, new)
+        self.meta[old:, HEAD] = self.capacity - 1
+        self.rows = rows
+
 
 class PriceBuffer:
-    def __init__(self):
-        # Sadece son 60 dakikanın kapanış fiyatlarını tutar.
-        # Her eleman: (timestamp_minute, close_price)
-        self.candles = deque(maxlen=60) 
-        self.current_price = 0.0
-        self.change_24h = 0.0 # Binance'den hazır gelecek
+    def __init__(self, capacity=DEFAULT_CAPACITY, store=None, row=0, rollups=ROLLUP_FRAMES):
+        # Son `capacity` dakikanın OHLCV mumlarını sabit boyutlu halka tamponda tutar.
+        # Her değer iki kez yazılır (i ve i + capacity) -> son N mum her zaman
+        # bitişik bir dilimdir, pencere okumaları kopyasız (view) döner.
+        # store verilirse (MarketMemory) ortak matrisin `row` satırına yazar.
+        self.capacity = capacity
+        if store is None:
+            store = ColumnStore(1, capacity)
+        self.bind(store, row)
+
+        # Kapanan her mumda O(1) güncellenen göstergeler (RSI, EMA, ATR, BB, VWAP)
+        self.indicators = IndicatorEngine()
+
+        # Oluşan (kapanmamış) 1m mum: [open, high, low, close, volume, quote_volume]
+        self.forming = None
+        self.forming_minute = None
+        # Bir önceki güncellemeden bu yana görülen fiyat aralığı (fitil kontrolü için)
+        self.tick_high = 0.0
+        self.tick_low = 0.0
+        # Son kline mesajının zamanı (Websocket kline aboneliği aktif mi?)
+        self.last_kline_at = 0.0
+
+        # 1m akışından artımlı üretilen üst zaman dilimleri (5m/15m/1h/4h)
+        self.rollups = {m: CandleRollup(m, cap) for m, cap in (rollups or {}).items()}
+
+    def bind(self, store, row):
+        """Tamponu deponun bir satırına (view) bağlar."""
+        self._ts = store.ts[row]
+        self._ohlcv = store.ohlcv[row]
+        self._meta = store.meta[row]
+        self._live = store.live[row]
+
+    @property
+    def current_price(self):
+        return float(self._live[PRICE])
+
+    @current_price.setter
+    def current_price(self, value):
+        self._live[PRICE] = value
+
+    @property
+    def change_24h(self):
+        return float(self._live[CHANGE_24H]) # Binance'den hazır gelecek
+
+    @change_24h.setter
+    def change_24h(self, value):
+        self._live[CHANGE_24H] = value
+
+    @property
+    def volume_24h(self):
+        """24s USDT (quote) hacim (All-market ticker'dan)."""
+        return float(self._live[VOLUME_24H])
+
+    @property
+    def funding_rate(self):
+        """Fonlama oranı, yüzde (All-market markPrice'tan)."""
+        return float(self._live[FUNDING_RATE])
+
+    def has_fresh_ticker(self, now=None):
+        ts = self._live[TICKER_TS]
+        return ts > 0 and ((now or time.time()) - ts) <= TICKER_MAX_AGE
+
+    def has_fresh_funding(self, now=None):
+        ts = self._live[FUNDING_TS]
+        return ts > 0 and ((now or time.time()) - ts) <= TICKER_MAX_AGE
+
+    def update_ticker(self, price, event_ts, change_24h, quote_volume_24h):
+        """
+        All-market mini ticker (!miniTicker@arr) güncellemesi.
+        Kline aboneliği yoksa 1m mumlar ticker fiyatlarından üretilir (hacim bilinmez -> 0).
+        """
+        self._live[CHANGE_24H] = change_24h
+        self._live[VOLUME_24H] = quote_volume_24h
+        self._live[TICKER_TS] = event_ts
+
+        if event_ts - self.last_kline_at <= KLINE_PRIORITY_WINDOW:
+            return  # Kline akışı mumları zaten üretiyor
+
+        minute_ts = int(event_ts / 60)
+        f = self.forming
+        if f is not None and self.forming_minute is not None and self.forming_minute < minute_ts:
+            # Dakika döndü: Oluşan mumu kapat
+            if self._meta[SIZE] == 0 or self._ts[self._meta[HEAD]] < self.forming_minute:
+                self._append(self.forming_minute, f[0], f[1], f[2], f[3], f[4])
+            f = None
+
+        if f is None or self.forming_minute != minute_ts:
+            self.forming = [price, price, price, price, 0.0, 0.0]
+            self.forming_minute = minute_ts
+            self.tick_high = self.tick_low = price
+        else:
+            last = f[3]
+            self.tick_high = max(last, price)
+            self.tick_low = min(last, price)
+            if price > f[1]: f[1] = price
+            if price < f[2]: f[2] = price
+            f[3] = price
+        self.current_price = price
+
+    def update_funding(self, funding_rate_pct, event_ts):
+        """All-market markPrice (!markPrice@arr) güncellemesi."""
+        self._live[FUNDING_RATE] = funding_rate_pct
+        self._live[FUNDING_TS] = event_ts
+
+    def __len__(self):
+        return int(self._meta[SIZE])
+
+    @property
+    def last_minute(self):
+        """Son kapanan mumun dakikası (Veri yoksa None)."""
+        if self._meta[SIZE] == 0:
+            return None
+        return int(self._ts[self._meta[HEAD]])
+
+    def clear(self):
+        self._meta[HEAD] = self.capacity - 1
+        self._meta[SIZE] = 0
+        self.indicators.reset()
+
+    # --- Snapshot için ham (halka) dizi erişimi ---
+    def timestamps_raw(self):
+        return self._ts
 
-    def update_candle(self, price, timestamp, is_closed):
+    def ohlcv_raw(self):
+        return self._ohlcv
+
+    def meta_raw(self):
+        return self._meta
+
+    def restore_raw(self, ts, ohlcv, meta):
+        self._ts[:] = ts
+        self._ohlcv[:] = ohlcv
+        self._meta[:] = meta
+        self.replay_indicators()
+
+    def replay_indicators(self):
+        """Göstergeleri tampondaki pencereden yeniden hesaplar (Snapshot yüklemesi vb.)."""
+        self.indicators.reset()
+        for minute_ts, col in zip(self.timestamps(), self.ohlcv().T):
+            self.indicators.update(int(minute_ts), *col)
+
+    def _append(self, minute_ts, open_price, high, low, close, volume):
+        """O(1) ekleme: Değeri hem ana hem ayna hücreye yazar."""
+        i = (int(self._meta[HEAD]) + 1) % self.capacity
+        for j in (i, i + self.capacity):
+            self._ts[j] = minute_ts
+            self._ohlcv[:, j] = (open_price, high, low, close, volume)
+        self._meta[HEAD] = i + self.capacity
+        if self._meta[SIZE] < self.capacity:
+            self._meta[SIZE] += 1
+        self.indicators.update(minute_ts, open_price, high, low, close, volume)
+        for rollup in self.rollups.values():
+            rollup.update(minute_ts, open_price, high, low, close, volume)
+
+    def replace_candle(self, idx, open_price, high, low, close, volume):
+        """Penceredeki `idx`. mumun OHLCV'sini yerinde değiştirir (Göstergeler ayrıca oynatılmalı)."""
+        i = (self._window(None).start + idx) % self.capacity
+        for j in (i, i + self.capacity):
+            self._ohlcv[:, j] = (open_price, high, low, close, volume)
+
+    def update_candle(self, price, timestamp, is_closed, open_price=None, high=None, low=None, volume=0.0, quote_volume=0.0):
         """
         Websocket'ten gelen mum verisini işler.
-        is_closed: Mum kapandı mı? (True ise listeye ekle, False ise sadece anlık fiyatı güncelle)
+        is_closed: Mum kapandı mı? (True ise listeye ekle, False ise oluşan mumu güncelle)
+        open_price/high/low/volume verilmezse kapanış fiyatı ile doldurulur.
         """
+        # Dakikayı yuvarla (Timestamp -> Dakika)
+        minute_ts = int(timestamp / 60)
+        open_price = price if open_price is None else open_price
+        high = price if high is None else high
+        low = price if low is None else low
+
+        self._update_tick_range(minute_ts, price, high, low)
         self.current_price = price
-        
+
         # Eğer mum kapandıysa listeye kalıcı olarak ekle (Tarihçeyi oluştur)
         if is_closed:
-            # Dakikayı yuvarla (Timestamp -> Dakika)
-            minute_ts = int(timestamp / 60)
-            
+            self.forming = None
+            self.forming_minute = None
+
             # Eğer son eklenen veri bu dakika değilse ekle (Çift eklemeyi önle)
-            if not self.candles or self.candles[-1][0] != minute_ts:
-                self.candles.append((minute_ts, price))
+            if self._meta[SIZE] == 0 or self._ts[self._meta[HEAD]] != minute_ts:
+                self._append(minute_ts, open_price, high, low, price, volume)
+        else:
+            # Binance kline alanları dakika içinde kümülatiftir (h, l, v, q)
+            self.forming = [open_price, high, low, price, volume, quote_volume]
+            self.forming_minute = minute_ts
+
+    def _update_tick_range(self, minute_ts, price, high, low):
+        """
+        Son güncellemeden bu yana dokunulan en yüksek/en düşük fiyat.
+        Aynı dakikada h/l değiştiyse aradaki fitil yakalanır; yeni dakikada mumun tüm aralığı yenidir.
+        """
+        prev = self.forming
+        if prev is not None and self.forming_minute == minute_ts:
+            last = prev[3]
+            self.tick_high = high if high > prev[1] else max(last, price)
+            self.tick_low = low if low < prev[2] else min(last, price)
+        else:
+            self.tick_high = high
+            self.tick_low = low
+
+    @property
+    def forming_vwap(self):
+        """Oluşan mumun VWAP'ı (quote_volume / volume)."""
+        f = self.forming
+        if not f or f[4] <= 0:
+            return self.current_price
+        return f[5] / f[4]
+
+    def live_candle_summary(self):
+        """ANALYZE_SPECIFIC_PROMPT için oluşan 1m mumun özeti."""
+        f = self.forming
+        if not f:
+            return "N/A"
+        o, h, l, c = f[0], f[1], f[2], f[3]
+        range_pct = (h - l) / l * 100 if l else 0.0
+        return (
+            f"O: {o:.6g} | H: {h:.6g} | L: {l:.6g} | C: {c:.6g} | "
+            f"Range: {range_pct:.2f}% | VWAP: {self.forming_vwap:.6g}"
+        )
 
     def set_24h_change(self, percent):
         self.change_24h = percent
 
-    def get_change(self, minutes):
+    # --- PENCERE OKUMALARI (Kopyasız) ---
+    def _window(self, n):
+        size = int(self._meta[SIZE])
+        if n is None or n > size:
+            n = size
+        end = int(self._meta[HEAD]) + 1
+        return slice(end - n, end)
+
+    def timestamps(self, n=None):
+        return self._ts[self._window(n)]
+
+    def ohlcv(self, n=None):
+        """(5, n) boyutlu view: satırlar OPEN, HIGH, LOW, CLOSE, VOLUME."""
+        return self._ohlcv[:, self._window(n)]
+
+    def closes(self, n=None):
+        return self._ohlcv[CLOSE, self._window(n)]
+
+    def _reference_minute(self, now=None):
+        """Geriye bakışın referans dakikası: now (saniye) verilmezse son kapanan mumdan bir sonraki dakika."""
+        if now is not None:
+            return int(now / 60)
+        return int(self._ts[self._meta[HEAD]]) + 1
+
+    def find_index(self, minute_ts):
+        """
+        Zaman kolonunda ikili arama: `minute_ts` anındaki (veya ondan önceki son) mumun
+        pencere içindeki indeksi. Tüm veriler daha yeniyse -1.
+        """
+        return int(np.searchsorted(self.timestamps(), minute_ts, side="right")) - 1
+
+    def get_change(self, minutes, now=None):
         """
         Geçmişe bakıp yüzde değişimini hesaplar.
-        minutes: 1, 10, 60 gibi.
+        minutes: 1, 10, 60 gibi. Pozisyonla değil zamanla bakar:
+        `referans - minutes` dakikasındaki mumu bulur, boşluklar (reconnect vb.) kaymaya yol açmaz.
         """
-        if not self.candles or self.current_price == 0:
+        if self._meta[SIZE] == 0 or self._live[PRICE] == 0:
             return 0.0
-            
-        # Hedeflenen eski fiyatı bulmaya çalış
-        # Listemiz [(ts, price), (ts, price)...] şeklinde sondan başa doğru
-        # Şu anki zamandan 'minutes' kadar geriye gitmemiz lazım ama 
-        # en basiti listenin sonundan 'minutes' kadar gerideki elemanı almak.
-        
-        if len(self.candles) < minutes:
-            # Yeterli veri yoksa en eski veriyi kullan
-            old_price = self.candles[0][1]
-        else:
-            # [-1] son dakika, [-minutes] istenen dakika
-            old_price = self.candles[-minutes][1]
-            
+
+        target = self._reference_minute(now) - minutes
+        # Yeterli veri yoksa en eski mum kullanılır
+        idx = max(self.find_index(target), 0)
+        old_price = self.closes()[idx]
+
         if old_price == 0: return 0.0
-        
-        return ((self.current_price - old_price) / old_price) * 100
-    
+
+        return float((self.current_price - old_price) / old_price * 100)
+
+    def coverage(self, minutes, now=None):
+        """Son `minutes` dakikanın ne kadarında mum var (0.0 - 1.0)."""
+        if self._meta[SIZE] == 0 or minutes <= 0:
+            return 0.0
+        ref = self._reference_minute(now)
+        ts = self.timestamps()
+        present = len(ts) - int(np.searchsorted(ts, ref - minutes, side="left"))
+        return min(present / minutes, 1.0)
+
+    def missing_ranges(self, minutes, now=None):
+        """
+        [ref - minutes, ref - 1] aralığında eksik dakikalar: [(ilk, son), ...] (kapsayıcı).
+        Veri hiç yoksa tüm aralık eksiktir.
+        """
+        if now is None and self._meta[SIZE] == 0:
+            return []  # Referans yok (now verilmeli)
+        ref = self._reference_minute(now)
+        start = ref - minutes
+        ts = self.timestamps()
+        ts = ts[np.searchsorted(ts, start, side="left"):]
+        ts = ts[ts < ref]
+        edges = np.concatenate(([start - 1], ts, [ref]))
+        gap_at = np.flatnonzero(np.diff(edges) > 1)
+        return [(int(edges[i] + 1), int(edges[i + 1] - 1)) for i in gap_at]
+
+    def merge_candles(self, rows):
+        """
+        Backfill ile gelen mumları (close, timestamp, open, high, low, volume) sıralı birleştirir.
+        Hepsi son mumdan yeniyse O(1) ekleme; araya giriyorsa pencere yeniden kurulur
+        (göstergeler pencere üzerinden tekrar oynatılır). Mevcut mumlar korunur.
+        """
+        rows = sorted(rows, key=lambda r: r[1])
+        if not rows:
+            return
+        last = self.last_minute
+        if last is None or int(rows[0][1] / 60) > last:
+            for c, t, o, h, l, v in rows:
+                minute_ts = int(t / 60)
+                if last is None or minute_ts > last:
+                    self._append(minute_ts, o, h, l, c, v)
+                    last = minute_ts
+            if self.current_price == 0:
+                self.current_price = rows[-1][0]
+            return
+
+        merged = {
+            int(t): tuple(col)
+            for t, col in zip(self.timestamps(), self.ohlcv().T)
+        }
+        added = []
+        for c, t, o, h, l, v in rows:
+            minute_ts = int(t / 60)
+            if minute_ts not in merged:
+                merged[minute_ts] = (o, h, l, c, v)
+                added.append((minute_ts, o, h, l, c, v))
+        # Üst zaman dilimleri bu dakikaları update() ile göremez (last_minute'tan eski)
+        late = {m: r.last_minute for m, r in self.rollups.items()}
+        self.clear()
+        for minute_ts, (o, h, l, c, v) in sorted(merged.items())[-self.capacity:]:
+            self._append(minute_ts, o, h, l, c, v)
+        for minutes, rollup in self.rollups.items():
+            if late[minutes] is not None:
+                rollup.backfill([r for r in added if r[0] <= late[minutes]])
+        if self.current_price == 0:
+            self.current_price = self.closes(1)[0]
+
     def get_all_changes(self):
         """Tüm periyotları toplu döndürür"""
         return {
             "1m": self.get_change(1),
             "10m": self.get_change(10),
             "1h": self.get_change(60),
-            "24h": self.change_24h
+            "24h": self.get_change_24h()
         }
 
+    @property
+    def has_local_24h(self):
+        """1h rollup son 24 saati boşluksuz kapsıyor mu?"""
+        h1 = self.rollups.get(60)
+        if h1 is None or len(h1.bars) < 24:
+            return False
+        ts = h1.bars.timestamps(24)
+        return int(ts[-1] - ts[0]) == 23 * 60
+
+    def get_change_24h(self):
+        """24s değişim: Taze ticker > Rollup > Binance'in (REST) verdiği son değer."""
+        if self.has_fresh_ticker():
+            return self.change_24h
+        if self.current_price and self.has_local_24h:
+            old_price = self.rollups[60].bars.ohlcv(24)[OPEN, 0]
+            if old_price:
+                return float((self.current_price - old_price) / old_price * 100)
+        return self.change_24h
+
+    def rollup_summary(self, price=0.0):
+        """ANALYZE_SPECIFIC_PROMPT için üst zaman dilimi özeti."""
+        price = price or self.current_price
+        parts = []
+        for minutes, rollup in self.rollups.items():
+            label = ROLLUP_LABELS.get(minutes, f"{minutes}m")
+            ind = rollup.bars.indicators
+            if not ind.is_warm:
+                parts.append(f"{label}: n/a ({len(rollup.bars)} bars)")
+                continue
+            ema = ind.ema.get(21) or 0.0
+            dist = (price - ema) / ema * 100 if ema else 0.0
+            parts.append(f"{label}: RSI {ind.rsi:.1f}, vs EMA21 {dist:+.2f}%")
+        return " | ".join(parts) if parts else "N/A"
+
     def calculate_rsi(self, period=14):
-        if len(self.candles) < period + 1: return 50.0 # Veri yoksa nötr
-        
-        # Kapanış fiyatlarını al
-        closes = [c[1] for c in self.candles]
-        
-        deltas = [closes[i+1] - closes[i] for i in range(len(closes)-1)]
-        gains = [d if d > 0 else 0 for d in deltas]
-        losses = [-d if d < 0 else 0 for d in deltas]
-
-        avg_gain = sum(gains[-period:]) / period
-        avg_loss = sum(losses[-period:]) / period
-        
+        """Wilder RSI. Varsayılan periyot için hazır hesaplanmış değeri döndürür."""
+        if period == self.indicators.rsi_period:
+            return self.indicators.rsi
+
+        if self._meta[SIZE] < period + 1: return 50.0 # Veri yoksa nötr
+
+        # Standart dışı periyot: Pencere üzerinden Wilder yumuşatma
+        deltas = np.diff(self.closes())
+        gains = deltas.clip(min=0)
+        losses = -deltas.clip(max=0)
+        avg_gain = gains[:period].mean()
+        avg_loss = losses[:period].mean()
+        for g, l in zip(gains[period:], losses[period:]):
+            avg_gain = (avg_gain * (period - 1) + g) / period
+            avg_loss = (avg_loss * (period - 1) + l) / period
+
         if avg_loss == 0: return 100.0
         rs = avg_gain / avg_loss
-        return 100 - (100 / (1 + rs))
\ No newline at end of file
+        return float(100 - (100 / (1 + rs)))
+
+
+class CandleRollup:
+    """
+    1m mumlardan tek bir üst zaman dilimini (5m, 1h...) artımlı üretir.
+    Kapanan barlar sınırlı bir PriceBuffer'da tutulur, oluşan bar ayrı izlenir.
+    """
+
+    def __init__(self, minutes, capacity):
+        self.minutes = minutes
+        self.bars = PriceBuffer(capacity, rollups=None)
+        self.last_minute = None
+        self._bucket = None
+        self._bar = None  # [open, high, low, close, volume]
+        self._mask = 0    # Oluşan bara işlenmiş dakikalar (bit i = dilimin i. dakikası)
+        self._masks = {}  # Kapanan barlar: dilim -> dakika maskesi (Geç gelen dakikalar için)
+
+    def update(self, minute_ts, open_price, high, low, close, volume):
+        # Yeniden doldurma (clear + backfill) aynı dakikaları tekrar gönderebilir
+        if self.last_minute is not None and minute_ts <= self.last_minute:
+            return
+        self.last_minute = minute_ts
+
+        bucket = minute_ts // self.minutes
+        if bucket != self._bucket:
+            self._flush()  # Boşluktan sonra yarım kalan bar da kapanır
+            self._bucket = bucket
+            self._bar = [open_price, high, low, close, volume]
+            self._mask = 0
+        else:
+            bar = self._bar
+            if high > bar[1]: bar[1] = high
+            if low < bar[2]: bar[2] = low
+            bar[3] = close
+            bar[4] += volume
+        self._mask |= 1 << (minute_ts % self.minutes)
+
+        # Dilimin son dakikası geldiyse barı beklemeden kapat
+        if minute_ts % self.minutes == self.minutes - 1:
+            self._flush()
+
+    def _flush(self):
+        if self._bucket is None:
+            return
+        o, h, l, c, v = self._bar
+        self.bars.update_candle(c, self._bucket * self.minutes * 60, True, o, h, l, v)
+        self._masks[self._bucket] = self._mask
+        if len(self._masks) > self.bars.capacity:
+            del self._masks[min(self._masks)]
+        self._bucket = None
+        self._bar = None
+        self._mask = 0
+
+    def backfill(self, rows):
+        """
+        last_minute'tan eski (Backfill ile sonradan dolan) 1m mumları ait oldukları barlara işler.
+        rows: (dakika, open, high, low, close, volume). Maskede olan dakika tekrar sayılmaz;
+        dilimin tamamı boşluktaysa bar araya eklenir. Maskesi bilinmeyen bar (Snapshot'tan) değiştirilmez.
+        """
+        bars = self.bars
+        ts = bars.timestamps()
+        changed = False
+        inserted = {}  # dilim -> [bar, maske] (Hiç görülmemiş dilimler)
+        for minute_ts, o, h, l, c, v in rows:
+            if self.last_minute is None or minute_ts > self.last_minute:
+                continue
+            bucket = minute_ts // self.minutes
+            bit = 1 << (minute_ts % self.minutes)
+            if bucket == self._bucket:
+                self._mask = _fold(self._bar, self._mask, bit, o, h, l, c, v)
+                continue
+            idx = int(np.searchsorted(ts, bucket * self.minutes))
+            if idx < len(ts) and ts[idx] == bucket * self.minutes:
+                mask = self._masks.get(bucket)
+                if mask is None or mask & bit:
+                    continue
+                bar = [float(x) for x in bars.ohlcv()[:, idx]]
+                self._masks[bucket] = _fold(bar, mask, bit, o, h, l, c, v)
+                bars.replace_candle(idx, *bar)
+                changed = True
+            elif bucket in inserted:
+                entry = inserted[bucket]
+                entry[1] = _fold(entry[0], entry[1], bit, o, h, l, c, v)
+            elif len(ts) < bars.capacity or (len(ts) and bucket * self.minutes > ts[0]):
+                inserted[bucket] = [[o, h, l, c, v], bit]
+
+        if inserted:
+            # Araya ekleme pencereyi yeniden kurar (Göstergeler dahil)
+            bars.merge_candles([
+                (bar[3], bucket * self.minutes * 60, bar[0], bar[1], bar[2], bar[4])
+                for bucket, (bar, _) in inserted.items()
+            ])
+            for bucket, (_, mask) in inserted.items():
+                self._masks[bucket] = mask
+            while len(self._masks) > bars.capacity:
+                del self._masks[min(self._masks)]
+        elif changed:
+            bars.replay_indicators()
+
+    @property
+    def forming(self):
+        """Henüz kapanmamış bar (open, high, low, close, volume) veya None."""
+        return tuple(self._bar) if self._bar else None
+
+
+def _fold(bar, mask, bit, open_price, high, low, close, volume):
+    """Tek dakikayı bara ekler (Maskeye göre açılış/kapanış önce/sonra gelmesine göre değişir)."""
+    if mask & bit:
+        return mask
+    if not mask or bit < (mask & -mask):
+        bar[0] = open_price
+    if bit > mask:
+        bar[3] = close
+    if high > bar[1]: bar[1] = high
+    if low < bar[2]: bar[2] = low
+    bar[4] += volume
+    return mask | bit
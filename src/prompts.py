@@ -35,6 +35,9 @@ ANALYZE_SPECIFIC_PROMPT = """
 - **TIME CHECK:** Current Time: {current_time_str}
 - **TECHNICALS:** RSI: {rsi_val:.1f} | Funding: {funding_rate:.4f}% | BTC 1h Trend: {btc_trend:.2f}%
 - **MOMENTUM:** 1h: {change_1h:.2f}% | 24h: {change_24h:.2f}%
+- **TREND & VOLATILITY (1m):** {indicator_summary}
+- **HIGHER TIMEFRAMES:** {htf_summary}
+- **LIVE 1m CANDLE:** {live_candle_summary}
 - **SOURCE INTEL:** "{news}"
 - **SEARCH CONTEXT:** "{search_context}"
 
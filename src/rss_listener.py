@@ -1,5 +1,6 @@
 import feedparser
 import asyncio
+import calendar
 import time
 from config import RSS_FEEDS
 
@@ -20,7 +21,7 @@ class RSSMonitor:
                 summary = getattr(entry, 'summary', '')
                 
                 if hasattr(entry, 'published_parsed'):
-                    published_time = time.mktime(entry.published_parsed)
+                    published_time = calendar.timegm(entry.published_parsed)  # published_parsed UTC'dir
                     current_time = time.time()
                     # 1 saat (3600 sn) eski haberleri direkt çöpe at
                     if current_time - published_time > 3600:
@@ -36,9 +37,9 @@ class RSSMonitor:
                     
                     full_text = f"{title}. {summary}"
                     
-                    # Main.py'daki process_news'i çağır
+                    # Haber kuyruğuna bırak (NewsQueue.put, bloklamaz)
                     print(f"📡 [RSS] Yeni Haber: {title[:50]}...")
-                    await self.callback(full_text, "RSS")
+                    self.callback(full_text, "RSS")
                     
         except Exception as e:
             print(f"⚠️ RSS Hatası ({url}): {e}")
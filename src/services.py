@@ -4,7 +4,6 @@ import json
 import re
 import datetime
 import os
-import websockets
 from telethon import events
 
 from rss_listener import RSSMonitor
@@ -17,8 +16,25 @@ from config import (
     IGNORE_KEYWORDS,
     FIXED_TRADE_AMOUNT,
     LEVERAGE,
+    BACKFILL_STALE_TOLERANCE,
+    MARKET_SNAPSHOT_DIR,
+    MARKET_SNAPSHOT_INTERVAL,
+    NEWS_ARCHIVE_BATCH,
+    NEWS_RETENTION_INTERVAL,
+    ALL_MARKET_STREAMS,
+    STREAM_BACKFILL_HOLD,
+    WATCHLIST_PAIRS,
+    PAIR_ANALYSIS_CONCURRENCY,
 )
-from price_buffer import PriceBuffer
+from binance_client import format_volume
+from stream_manager import (
+    kline_stream,
+    REASON_POSITION,
+    REASON_WATCHLIST,
+    REASON_BACKFILL,
+    REASON_MARKET,
+)
+from stream_decoder import KlineEvent, MiniTickerEvent, MarkPriceEvent
 
 TARGET_PAIRS = get_top_100_map()
 
@@ -79,38 +95,14 @@ async def send_telegram_alert(ctx, message):
         ctx.log_ui(f"❌ Telegram Gönderme Hatası: {e}", "error")
 
 
-async def ensure_fresh_data(ctx, pair):
-    """Verinin güncelliğini kontrol eder ve gerekirse eksikleri tamamlar."""
-    stats = ctx.market_memory[pair]
-    is_stale = False
-    current_minute = int(time.time() / 60)
-
-    # Veri bayat mı kontrolü
-    if stats.current_price == 0:
-        is_stale = True
-    elif stats.candles:
-        last_candle_time = stats.candles[-1][0]
-        if (current_minute - last_candle_time) > 3:
-            is_stale = True
-    else:
-        is_stale = True
-
-    # Bayatsa çek
-    if is_stale:
-        ctx.log_ui(f"⚠️ {pair} Verisi Bayat/Yok. Taze veri çekiliyor...", "warning")
-        hist_data, chg_24h = await ctx.real_exchange.fetch_missing_data(pair)
-
-        if hist_data:
-            stats.candles.clear()
-            for c, t in hist_data:
-                stats.update_candle(c, t, True)
-            stats.set_24h_change(chg_24h)
-            stats.current_price = hist_data[-1][0]
-            return True  # Veri başarıyla güncellendi
-        else:
-            return False  # Veri çekilemedi
-
-    return True  # Veri zaten taze
+async def ensure_fresh_data(ctx, pair, tolerance=BACKFILL_STALE_TOLERANCE):
+    """
+    Verinin güncelliğini kontrol eder ve sadece eksik dakikaları tamamlar.
+    Planlama ve aynı sembol için eşzamanlı isteklerin birleştirilmesi BackfillPlanner'da.
+    Analiz edilen coinin kline stream'i bir süre açık tutulur (Sonraki haberde REST gerekmez).
+    """
+    ctx.streams.lease(kline_stream(pair), REASON_BACKFILL, STREAM_BACKFILL_HOLD)
+    return await ctx.backfill.ensure(pair, tolerance=tolerance)
 
 
 async def execute_trade_logic(ctx, pair, dec, stats, source, msg, changes, search_res):
@@ -167,6 +159,8 @@ async def execute_trade_logic(ctx, pair, dec, stats, source, msg, changes, searc
 
     # --- 2. KAĞIT ÜZERİNDE (SİMÜLASYON) & LOGLAMA ---
     if can_open_paper_trade:
+        # Derinliğe göre kayma: Emir defterde seviye seviye yürünür (Defter yoksa FillModel düz etki kullanır)
+        book = await ctx.real_exchange.get_book_levels(pair, dec["action"])
         log, color = ctx.exchange.open_position(
             symbol=pair,
             side=dec["action"],
@@ -178,6 +172,9 @@ async def execute_trade_logic(ctx, pair, dec, stats, source, msg, changes, searc
             validity=validity,
             app_state=ctx.app_state,
             decision_id=dec.get("db_id"),
+            funding_rate=stats.funding_rate if stats.has_fresh_funding() else None,
+            book=book,
+            confidence=dec.get("confidence"),
         )
 
         full_log = log + f'\nSrc: {source}\nReason: {dec.get("reason")}\nNews: {msg}'
@@ -195,13 +192,197 @@ async def execute_trade_logic(ctx, pair, dec, stats, source, msg, changes, searc
         )
         asyncio.create_task(send_telegram_alert(ctx, full_log))
 
-        # WebSocket Takibi Başlat
-        subscribe_msg = {
-            "method": "SUBSCRIBE",
-            "params": [f"{pair.lower()}@kline_1m"],
-            "id": int(time.time()),
-        }
-        await ctx.stream_command_queue.put(subscribe_msg)
+        # WebSocket Takibi Başlat (Pozisyon kapanana kadar açık kalır)
+        ctx.streams.acquire(kline_stream(pair), REASON_POSITION)
+
+
+async def analyze_pair(ctx, pair, msg, source, coin_map, btc_trend):
+    """
+    Tek paritenin analiz zinciri: Veri tazeleme, araştırma, AI kararı, derinlik/spread kontrolü, uygulama.
+    Ortak aşamalar (coin haritası, BTC trendi) process_news'te bir kez hesaplanıp verilir.
+    """
+    # A) Veri Tazeleme (Yardımcı Fonksiyon Çağrısı)
+    data_ready = await ensure_fresh_data(ctx, pair)
+    if not data_ready:
+        ctx.log_ui(f"❌ {pair} verisi çekilemedi, analiz iptal.", "error")
+        return
+
+    stats = ctx.market_memory[pair]
+
+    # B) Araştırma
+    smart_query = await ctx.brain.generate_search_query(
+        msg, pair.replace("usdt", "")
+    )
+    ctx.log_ui(f"🌍 Araştırılıyor: '{smart_query}'", "info")
+    search_res = await perform_research(smart_query)
+
+    # C) Metadata ve Teknik Veriler
+    clean_symbol = pair.replace("usdt", "").lower()
+
+    # Güvenli Sözlük Erişimi
+    c_data = coin_map.get(clean_symbol)
+    if isinstance(c_data, dict):
+        coin_full_name = c_data.get("name", "Unknown").title()
+        m_cap = c_data.get("cap", 0)
+    else:
+        coin_full_name = "Unknown"
+        m_cap = 0
+
+    # Market Cap Formatlama
+    if m_cap > 1_000_000_000:
+        cap_str = f"${m_cap / 1_000_000_000:.2f} BILLION"
+    elif m_cap > 1_000_000:
+        cap_str = f"${m_cap / 1_000_000:.2f} MILLION"
+    else:
+        cap_str = "UNKNOWN/SMALL"
+
+    rsi_val = stats.calculate_rsi()
+    changes = stats.get_all_changes()
+
+    ctx.log_ui(f"🔍 Analiz Fiyatı ({pair}): {stats.current_price}", "info")
+
+    # D) Yapay Zeka Kararı
+    # All-market stream tazeyse hacim ve fonlama hafızadan (Ağ çağrısı yok)
+    if stats.has_fresh_ticker() and stats.has_fresh_funding():
+        volume_24h, funding_rate = format_volume(stats.volume_24h), stats.funding_rate
+    else:
+        volume_24h, funding_rate = await ctx.real_exchange.get_extended_metrics(pair)
+
+    dec = await ctx.brain.analyze_specific(
+        msg,
+        pair,
+        stats.current_price,
+        changes,
+        search_res,
+        coin_full_name,
+        cap_str,
+        rsi_val,
+        btc_trend,
+        volume_24h,
+        funding_rate,
+        stats.indicators.summary(stats.current_price),
+        stats.rollup_summary(stats.current_price),
+        stats.live_candle_summary(),
+    )
+
+    # for testing
+    """
+    dec = {
+        "symbol": pair,
+        "action": "LONG",
+        "confidence": 100,
+        "reason": "Test",
+        "validity_minutes": 1,
+        "tp_pct": 1.5,
+        "sl_pct": 1.5,
+    }"""
+
+    # Data Collector Kaydı
+    ctx.collector.log_decision(msg, pair, stats.current_price, str(changes), dec)
+
+    # Dashboard Karar Günlüğü Kaydı
+    decision_record = {
+        "time": datetime.datetime.now().strftime("%H:%M:%S"),
+        "symbol": pair.upper().replace("USDT", ""),
+        "action": dec.get("action", "HOLD"),
+        "confidence": dec.get("confidence", 0),
+        "reason": dec.get("reason", "N/A"),
+        "price": stats.current_price,
+        "news_snippet": msg[:60] + "...",
+        "validity": dec.get("validity_minutes", 0),
+        "tp_pct": dec.get("tp_pct", 0.0),
+        "sl_pct": dec.get("sl_pct", 0.0),
+        "source": source,
+    }
+    ctx.ai_decisions.append(decision_record)
+    # Yazıcı thread'i commit edince ID gelir (Event loop bloklanmaz)
+    try:
+        decision_id = await asyncio.wrap_future(ctx.memory.log_decision(decision_record))
+    except Exception as e:
+        # Kayıt hatası (Kilitli DB vb.) verilmiş kararı engellememeli
+        ctx.log_ui(f"⚠️ Karar DB'ye yazılamadı ({pair}): {e}", "warning")
+        decision_id = None
+    dec["db_id"] = decision_id
+    # ----------------------------------------------------------------------
+    # MENTÖR GÜNCELLEMESİ: DERİNLİK KONTROLÜ (DUVAR KORUMASI)
+    # ----------------------------------------------------------------------
+    # Sadece LONG veya SHORT kararı varsa tahtaya bak (HOLD için bakmaya gerek yok)
+    is_order_book_safe = True
+
+    if dec["action"] in ["LONG", "SHORT"] and REAL_TRADING_ENABLED:
+        imbalance, depth_info = await ctx.real_exchange.get_order_book_imbalance(
+            pair
+        )
+        ctx.log_ui(
+            f"📊 Derinlik Analizi ({pair}): Oran {imbalance:.2f} | {depth_info}",
+            "info",
+        )
+
+        # KURAL 1: LONG girmek istiyorsun ama Satıcılar (Asks) çok baskın
+        # Eğer imbalance < -0.4 ise (Satıcılar %70'ten fazla), LONG girme!
+        if dec["action"] == "LONG" and imbalance < -0.5:
+            ctx.log_ui(
+                f"🛑 DUVAR TESPİT EDİLDİ: Aşırı Satış Baskısı ({imbalance:.2f}). LONG İptal.",
+                "warning",
+            )
+            dec["action"] = "HOLD"  # Kararı zorla HOLD'a çevir
+            dec["reason"] += " [CANCELLED: Sell Wall Detected]"
+            is_order_book_safe = False
+
+        # KURAL 2: SHORT girmek istiyorsun ama Alıcılar (Bids) çok baskın
+        # Eğer imbalance > 0.4 ise (Alıcılar %70'ten fazla), SHORT girme!
+        elif dec["action"] == "SHORT" and imbalance > 0.5:
+            ctx.log_ui(
+                f"🛑 DUVAR TESPİT EDİLDİ: Aşırı Alış Baskısı ({imbalance:.2f}). SHORT İptal.",
+                "warning",
+            )
+            dec["action"] = "HOLD"  # Kararı zorla HOLD'a çevir
+            dec["reason"] += " [CANCELLED: Buy Wall Detected]"
+            is_order_book_safe = False
+
+        # ------------------------------------------------------------------
+        # ADIM 4: SPREAD KONTROLÜ (GİZLİ MALİYET FİLTRESİ)
+        # ------------------------------------------------------------------
+        # Spread > %0.3 ise girme.
+        # Çünkü kar etmek için fiyatın Spread + Komisyon kadar gitmesi gerekir.
+        try:
+            # Anlık Ticker verisini çek (En güncel Bid/Ask)
+            ticker = await ctx.real_exchange.client.futures_orderbook_ticker(
+                symbol=pair.upper()
+            )
+            bid = float(ticker["bidPrice"])
+            ask = float(ticker["askPrice"])
+
+            # Spread Hesapla: (Ask - Bid) / Ask
+            spread_pct = ((ask - bid) / ask) * 100
+
+            ctx.log_ui(f"📏 Spread Analizi ({pair}): %{spread_pct:.3f}", "info")
+
+            if spread_pct > 0.3:  # Eşik Değer: %0.3 (Bu HFT için çoktur)
+                ctx.log_ui(
+                    f"🛑 SPREAD ÇOK YÜKSEK (%{spread_pct:.2f}). Makas açık, girilmez.",
+                    "warning",
+                )
+                dec["action"] = "HOLD"  # Kararı iptal et
+                dec["reason"] += f" [CANCELLED: High Spread {spread_pct:.2f}%]"
+                is_order_book_safe = False
+
+        except Exception as e:
+            # Veri çekemiyorsak risk almayalım
+            ctx.log_ui(f"⚠️ Spread verisi alınamadı: {e}", "warning")
+            # is_order_book_safe = False # (İsteğe bağlı: Veri yoksa girme diyebilirsin)
+
+    # ----------------------------------------------------------------------
+    # E) Karar Uygulama (Yardımcı Fonksiyon Çağrısı)
+    if dec["confidence"] >= 65 and dec["action"] in ["LONG", "SHORT"]:
+        await execute_trade_logic(
+            ctx, pair, dec, stats, source, msg, changes, search_res
+        )
+    else:
+        log = f"🛑 Pas: {pair.upper()} ({coin_full_name}) | {dec['action']} | (G: %{dec['confidence']}) | Reason : {dec.get('reason')}\nNews: {msg}"
+        ctx.log_ui(log, "warning")
+        log_txt(log)
+        asyncio.create_task(send_telegram_alert(ctx, log))
 
 
 async def process_news(msg, source, ctx):
@@ -241,343 +422,155 @@ async def process_news(msg, source, ctx):
                 ctx.log_ui(f"🕵️ AJAN BULDU: {found_symbol}", "success")
                 detected_pairs.append(pot_pair)
 
-    # --- 3. ANALİZ DÖNGÜSÜ ---
-    coin_map = (
-        get_top_100_map()
-    )  # Global cache olsa iyi olur ama şimdilik burada kalsın.
-
-    for pair in detected_pairs:
-        # A) Veri Tazeleme (Yardımcı Fonksiyon Çağrısı)
-        data_ready = await ensure_fresh_data(ctx, pair)
-        if not data_ready:
-            ctx.log_ui(f"❌ {pair} verisi çekilemedi, analiz iptal.", "error")
-            continue
-
-        stats = ctx.market_memory[pair]
-
-        # B) Araştırma
-        smart_query = await ctx.brain.generate_search_query(
-            msg, pair.replace("usdt", "")
-        )
-        ctx.log_ui(f"🌍 Araştırılıyor: '{smart_query}'", "info")
-        search_res = await perform_research(smart_query)
-
-        # C) Metadata ve Teknik Veriler
-        clean_symbol = pair.replace("usdt", "").lower()
-
-        # Güvenli Sözlük Erişimi
-        c_data = coin_map.get(clean_symbol)
-        if isinstance(c_data, dict):
-            coin_full_name = c_data.get("name", "Unknown").title()
-            m_cap = c_data.get("cap", 0)
-        else:
-            coin_full_name = "Unknown"
-            m_cap = 0
-
-        # Market Cap Formatlama
-        if m_cap > 1_000_000_000:
-            cap_str = f"${m_cap / 1_000_000_000:.2f} BILLION"
-        elif m_cap > 1_000_000:
-            cap_str = f"${m_cap / 1_000_000:.2f} MILLION"
-        else:
-            cap_str = "UNKNOWN/SMALL"
+    if not detected_pairs:
+        return
 
-        rsi_val = stats.calculate_rsi()
-        changes = stats.get_all_changes()
+    # --- 3. ORTAK AŞAMALAR (Haber başına bir kez) ---
+    # Coin haritası (Senkron HTTP) thread'de, BTC tazeleme ile aynı anda
+    btc_pair = "btcusdt"
+    # BTC için 5 dk tolerans; coinlerle aynı anda istenirse tek backfill paylaşılır
+    coin_map, _ = await asyncio.gather(
+        asyncio.to_thread(get_top_100_map),
+        ensure_fresh_data(ctx, btc_pair, tolerance=5),
+    )
+    btc_stats = ctx.market_memory.get(btc_pair)
+    btc_trend = btc_stats.get_change(60) if btc_stats else 0.0
 
-        # BTC Trend
-        btc_pair = "btcusdt"
-        btc_stats = ctx.market_memory.get(btc_pair)
+    # --- 4. ANALİZ (Pariteler eşzamanlı, en fazla PAIR_ANALYSIS_CONCURRENCY) ---
+    semaphore = asyncio.Semaphore(PAIR_ANALYSIS_CONCURRENCY)
 
-        btc_is_stale = False
-        if not btc_stats or not btc_stats.candles:
-            btc_is_stale = True
-        elif (int(time.time() / 60) - btc_stats.candles[-1][0]) > 5:
-            btc_is_stale = True
+    async def run_pair(pair):
+        async with semaphore:
+            try:
+                await analyze_pair(ctx, pair, msg, source, coin_map, btc_trend)
+            except Exception as e:
+                ctx.log_ui(f"⚠️ {pair.upper()} Analiz Hatası: {e}", "warning")
 
-        if btc_is_stale:
-            # BTC verisi çekiliyor...
-            btc_hist, btc_24h = await ctx.real_exchange.fetch_missing_data(btc_pair)
-            if btc_hist:
-                if btc_pair not in ctx.market_memory:
-                    ctx.market_memory[btc_pair] = PriceBuffer()
+    await asyncio.gather(*(run_pair(pair) for pair in dict.fromkeys(detected_pairs)))
 
-                # Hafızayı doldur
-                ctx.market_memory[btc_pair].candles.clear()
-                for c, t in btc_hist:
-                    ctx.market_memory[btc_pair].update_candle(c, t, True)
-                ctx.market_memory[btc_pair].current_price = btc_hist[-1][0]
-                btc_stats = ctx.market_memory[btc_pair]
+    end_time = time.time()
+    ctx.log_ui(
+        f"[{source}] Haber İşleme Süresi: {end_time - start_time:.2f} saniye.", "info"
+    )
 
-        # Artık btc_stats dolu, hesapla
-        btc_trend = btc_stats.get_change(60) if btc_stats else 0.0
 
-        ctx.log_ui(f"🔍 Analiz Fiyatı ({pair}): {stats.current_price}", "info")
+# --- LOOPS ---
 
-        # D) Yapay Zeka Kararı
-        volume_24h, funding_rate = await ctx.real_exchange.get_extended_metrics(pair)
-        
-        dec = await ctx.brain.analyze_specific(
-            msg,
-            pair,
-            stats.current_price,
-            changes,
-            search_res,
-            coin_full_name,
-            cap_str,
-            rsi_val,
-            btc_trend,
-            volume_24h,
-            funding_rate,
-        )
 
-        # for testing
-        """
-        dec = {
-            "symbol": pair,
-            "action": "LONG",
-            "confidence": 100,
-            "reason": "Test",
-            "validity_minutes": 1,
-            "tp_pct": 1.5,
-            "sl_pct": 1.5,
-        }"""
-
-        # Data Collector Kaydı
-        ctx.collector.log_decision(msg, pair, stats.current_price, str(changes), dec)
-
-        # Dashboard Karar Günlüğü Kaydı
-        decision_record = {
-            "time": datetime.datetime.now().strftime("%H:%M:%S"),
-            "symbol": pair.upper().replace("USDT", ""),
-            "action": dec.get("action", "HOLD"),
-            "confidence": dec.get("confidence", 0),
-            "reason": dec.get("reason", "N/A"),
-            "price": stats.current_price,
-            "news_snippet": msg[:60] + "...",
-            "validity": dec.get("validity_minutes", 0),
-            "tp_pct": dec.get("tp_pct", 0.0),
-            "sl_pct": dec.get("sl_pct", 0.0),
-        }
-        ctx.ai_decisions.append(decision_record)
-        decision_id = ctx.memory.log_decision(decision_record)  # <--- DB ID GELDİ
-        dec["db_id"] = decision_id
-        # ----------------------------------------------------------------------
-        # MENTÖR GÜNCELLEMESİ: DERİNLİK KONTROLÜ (DUVAR KORUMASI)
-        # ----------------------------------------------------------------------
-        # Sadece LONG veya SHORT kararı varsa tahtaya bak (HOLD için bakmaya gerek yok)
-        is_order_book_safe = True
-
-        if dec["action"] in ["LONG", "SHORT"] and REAL_TRADING_ENABLED:
-            imbalance, depth_info = await ctx.real_exchange.get_order_book_imbalance(
-                pair
-            )
-            ctx.log_ui(
-                f"📊 Derinlik Analizi ({pair}): Oran {imbalance:.2f} | {depth_info}",
-                "info",
-            )
+def is_tracked_pair(pair):
+    """All-market akışında sadece takip edilen USDT paritelerini işle."""
+    if not pair.endswith("usdt"):
+        return False
+    return not TARGET_PAIRS or pair[:-4] in TARGET_PAIRS
 
-            # KURAL 1: LONG girmek istiyorsun ama Satıcılar (Asks) çok baskın
-            # Eğer imbalance < -0.4 ise (Satıcılar %70'ten fazla), LONG girme!
-            if dec["action"] == "LONG" and imbalance < -0.5:
-                ctx.log_ui(
-                    f"🛑 DUVAR TESPİT EDİLDİ: Aşırı Satış Baskısı ({imbalance:.2f}). LONG İptal.",
-                    "warning",
-                )
-                dec["action"] = "HOLD"  # Kararı zorla HOLD'a çevir
-                dec["reason"] += " [CANCELLED: Sell Wall Detected]"
-                is_order_book_safe = False
 
-            # KURAL 2: SHORT girmek istiyorsun ama Alıcılar (Bids) çok baskın
-            # Eğer imbalance > 0.4 ise (Alıcılar %70'ten fazla), SHORT girme!
-            elif dec["action"] == "SHORT" and imbalance > 0.5:
-                ctx.log_ui(
-                    f"🛑 DUVAR TESPİT EDİLDİ: Aşırı Alış Baskısı ({imbalance:.2f}). SHORT İptal.",
-                    "warning",
-                )
-                dec["action"] = "HOLD"  # Kararı zorla HOLD'a çevir
-                dec["reason"] += " [CANCELLED: Buy Wall Detected]"
-                is_order_book_safe = False
+def apply_ticker(ctx, ev):
+    """!miniTicker@arr elemanını (MiniTickerEvent) market hafızasına işler."""
+    change_24h = (ev.close - ev.open) / ev.open * 100 if ev.open else 0.0
+    ctx.market_memory[ev.symbol].update_ticker(ev.close, ev.event_time, change_24h, ev.quote_volume)
 
-            # ------------------------------------------------------------------
-            # ADIM 4: SPREAD KONTROLÜ (GİZLİ MALİYET FİLTRESİ)
-            # ------------------------------------------------------------------
-            # Spread > %0.3 ise girme.
-            # Çünkü kar etmek için fiyatın Spread + Komisyon kadar gitmesi gerekir.
-            try:
-                # Anlık Ticker verisini çek (En güncel Bid/Ask)
-                ticker = await ctx.real_exchange.client.futures_orderbook_ticker(
-                    symbol=pair.upper()
-                )
-                bid = float(ticker["bidPrice"])
-                ask = float(ticker["askPrice"])
 
-                # Spread Hesapla: (Ask - Bid) / Ask
-                spread_pct = ((ask - bid) / ask) * 100
+async def apply_kline(ctx, ev):
+    """KlineEvent'i hafızaya işler ve açık pozisyon varsa TP/SL kontrolü yapar."""
+    pair = ev.symbol
 
-                ctx.log_ui(f"📏 Spread Analizi ({pair}): %{spread_pct:.3f}", "info")
+    # 1. HAFIZAYI GÜNCELLE
+    # (Coin hafızada yoksa MarketMemory satırını anında oluşturur)
+    stats = ctx.market_memory[pair]
+    stats.last_kline_at = time.time()
+    stats.update_candle(
+        ev.close, ev.open_time, ev.closed,
+        ev.open, ev.high, ev.low, ev.volume, ev.quote_volume,
+    )
 
-                if spread_pct > 0.3:  # Eşik Değer: %0.3 (Bu HFT için çoktur)
-                    ctx.log_ui(
-                        f"🛑 SPREAD ÇOK YÜKSEK (%{spread_pct:.2f}). Makas açık, girilmez.",
-                        "warning",
-                    )
-                    dec["action"] = "HOLD"  # Kararı iptal et
-                    dec["reason"] += f" [CANCELLED: High Spread {spread_pct:.2f}%]"
-                    is_order_book_safe = False
+    # 2. POZİSYON VE PNL KONTROLÜ
+    # Eğer bu coinde açık işlemimiz varsa, Exchange'e haber ver
+    if pair in ctx.exchange.positions:
+        # Son tick'ten bu yana görülen aralık (fitiller dahil)
+        log, color, closed_sym, pnl, peak_price, decision_id = (
+            ctx.exchange.check_positions(pair, ev.close, stats.tick_high, stats.tick_low)
+        )
 
-            except Exception as e:
-                # Veri çekemiyorsak risk almayalım
-                ctx.log_ui(f"⚠️ Spread verisi alınamadı: {e}", "warning")
-                # is_order_book_safe = False # (İsteğe bağlı: Veri yoksa girme diyebilirsin)
-
-        # ----------------------------------------------------------------------
-        # E) Karar Uygulama (Yardımcı Fonksiyon Çağrısı)
-        if dec["confidence"] >= 65 and dec["action"] in ["LONG", "SHORT"]:
-            await execute_trade_logic(
-                ctx, pair, dec, stats, source, msg, changes, search_res
-            )
-        else:
-            log = f"🛑 Pas: {pair.upper()} ({coin_full_name}) | {dec['action']} | (G: %{dec['confidence']}) | Reason : {dec.get('reason')}\nNews: {msg}"
-            ctx.log_ui(log, "warning")
+        if log:
+            # Log varsa (TP, SL, Trailing, Time Limit tetiklendiyse)
+            ctx.log_ui(log, color)
             log_txt(log)
-            asyncio.create_task(send_telegram_alert(ctx, log))
-
-    end_time = time.time()
-    ctx.log_ui(
-        f"[{source}] Haber İşleme Süresi: {end_time - start_time:.2f} saniye.", "info"
-    )
+            if closed_sym:
+                await handle_closed_position(
+                    ctx, closed_sym, pnl, peak_price, log, decision_id
+                )
 
 
-# --- LOOPS ---
+async def handle_stream_message(ctx, records):
+    """TickDispatcher'ın devrettiği tipli kayıtları (sembol başına en son tick) işler."""
+    for ev in records:
+        # Kayıt başına koruma: Eski tick'ler zaten ezildi, bozuk bir kayıt
+        # batch'teki diğer sembollerin son güncellemesini kaybettirmemeli
+        try:
+            kind = type(ev)
+            if kind is KlineEvent:
+                await apply_kline(ctx, ev)
+            elif kind is MiniTickerEvent:
+                if is_tracked_pair(ev.symbol):
+                    apply_ticker(ctx, ev)
+            elif kind is MarkPriceEvent:
+                if is_tracked_pair(ev.symbol):
+                    ctx.market_memory[ev.symbol].update_funding(ev.funding_rate, ev.event_time)
+        except Exception as e:
+            # Sadece logla ve devam et
+            ctx.log_ui(f"⚠️ WS Msg İşleme Hatası ({ev.symbol}): {e}", "warning")
 
 
 async def websocket_loop(ctx):
     """
     Binance Websocket verilerini yöneten ana döngü.
-    Hatalara karşı korumalı, otomatik hafıza başlatan ve PnL güncelleyen versiyon.
+    Bağlantılar, abonelikler ve yeniden bağlanma StreamManager'da (ctx.streams).
     """
     ctx.log_ui("🔌 Websocket Bağlantısı Başlatılıyor (Sniper Mode)...", "info")
 
-    # Ana Reconnection Döngüsü (Koparsa tekrar bağlanır)
-    while ctx.app_state.is_running:
-        try:
-            async with websockets.connect(WEBSOCKET_URL) as ws:
-                ctx.log_ui("✅ Websocket Bağlandı.", "success")
-
-                # --- ALT GÖREV 1: GÖNDERİCİ (Sender) ---
-                # Abonelik (Subscribe) emirlerini Binance'e iletir
-                async def sender():
-                    while ctx.app_state.is_running:
-                        try:
-                            # Kuyruktan emir gelmesini bekle
-                            command = await ctx.stream_command_queue.get()
-                            await ws.send(json.dumps(command))
-                            # Log kirliliği olmaması için print kapalı, gerekirse aç:
-                            # print(f"📡 Stream Komutu Gönderildi: {command}")
-                        except Exception as e:
-                            ctx.log_ui(f"⚠️ WS Sender Hatası: {e}", "error")
-                            break  # Hata varsa döngüyü kır ki ana döngü yeniden bağlansın
-
-                # --- ALT GÖREV 2: ALICI (Receiver) ---
-                # Binance'den gelen fiyatları işler
-                async def receiver():
-                    async for msg in ws:
-                        try:
-                            raw_data = json.loads(msg)
-
-                            # Veri formatını ayıkla ('data' içinde veya direkt gelebilir)
-                            if "data" in raw_data:
-                                data = raw_data["data"]
-                            else:
-                                data = raw_data
-
-                            # Kline (Mum) verisi mi?
-                            if isinstance(data, dict) and data.get("e") == "kline":
-                                # 1. SEMBOLÜ KÜÇÜLT (Hayati Düzeltme)
-                                # Binance 'BTCUSDT' yollar, biz 'btcusdt' kullanıyoruz.
-                                pair = data["s"].lower()
-                                k = data["k"]
-                                price = float(k["c"])
-                                is_closed = k["x"]
-                                ts = k["t"] / 1000
-
-                                # 2. HAFIZA KONTROLÜ (KeyError Çözümü)
-                                # Eğer bu coin hafızada yoksa, anında oluştur!
-                                if pair not in ctx.market_memory:
-                                    ctx.market_memory[pair] = PriceBuffer()
-
-                                # 3. HAFIZAYI GÜNCELLE
-                                ctx.market_memory[pair].update_candle(
-                                    price, ts, is_closed
-                                )
-
-                                # 4. POZİSYON VE PNL KONTROLÜ
-                                # Eğer bu coinde açık işlemimiz varsa, Exchange'e haber ver
-                                if pair in ctx.exchange.positions:
-                                    log, color, closed_sym, pnl, peak_price, decision_id = (
-                                        ctx.exchange.check_positions(pair, price)
-                                    )
-
-                                    if log:
-                                        # Log varsa (TP, SL, Trailing, Time Limit tetiklendiyse)
-                                        ctx.log_ui(log, color)
-                                        log_txt(log)
-
-                                        if log:
-                                            ctx.log_ui(log, color)
-                                            log_txt(log)
-                                            if closed_sym:
-                                                await handle_closed_position(
-                                                    ctx, closed_sym, pnl, peak_price, log, decision_id
-                                                )
-
-
-                        except Exception as e:
-                            # Tek bir mesajın bozuk olması tüm bağlantıyı koparmamalı
-                            # Sadece logla ve devam et
-                            ctx.log_ui(f"⚠️ WS Msg İşleme Hatası: {e}", "warning")
-                            continue
-
-                # Gönderici ve Alıcıyı paralel çalıştır
-                await asyncio.gather(sender(), receiver())
+    # All-market streamler (Tüm pariteler REST'siz taze kalır)
+    for stream in ALL_MARKET_STREAMS:
+        ctx.streams.acquire(stream, REASON_MARKET)
+    for pair in WATCHLIST_PAIRS:
+        ctx.streams.acquire(kline_stream(pair), REASON_WATCHLIST)
 
-        except Exception as e:
-            ctx.log_ui(
-                f"❌ Websocket Bağlantısı Koptu: {e}. 5sn içinde yeniden bağlanılıyor...",
-                "error",
-            )
-            await asyncio.sleep(5)
+    is_running = lambda: ctx.app_state.is_running
+    # Görevlerin ömrü uygulamanın ömrü: Duraklatma sadece tick işlemeyi bekletir
+    is_alive = lambda: not ctx.app_state.is_shutting_down
+    await asyncio.gather(ctx.dispatcher.run(is_alive, is_running), ctx.streams.run(is_alive))
 
 
 async def position_monitor_loop(ctx):
     """
     Bekçi Köpeği: Websocket takılsa bile hafızadaki son fiyatla
     süre (validity) kontrolü yapar.
+    Polling yok: En yakın expiry_time'a kadar tek bir bekleme, yeni pozisyon daha erkense uyanır.
     """
     ctx.log_ui("🛡️ Position Monitor (Bekçi) Devrede...", "success")
 
-    while ctx.app_state.is_running:
-        try:
-            await asyncio.sleep(2)  # 2 Saniyede bir kontrol (Daha sıkı takip)
-
-            if not ctx.exchange.positions:
-                continue
-
-            # Sözlük değişirken hata almamak için listeye çevirip dönüyoruz
-            # Keys zaten küçük harf ('btcusdt') olmalı
-            open_symbols = list(ctx.exchange.positions.keys())
-
-            for pair in open_symbols:
-                # Hafızadaki son fiyatı al
-                if pair not in ctx.market_memory:
-                    continue
-
-                current_price = ctx.market_memory[pair].current_price
+    wakeup = asyncio.Event()
+    ctx.exchange.on_expiry_change = wakeup.set
 
-                # Fiyat 0 ise pas geç
+    # Ömür uygulamanın ömrü: Duraklatınca görev ölmez, sadece kapanışlar bekletilir
+    while not ctx.app_state.is_shutting_down:
+        if not ctx.app_state.is_running:
+            await asyncio.sleep(1)
+            continue
+        try:
+            deadline = ctx.exchange.next_expiry()
+            timeout = None if deadline is None else max(0.0, deadline - ctx.exchange.clock.time())
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+
+            for pair in ctx.exchange.pop_expired():
+                # Hafızadaki son fiyatı al (Yoksa pozisyonun son fiyatı)
+                stats = ctx.market_memory.get(pair)
+                current_price = stats.current_price if stats else 0
                 if current_price == 0:
-                    continue
+                    current_price = ctx.exchange.positions[pair]['current_price']
 
                 # Kontrol Et
                 log, color, closed_sym, pnl, peak, decision_id = (
@@ -592,8 +585,6 @@ async def position_monitor_loop(ctx):
                             ctx, closed_sym, pnl, peak, log, decision_id
                         )
 
-                
-
         except Exception as e:
             print(f"⚠️ Monitor Loop Hatası: {e}")
             await asyncio.sleep(5)
@@ -615,18 +606,11 @@ async def handle_closed_position(ctx, symbol, pnl, peak_price, log_msg, decision
         if ctx.exchange.history:
             last_trade = ctx.exchange.history[-1]
             last_trade["peak_price"] = peak_price
-            ctx.memory.log_trade(last_trade, decision_id)
+            ctx.memory.log_trade(last_trade, decision_id)  # Write-behind: Sonucu beklenmez
 
         # 4. Stream İptal ve Bakiye Güncelleme
-        try:
-            unsubscribe_msg = {
-                "method": "UNSUBSCRIBE",
-                "params": [f"{symbol.lower()}@kline_1m"],
-                "id": int(time.time()),
-            }
-            await ctx.stream_command_queue.put(unsubscribe_msg)
-        except:
-            pass
+        # (Başka sebeple izlenen coinin stream'i açık kalır)
+        ctx.streams.release(kline_stream(symbol), REASON_POSITION)
         
         asyncio.create_task(update_system_balance(ctx, last_pnl=pnl))
 
@@ -649,8 +633,13 @@ async def telegram_loop(ctx):
 
         @ctx.telegram_client.on(events.NewMessage(chats=TARGET_CHANNELS))
         async def handler(event):
+            # Analiz beklenmez: Kuyruğa bırak (Patlamada sıradaki mesajlar bloklanmasın)
             if event.message.message:
-                await process_news(event.message.message, "TELEGRAM", ctx)
+                ctx.news_queue.put(
+                    event.message.message,
+                    "TELEGRAM",
+                    channel=getattr(event.chat, "username", None),
+                )
 
         # 🔴 BURASI SİLİNDİ
         # await ctx.telegram_client.run_until_disconnected()
@@ -663,19 +652,51 @@ async def collector_loop(ctx):
     ctx.log_ui("Data Collector Active 💾", "success")
     while True:
         await asyncio.sleep(60)
-        curr_prices = {
-            p: ctx.market_memory[p].current_price
-            for p in TARGET_PAIRS
-            if ctx.market_memory[p].current_price > 0
-        }
+        # Tüm evrenin fiyatları tek vektörel okumada
+        curr_prices = ctx.market_memory.current_prices()
         if curr_prices:
             await ctx.collector.check_outcomes(curr_prices)
 
 
+async def snapshot_loop(ctx):
+    """Market hafızasını periyodik olarak diske yazar (Warm restart)."""
+    ctx.log_ui("Market Snapshot Active 🧊", "success")
+    while not ctx.app_state.is_shutting_down:
+        await asyncio.sleep(MARKET_SNAPSHOT_INTERVAL)
+        if not ctx.app_state.is_running:
+            continue  # Duraklatılmış: Hafıza değişmiyor
+        try:
+            # Kopya event loop'ta alınır (tutarlı görüntü), disk yazımı thread'de
+            meta, arrays = ctx.market_memory.export_snapshot()
+            await asyncio.to_thread(
+                ctx.market_memory.write_snapshot, MARKET_SNAPSHOT_DIR, meta, arrays
+            )
+        except Exception as e:
+            print(f"⚠️ Snapshot Hatası: {e}")
+
+
+async def news_retention_loop(ctx):
+    """Eski haberleri aylık arşive taşır, boşalan sayfaları geri verir ve tablo boyutlarını ölçer."""
+    ctx.log_ui("News Retention Active 🗃️", "success")
+    while not ctx.app_state.is_shutting_down:
+        try:
+            moved = 0
+            while True:
+                n = await asyncio.wrap_future(ctx.memory.archive_old_news())
+                moved += n
+                if n < NEWS_ARCHIVE_BATCH:
+                    break
+            free_pages = await asyncio.wrap_future(ctx.memory.vacuum())
+            ctx.storage_metrics = await asyncio.to_thread(ctx.memory.storage_metrics)
+            if moved:
+                ctx.log_ui(f"🗃️ {moved} eski haber arşivlendi (Kalan boş sayfa: {free_pages}).", "info")
+        except Exception as e:
+            print(f"⚠️ Retention Hatası: {e}")
+        await asyncio.sleep(NEWS_RETENTION_INTERVAL)
+
+
 async def rss_loop(ctx):
     ctx.log_ui("RSS Modülü Başlatılıyor... 📡", "info")
     # RSSMonitor'a bir loglama ekleyemiyoruz ama başlatıldığını buradan logluyoruz.
-    rss_bot = RSSMonitor(
-        callback_func=lambda msg, src: asyncio.create_task(process_news(msg, src, ctx))
-    )
+    rss_bot = RSSMonitor(callback_func=ctx.news_queue.put)
     await rss_bot.start_loop()
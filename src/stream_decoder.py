@@ -0,0 +1,129 @@
+import json
+from typing import NamedTuple
+
+from config import STREAM_DECODER
+
+
+# --- TİPLİ KAYITLAR (Binance frame'leri -> sabit alanlı tuple) ---
+class KlineEvent(NamedTuple):
+    symbol: str        # Küçük harf (btcusdt)
+    open_time: float   # Saniye
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    quote_volume: float
+    closed: bool
+
+
+class MiniTickerEvent(NamedTuple):
+    symbol: str
+    event_time: float
+    close: float
+    open: float        # 24s önceki fiyat
+    quote_volume: float
+
+
+class BookTickerEvent(NamedTuple):
+    symbol: str
+    bid: float
+    bid_qty: float
+    ask: float
+    ask_qty: float
+    update_id: int
+
+
+class MarkPriceEvent(NamedTuple):
+    symbol: str
+    event_time: float
+    mark_price: float
+    funding_rate: float  # Yüzde
+
+
+def _kline(d):
+    k = d["k"]
+    return KlineEvent(
+        d["s"].lower(), k["t"] / 1000,
+        float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]),
+        float(k["v"]), float(k["q"]), k["x"],
+    )
+
+
+def _mini_ticker(d):
+    return MiniTickerEvent(d["s"].lower(), d["E"] / 1000, float(d["c"]), float(d["o"]), float(d["q"]))
+
+
+def _book_ticker(d):
+    return BookTickerEvent(d["s"].lower(), float(d["b"]), float(d["B"]), float(d["a"]), float(d["A"]), d["u"])
+
+
+def _mark_price(d):
+    return MarkPriceEvent(d["s"].lower(), d["E"] / 1000, float(d["p"]), float(d["r"]) * 100)
+
+
+_PARSERS = {
+    "kline": _kline,
+    "24hrMiniTicker": _mini_ticker,
+    "bookTicker": _book_ticker,
+    "markPriceUpdate": _mark_price,
+}
+
+
+def _load_backend(name):
+    """(isim, loads) döner. İstenen hızlı parser kurulu değilse stdlib json'a düşer."""
+    if name == "orjson":
+        try:
+            import orjson
+            return "orjson", orjson.loads
+        except ImportError:
+            pass
+    elif name == "ujson":
+        try:
+            import ujson
+            return "ujson", ujson.loads
+        except ImportError:
+            pass
+    return "json", json.loads
+
+
+class FrameDecoder:
+    """
+    Websocket frame'ini çözer ve Binance olaylarını tipli kayıtlara çevirir.
+    Parser değiştirilebilir (STREAM_DECODER): Varsayılan stdlib json, kuruluysa orjson/ujson.
+    """
+
+    def __init__(self, backend=STREAM_DECODER):
+        self.name, self.loads = _load_backend(backend)
+        self.frames = 0
+        self.errors = 0  # Çözülemeyen olay sayısı
+
+    @staticmethod
+    def is_ack(payload):
+        """SUBSCRIBE/UNSUBSCRIBE cevabı mı? ({"result": null, "id": 1})"""
+        return isinstance(payload, dict) and "id" in payload and ("result" in payload or "error" in payload)
+
+    def records(self, payload):
+        """Çözülmüş payload'dan tipli kayıt listesi (Bilinmeyen olaylar atlanır)."""
+        self.frames += 1
+        # Combined stream formatı: {"stream": ..., "data": ...}
+        if isinstance(payload, dict) and "data" in payload:
+            payload = payload["data"]
+        events = payload if isinstance(payload, list) else (payload,)
+
+        out = []
+        for ev in events:
+            parser = _PARSERS.get(ev.get("e"))
+            # Spot bookTicker olay tipi göndermez
+            if parser is None and "b" in ev and "a" in ev and "u" in ev:
+                parser = _book_ticker
+            if parser is None:
+                continue
+            try:
+                out.append(parser(ev))
+            except (KeyError, TypeError, ValueError):
+                self.errors += 1
+        return out
+
+    def decode(self, raw):
+        return self.records(self.loads(raw))
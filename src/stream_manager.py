@@ -0,0 +1,306 @@
+import asyncio
+import json
+import time
+from collections import Counter
+
+import websockets
+
+from config import (
+    WEBSOCKET_URL,
+    STREAM_MAX_PER_CONNECTION,
+    STREAM_BATCH_WINDOW,
+    STREAM_BATCH_SIZE,
+    STREAM_RECONNECT_DELAY,
+    STREAM_RECORD_FILE,
+)
+from stream_decoder import FrameDecoder
+
+# Abonelik sebepleri (Bir stream, sebeplerinden biri bile duruyorsa açık kalır)
+REASON_POSITION = "position"
+REASON_WATCHLIST = "watchlist"
+REASON_BACKFILL = "backfill"
+REASON_MARKET = "market"
+
+MIN_SEND_INTERVAL = 0.2  # Binance: Bağlantı başına saniyede en fazla 5 mesaj
+
+
+def kline_stream(pair):
+    return f"{pair.lower()}@kline_1m"
+
+
+class _Shard:
+    """Tek websocket bağlantısı ve ona atanmış streamler."""
+
+    def __init__(self, index):
+        self.index = index
+        self.streams = set()    # Bu bağlantıda açık olması gerekenler
+        self.confirmed = set()  # Binance'in SUBSCRIBE'ını onayladıkları
+        self.to_sub = set()     # Bir sonraki batch'te gönderilecekler
+        self.to_unsub = set()
+        self.pending = {}       # id -> (method, params, gönderim zamanı)
+        self.dirty = asyncio.Event()
+        self.task = None
+        self.connects = 0
+        self.last_send = 0.0
+
+
+class StreamManager:
+    """
+    Websocket aboneliklerinin tek sahibi.
+    - Streamler sebep bazında referans sayılır (pozisyon, watchlist, backfill...).
+    - SUBSCRIBE/UNSUBSCRIBE istekleri kısa bir pencerede toplanıp tek mesajla gönderilir.
+    - Her isteğin onayı (ack) id ile takip edilir.
+    - Bağlantı başına stream limiti dolunca yeni bir bağlantı (shard) açılır.
+    - Kopan bağlantı yeniden kurulunca o shard'ın tüm streamleri tekrar abone edilir.
+    """
+
+    def __init__(
+        self,
+        on_message,
+        url=WEBSOCKET_URL,
+        log=print,
+        decoder=None,
+        max_per_connection=STREAM_MAX_PER_CONNECTION,
+        batch_window=STREAM_BATCH_WINDOW,
+        batch_size=STREAM_BATCH_SIZE,
+        reconnect_delay=STREAM_RECONNECT_DELAY,
+    ):
+        self.on_message = on_message  # fn([KlineEvent | MiniTickerEvent | ...]), bloklamamalı (TickDispatcher.put)
+        self.decoder = decoder or FrameDecoder()
+        # Benchmark için ham frame kaydı (Satır başına bir frame)
+        self._record = open(STREAM_RECORD_FILE, "a", encoding="utf-8") if STREAM_RECORD_FILE else None
+        self.url = url
+        self.log = log
+        self.max_per_connection = max_per_connection
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.reconnect_delay = reconnect_delay
+
+        self._refs = {}      # stream -> Counter(sebep -> adet)
+        self._shard_of = {}  # stream -> _Shard
+        self._shards = []
+        self._next_shard = 0  # Shard numarası (Boşalan shard'lar kapatıldığı için liste uzunluğu değil)
+        self._next_id = 1
+        self._is_alive = None
+
+        # Metrikler
+        self.messages_sent = 0
+        self.acks = 0
+        self.errors = 0
+        self.resubscribed = 0
+
+    # --- REFERANS SAYIMI ---
+    def acquire(self, stream, reason):
+        refs = self._refs.get(stream)
+        if refs is None:
+            refs = self._refs[stream] = Counter()
+            self._assign(stream)
+        refs[reason] += 1
+
+    def release(self, stream, reason):
+        """Sebebin bir referansını bırakır. Hiç referans kalmazsa stream kapatılır."""
+        refs = self._refs.get(stream)
+        if not refs or refs[reason] <= 0:
+            return False
+        refs[reason] -= 1
+        if refs[reason] == 0:
+            del refs[reason]
+        if not refs:
+            del self._refs[stream]
+            self._unassign(stream)
+        return True
+
+    def lease(self, stream, reason, seconds):
+        """Stream'i `seconds` saniyeliğine açık tutar (Süre bitince referans kendiliğinden bırakılır)."""
+        self.acquire(stream, reason)
+        asyncio.get_running_loop().call_later(seconds, self.release, stream, reason)
+
+    def reasons(self, stream):
+        return dict(self._refs.get(stream, {}))
+
+    def is_subscribed(self, stream):
+        """Binance aboneliği onayladı mı?"""
+        shard = self._shard_of.get(stream)
+        return shard is not None and stream in shard.confirmed
+
+    @property
+    def streams(self):
+        return set(self._refs)
+
+    # --- SHARD ATAMA ---
+    def _assign(self, stream):
+        shard = next((s for s in self._shards if len(s.streams) < self.max_per_connection), None)
+        if shard is None:
+            shard = self._new_shard()
+        shard.streams.add(stream)
+        self._shard_of[stream] = shard
+        shard.to_unsub.discard(stream)
+        shard.to_sub.add(stream)
+        shard.dirty.set()
+
+    def _unassign(self, stream):
+        shard = self._shard_of.pop(stream)
+        shard.streams.discard(stream)
+        if stream in shard.to_sub:
+            # Henüz gönderilmedi: İptal etmek yeterli
+            shard.to_sub.discard(stream)
+        else:
+            shard.to_unsub.add(stream)
+            shard.dirty.set()
+        shard.confirmed.discard(stream)
+        if not shard.streams and shard.index != 0:
+            self._retire(shard)
+
+    def _retire(self, shard):
+        """Boşalan shard'ın bağlantısını kapatır (İlk shard all-market streamler için açık kalır)."""
+        self._shards.remove(shard)
+        if shard.task is not None:
+            shard.task.cancel()
+        self.log(f"🔌 Shard #{shard.index} boşaldı, bağlantı kapatıldı.", "info")
+
+    def _new_shard(self):
+        shard = _Shard(self._next_shard)
+        self._next_shard += 1
+        self._shards.append(shard)
+        if self._is_alive is not None:
+            shard.task = asyncio.create_task(self._run_shard(shard))
+        return shard
+
+    # --- BAĞLANTI DÖNGÜLERİ ---
+    async def run(self, is_alive=lambda: True):
+        """
+        Tüm shard'ları başlatır ve `is_alive()` False olana (uygulama kapanana) kadar çalışır.
+        Duraklatma (pause) bağlantıları kapatmaz: Tick'lerin işlenmesi TickDispatcher'da durdurulur.
+        """
+        self._is_alive = is_alive
+        if not self._shards:
+            self._new_shard()
+        for shard in self._shards:
+            if shard.task is None:
+                shard.task = asyncio.create_task(self._run_shard(shard))
+        while is_alive():
+            await asyncio.sleep(1)
+        for shard in self._shards:
+            if shard.task is not None:
+                shard.task.cancel()
+        if self._record is not None:
+            self._record.close()
+            self._record = None
+
+    async def _run_shard(self, shard):
+        while self._is_alive():
+            try:
+                async with websockets.connect(self.url) as ws:
+                    shard.connects += 1
+                    if shard.connects > 1:
+                        self.resubscribed += len(shard.streams)
+
+                    # Yeni bağlantıda hiçbir abonelik yoktur: Hepsini baştan iste
+                    shard.confirmed.clear()
+                    shard.pending.clear()
+                    shard.to_unsub.clear()
+                    shard.to_sub = set(shard.streams)
+                    shard.dirty.set()
+                    self.log(
+                        f"✅ Websocket Bağlandı (Shard #{shard.index}, {len(shard.streams)} stream).",
+                        "success",
+                    )
+
+                    tasks = [
+                        asyncio.create_task(self._sender(shard, ws)),
+                        asyncio.create_task(self._receiver(shard, ws)),
+                    ]
+                    # Biri biterse (bağlantı koptu) diğerini de durdur
+                    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for t in pending:
+                        t.cancel()
+                    for t in done:
+                        t.result()
+            except Exception as e:
+                self.log(
+                    f"❌ Websocket Bağlantısı Koptu (Shard #{shard.index}): {e}. "
+                    f"{self.reconnect_delay}sn içinde yeniden bağlanılıyor...",
+                    "error",
+                )
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _sender(self, shard, ws):
+        while True:
+            await shard.dirty.wait()
+            # Yakın zamanlı istekleri tek mesajda topla
+            await asyncio.sleep(self.batch_window)
+            shard.dirty.clear()
+
+            unsub = sorted(shard.to_unsub)
+            sub = sorted(shard.to_sub)
+            shard.to_unsub.clear()
+            shard.to_sub.clear()
+            for method, streams in (("UNSUBSCRIBE", unsub), ("SUBSCRIBE", sub)):
+                for i in range(0, len(streams), self.batch_size):
+                    await self._send(shard, ws, method, streams[i:i + self.batch_size])
+
+    async def _send(self, shard, ws, method, params):
+        wait = shard.last_send + MIN_SEND_INTERVAL - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        msg_id = self._next_id
+        self._next_id += 1
+        shard.pending[msg_id] = (method, params, time.time())
+        await ws.send(json.dumps({"method": method, "params": params, "id": msg_id}))
+        shard.last_send = time.monotonic()
+        self.messages_sent += 1
+
+    async def _receiver(self, shard, ws):
+        decoder = self.decoder
+        async for msg in ws:
+            if self._record is not None:
+                self._record.write((msg if isinstance(msg, str) else msg.decode()) + "\n")
+            try:
+                payload = decoder.loads(msg)
+            except ValueError:
+                decoder.errors += 1
+                continue
+            if decoder.is_ack(payload):
+                self._on_ack(shard, payload)
+                continue
+            # Bozuk bir frame (örn. listede dict olmayan eleman) alıcıyı öldürüp
+            # tüm shard'ı yeniden abone ettirmemeli: Say ve devam et
+            try:
+                records = decoder.records(payload)
+                if records:
+                    self.on_message(records)
+            except Exception as e:
+                decoder.errors += 1
+                self.log(f"⚠️ Stream Frame Hatası (Shard #{shard.index}): {e}", "warning")
+
+    def _on_ack(self, shard, payload):
+        entry = shard.pending.pop(payload.get("id"), None)
+        if entry is None:
+            return
+        method, params, _sent_at = entry
+        if payload.get("error"):
+            self.errors += 1
+            self.log(f"⚠️ Stream {method} Reddedildi ({len(params)} stream): {payload['error']}", "warning")
+            return
+        self.acks += 1
+        if method == "SUBSCRIBE":
+            # Arada bırakılmış olanlar onaylı sayılmaz
+            shard.confirmed.update(s for s in params if s in shard.streams)
+
+    # --- METRİKLER ---
+    def metrics(self, now=None):
+        now = now or time.time()
+        pending = [sent for s in self._shards for _, _, sent in s.pending.values()]
+        return {
+            "connections": len(self._shards),
+            "streams": len(self._refs),
+            "confirmed": sum(len(s.confirmed) for s in self._shards),
+            "pending_acks": len(pending),
+            "oldest_pending_s": (now - min(pending)) if pending else 0.0,
+            "messages_sent": self.messages_sent,
+            "acks": self.acks,
+            "errors": self.errors,
+            "resubscribed": self.resubscribed,
+            "decoder": self.decoder.name,
+            "decode_errors": self.decoder.errors,
+        }
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from stream_decoder import KlineEvent
+
+IDLE_CHECK_INTERVAL = 1.0  # Boşta/duraklatılmışken kapanış ve devam kontrolü (saniye)
+
+
+class TickDispatcher:
+    """
+    Websocket alıcısı ile işleyiciyi ayırır.
+    Alıcı sadece put() çağırır (await yok); her sembol+olay tipi için tek bir slot tutulur
+    ve yeni tick eskisinin üstüne yazılır (latest-value-wins).
+    Ayrı bir dispatcher görevi slotları boşaltıp hafıza güncelleme ve pozisyon kontrolünü yapar.
+
+    Kline slotu dakikaya göre ayrılır: Kapanan mum, sonraki dakikanın ilk tick'i ile ezilmez.
+    Binance kline h/l kümülatif olduğundan ara tick'lerin atlanması fitil kontrolünü bozmaz.
+    """
+
+    def __init__(self, handler, log=print):
+        self.handler = handler  # async fn([kayıtlar])
+        self.log = log
+        self._slots = {}  # (tip, sembol[, dakika]) -> en son kayıt
+        self._ready = asyncio.Event()
+
+        # Metrikler
+        self.received = 0
+        self.coalesced = 0   # Ezilen (hiç işlenmeyen) tick sayısı
+        self.dispatched = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.last_batch_ms = 0.0
+
+    @property
+    def depth(self):
+        """Bekleyen (henüz işlenmemiş) slot sayısı."""
+        return len(self._slots)
+
+    def put(self, records):
+        slots = self._slots
+        for ev in records:
+            if type(ev) is KlineEvent:
+                key = (KlineEvent, ev.symbol, ev.open_time)
+            else:
+                key = (type(ev), ev.symbol)
+            if key in slots:
+                self.coalesced += 1
+            slots[key] = ev
+        self.received += len(records)
+        if len(slots) > self.max_depth:
+            self.max_depth = len(slots)
+        self._ready.set()
+
+    async def run(self, is_alive=lambda: True, is_active=lambda: True):
+        """
+        is_alive: Görevin ömrü (Uygulama kapanana kadar).
+        is_active: Duraklatılmışken slotlar bekletilir (Sembol başına en son tick), devam edilince işlenir.
+        """
+        while is_alive():
+            if not self._ready.is_set():
+                try:
+                    await asyncio.wait_for(self._ready.wait(), IDLE_CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    continue
+            if not is_active():
+                await asyncio.sleep(IDLE_CHECK_INTERVAL)
+                continue
+            self._ready.clear()
+            # Slotları topluca devral; işlenirken gelen tick'ler yeni sözlüğe düşer
+            batch, self._slots = self._slots, {}
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                await self.handler(list(batch.values()))
+            except Exception as e:
+                self.log(f"⚠️ Dispatcher Hatası: {e}", "warning")
+            self.dispatched += len(batch)
+            self.batches += 1
+            self.last_batch_ms = (time.perf_counter() - start) * 1000
+
+    def metrics(self):
+        return {
+            "queue_depth": self.depth,
+            "max_depth": self.max_depth,
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "dispatched": self.dispatched,
+            "batches": self.batches,
+            "last_batch_ms": self.last_batch_ms,
+        }
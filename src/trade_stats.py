@@ -0,0 +1,95 @@
+def confidence_bucket(confidence):
+    """AI güven skorunu 10'luk dilime çevirir (Örn. 78 -> "70-79", 90 ve üstü -> "90-100")."""
+    if confidence is None:
+        return "?"
+    low = min(int(confidence) // 10 * 10, 90)
+    return "90-100" if low == 90 else f"{low}-{low + 9}"
+
+
+def excursions(side, entry, peak, trough):
+    """
+    İşlem süresince en büyük lehte (MFE) ve aleyhte (MAE) hareket, girişe göre yüzde.
+    Dönüş: (mae, mfe), ikisi de pozitif büyüklük.
+    """
+    if not entry:
+        return 0.0, 0.0
+    sign = 1 if side == "LONG" else -1
+    mfe = max(0.0, sign * (peak - entry) / entry * 100) if peak else 0.0
+    mae = max(0.0, sign * (entry - trough) / entry * 100) if trough else 0.0
+    return mae, mfe
+
+
+class _Tally:
+    """Tek bir kırılımın (sembol, güven dilimi...) sayaçları."""
+
+    def __init__(self):
+        self.count = 0
+        self.wins = 0
+        self.pnl = 0.0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0  # Pozitif büyüklük
+
+    def add(self, pnl):
+        self.count += 1
+        self.pnl += pnl
+        if pnl > 0:
+            self.wins += 1
+            self.gross_profit += pnl
+        else:
+            self.gross_loss -= pnl
+
+    @property
+    def win_rate(self):
+        return self.wins / self.count * 100 if self.count else 0.0
+
+    @property
+    def expectancy(self):
+        """İşlem başına ortalama net PnL."""
+        return self.pnl / self.count if self.count else 0.0
+
+    @property
+    def profit_factor(self):
+        if self.gross_loss:
+            return self.gross_profit / self.gross_loss
+        return float("inf") if self.gross_profit else 0.0
+
+
+class TradeStats(_Tally):
+    """
+    Kapanan işlemlerin artımlı istatistikleri (Her kapanışta O(1) güncellenir).
+    Dashboard her saniye tüm geçmişi taramak yerine buradan okur; geçmiş listesi sınırlı tutulabilir.
+    Gerçekleşmiş PnL eğrisi üzerinden en büyük düşüş (max drawdown) takip edilir.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.equity = 0.0        # Kümülatif gerçekleşmiş PnL
+        self.peak_equity = 0.0
+        self.max_drawdown = 0.0  # Pozitif büyüklük (USDT)
+        self.by_symbol = {}      # sembol -> _Tally
+        self.by_confidence = {}  # güven dilimi -> _Tally
+
+    def add(self, pnl, symbol=None, confidence=None):
+        super().add(pnl)
+        self.equity += pnl
+        if self.equity > self.peak_equity:
+            self.peak_equity = self.equity
+        elif self.peak_equity - self.equity > self.max_drawdown:
+            self.max_drawdown = self.peak_equity - self.equity
+
+        if symbol:
+            self.by_symbol.setdefault(symbol.upper(), _Tally()).add(pnl)
+        self.by_confidence.setdefault(confidence_bucket(confidence), _Tally()).add(pnl)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "wins": self.wins,
+            "win_rate": self.win_rate,
+            "pnl": self.pnl,
+            "gross_profit": self.gross_profit,
+            "gross_loss": self.gross_loss,
+            "expectancy": self.expectancy,
+            "profit_factor": self.profit_factor,
+            "max_drawdown": self.max_drawdown,
+        }
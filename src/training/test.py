@@ -3,6 +3,7 @@ import time
 import os
 import json
 from datetime import datetime, timedelta, timezone
+from concurrent.futures import Future
 from telethon import TelegramClient
 
 # Proje Modülleri
@@ -15,6 +16,7 @@ from services import process_news, ensure_fresh_data
 from utils import find_coins, get_top_100_map
 from price_buffer import PriceBuffer
 from exchange import PaperExchange
+from clock import SimulatedClock
 from brain import AgentBrain
 from config import GROQCLOUD_API_KEY, GROQCLOUD_MODEL, GOOGLE_API_KEY, GEMINI_MODEL
 
@@ -22,7 +24,10 @@ from config import GROQCLOUD_API_KEY, GROQCLOUD_MODEL, GOOGLE_API_KEY, GEMINI_MO
 class MockMemory:
     def is_duplicate(self, text): return False, 0.0
     def add_news(self, source, content): pass
-    def log_decision(self, record): return 999 # Fake ID
+    def log_decision(self, record): # Gerçeği gibi Future döner
+        future = Future()
+        future.set_result(999) # Fake ID
+        return future
     def log_trade(self, record, decision_id=None): pass
 
 async def get_historical_technicals(ctx, pair, msg_ts):
@@ -43,7 +48,7 @@ async def get_historical_technicals(ctx, pair, msg_ts):
     temp_buffer = PriceBuffer()
     for k in klines:
         # (price, timestamp, is_closed)
-        temp_buffer.update_candle(float(k[4]), k[0]/1000, True)
+        temp_buffer.update_candle(float(k[4]), k[0]/1000, True, float(k[1]), float(k[2]), float(k[3]), float(k[5]))
     
     # Anlık fiyatı son kapanışa eşitle
     temp_buffer.current_price = float(klines[-1][4])
@@ -65,6 +70,8 @@ async def get_historical_technicals(ctx, pair, msg_ts):
     return {
         'price': temp_buffer.current_price,
         'rsi': temp_buffer.calculate_rsi(),
+        'indicators': temp_buffer.indicators.summary(temp_buffer.current_price),
+        'htf': temp_buffer.rollup_summary(temp_buffer.current_price),
         'changes': temp_buffer.get_all_changes(),
         'btc_trend': btc_trend,
     }
@@ -151,7 +158,9 @@ async def simulate_process_news(message, ctx, f_log):
                 rsi_val=tech['rsi'],     # Gerçek RSI
                 btc_trend=tech['btc_trend'], # Gerçek BTC Trendi
                 volume_24h="UNKNOWN", # Geçmiş hacmi çekmek zordur, opsiyonel
-                funding_rate=0.01      # Sabit veya anlık verilebilir
+                funding_rate=0.01,     # Sabit veya anlık verilebilir
+                indicator_summary=tech['indicators'],
+                htf_summary=tech['htf'],
             )
             print(f"🧠 AI Karar: symbol: {pair}, action: {dec['action']}, confidence: {dec['confidence']}")
 
@@ -189,12 +198,13 @@ async def simulate_process_news(message, ctx, f_log):
                     f"{'-'*60}\n"
                 )
                 
-                # İşlemi aç
-                open_log, _ = ctx.exchange.open_position_test(
+                # İşlemi aç (Canlı motorla aynı, sadece saat simüle)
+                ctx.clock.set(msg_ts)
+                open_log, _ = ctx.exchange.open_position(
                     symbol=pair, side=dec["action"], price=entry_price,
                     tp_pct=dec.get("tp_pct", 1.5), sl_pct=dec.get("sl_pct", 1.0),
                     amount_usdt=100, leverage=10, validity=dec.get("validity_minutes", 15),
-                    app_state=ctx.app_state, decision_id=999, now_ts=msg_ts
+                    app_state=ctx.app_state, decision_id=999
                 )
                 
                 print(f"🚀 İşlem Açıldı: {pair} | {dec['action']}")
@@ -203,14 +213,16 @@ async def simulate_process_news(message, ctx, f_log):
                 # services.py'daki websocket_loop ve monitor_loop'un simülasyonu
                 for k in klines:
                     minute_ts = k[0] / 1000
-                    # OHLC Verileriyle 15 saniyelik tick simülasyonu
-                    ticks = [float(k[1]), float(k[2]), float(k[3]), float(k[4])]
+                    # OHLC Verileriyle 15 saniyelik tick simülasyonu (Mum içi yol FillModel'de)
+                    ticks = ctx.exchange.fill_model.bar_path(float(k[1]), float(k[2]), float(k[3]), float(k[4]))
                     
                     for i, tick_price in enumerate(ticks):
                         current_ts = minute_ts + (i * 15)
-                        # Pozisyonu kontrol et (Test versiyonu)
-                        res_log, _, sym, pnl, peak, _ = ctx.exchange.check_positions_test(
-                            pair, tick_price, now_ts=current_ts
+                        ctx.clock.set(current_ts)
+                        # position_monitor_loop karşılığı: Süresi dolanlar tam kontrole düşer
+                        ctx.exchange.pop_expired()
+                        res_log, _, sym, pnl, peak, _ = ctx.exchange.check_positions(
+                            pair, tick_price
                         )
                         
                         if res_log:
@@ -238,7 +250,8 @@ async def run_simulation(model = "LlamaTrader"):
     ctx = BotContext()
     ctx.app_state = SharedState()
     ctx.memory = MockMemory() # DB susturuldu
-    ctx.exchange = PaperExchange(1000.0)
+    ctx.clock = SimulatedClock()
+    ctx.exchange = PaperExchange(1000.0, clock=ctx.clock)
     ctx.brain = AgentBrain(
         use_groqcloud=False,
         api_key=GROQCLOUD_API_KEY,